@@ -4,6 +4,7 @@ from sqlalchemy import pool
 from alembic import context
 from app.core.config import settings
 from app.db.base import Base
+from app.models.deployment_archive import PARTITION_PREFIX
 
 config = context.config
 
@@ -15,6 +16,12 @@ target_metadata = Base.metadata
 def get_url():
     return settings.DATABASE_URL
 
+def include_name(name, type_, parent_names):
+    # Monthly archive partitions are created by the archiver, not migrations
+    if type_ == "table":
+        return not name.startswith(PARTITION_PREFIX)
+    return True
+
 def run_migrations_offline() -> None:
     url = get_url()
     context.configure(
@@ -22,6 +29,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -38,7 +46,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_name
         )
 
         with context.begin_transaction():
@@ -0,0 +1,152 @@
+"""initial schema
+
+Creates the schema on an empty database. A database created by the app
+before migrations existed (``Base.metadata.create_all``, with flat
+``cpu_limit``/``cpu_available``/``cpu_required`` float columns) is
+converted in place instead: the flat columns are packed into the resource
+vectors and dropped, and what that schema lacked is added.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.resources import ResourceVectorType, build_vector
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "cluster" in sa.inspect(op.get_bind()).get_table_names():
+        convert_create_all_schema()
+        return
+
+    op.create_table(
+        "organization",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("invite_code", sa.String()),
+    )
+    op.create_index("ix_organization_id", "organization", ["id"])
+    op.create_index("ix_organization_name", "organization", ["name"], unique=True)
+    op.create_index("ix_organization_invite_code", "organization", ["invite_code"], unique=True)
+
+    op.create_table(
+        "user",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String()),
+        sa.Column("username", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organization.id")),
+    )
+    op.create_index("ix_user_id", "user", ["id"])
+    op.create_index("ix_user_email", "user", ["email"], unique=True)
+    op.create_index("ix_user_username", "user", ["username"], unique=True)
+
+    op.create_table(
+        "cluster",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organization.id")),
+        sa.Column("limits", sa.LargeBinary()),
+        sa.Column("available", sa.LargeBinary()),
+    )
+    op.create_index("ix_cluster_id", "cluster", ["id"])
+    op.create_index("ix_cluster_name", "cluster", ["name"])
+
+    op.create_table(
+        "deployment",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("cluster_id", sa.Integer(), sa.ForeignKey("cluster.id")),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("user.id"), nullable=True),
+        sa.Column("docker_image", sa.String()),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "RUNNING", "FAILED", "COMPLETED", name="deploymentstatus"),
+        ),
+        sa.Column("priority", sa.Integer()),
+        sa.Column("required", sa.LargeBinary()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_deployment_id", "deployment", ["id"])
+    op.create_index("ix_deployment_name", "deployment", ["name"])
+    op.create_index("ix_deployment_owner_id", "deployment", ["owner_id"])
+
+    create_quota_table()
+
+
+def create_quota_table() -> None:
+    op.create_table(
+        "quota",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organization.id")),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("user.id"), nullable=True),
+        sa.Column("limits", sa.LargeBinary()),
+        sa.UniqueConstraint("organization_id", "user_id"),
+    )
+    op.create_index("ix_quota_id", "quota", ["id"])
+    op.create_index("ix_quota_organization_id", "quota", ["organization_id"])
+
+
+def pack_columns(table_name: str, columns, vectors) -> None:
+    """Write each row's flat columns into the vector columns, in RESOURCES order"""
+    bind = op.get_bind()
+    flat = sa.table(table_name, sa.column("id"), *(sa.column(name) for name in columns))
+    packed = sa.table(
+        table_name, sa.column("id"), *(sa.column(vector, ResourceVectorType()) for vector in vectors)
+    )
+    for row in bind.execute(sa.select(flat)).mappings().all():
+        values = {
+            vector: build_vector(
+                row[f"cpu_{suffix}"] or 0, row[f"ram_{suffix}"] or 0, row[f"gpu_{suffix}"] or 0
+            )
+            for vector, suffix in vectors.items()
+        }
+        bind.execute(packed.update().where(packed.c.id == row["id"]).values(**values))
+
+
+def convert_create_all_schema() -> None:
+    cluster_columns = [
+        f"{resource}_{suffix}" for suffix in ("limit", "available") for resource in ("cpu", "ram", "gpu")
+    ]
+    with op.batch_alter_table("cluster") as batch:
+        batch.add_column(sa.Column("limits", sa.LargeBinary()))
+        batch.add_column(sa.Column("available", sa.LargeBinary()))
+    pack_columns("cluster", cluster_columns, {"limits": "limit", "available": "available"})
+    with op.batch_alter_table("cluster") as batch:
+        for name in cluster_columns:
+            batch.drop_column(name)
+
+    deployment_columns = ["cpu_required", "ram_required", "gpu_required"]
+    with op.batch_alter_table("deployment") as batch:
+        batch.add_column(sa.Column("owner_id", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("required", sa.LargeBinary()))
+        batch.create_foreign_key("fk_deployment_owner_id_user", "user", ["owner_id"], ["id"])
+    pack_columns("deployment", deployment_columns, {"required": "required"})
+    with op.batch_alter_table("deployment") as batch:
+        for name in deployment_columns:
+            batch.drop_column(name)
+    op.create_index("ix_deployment_owner_id", "deployment", ["owner_id"])
+
+    create_quota_table()
+
+
+def downgrade() -> None:
+    op.drop_table("quota")
+    op.drop_table("deployment")
+    sa.Enum(name="deploymentstatus").drop(op.get_bind(), checkfirst=True)
+    op.drop_table("cluster")
+    op.drop_table("user")
+    op.drop_table("organization")
@@ -0,0 +1,24 @@
+"""deployment cluster/status index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_deployment_cluster_status", "deployment", ["cluster_id", "status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_deployment_cluster_status", table_name="deployment")
@@ -0,0 +1,56 @@
+"""deployment archive
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+STATUSES = ("PENDING", "RUNNING", "FAILED", "COMPLETED")
+
+
+def upgrade() -> None:
+    # Reuses the type created with the deployment table
+    status = sa.Enum(*STATUSES, name="deploymentstatus").with_variant(
+        postgresql.ENUM(*STATUSES, name="deploymentstatus", create_type=False), "postgresql"
+    )
+    # Partitions are created per month by the archiver as it needs them
+    op.create_table(
+        "deploymentarchive",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=False),
+        sa.Column("organization_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String()),
+        sa.Column("cluster_id", sa.Integer()),
+        sa.Column("owner_id", sa.Integer(), nullable=True),
+        sa.Column("docker_image", sa.String()),
+        sa.Column("status", status),
+        sa.Column("priority", sa.Integer()),
+        sa.Column("required", sa.LargeBinary()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("archived_at", sa.DateTime()),
+        sa.Column("run_seconds", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("id", "completed_at"),
+        postgresql_partition_by="RANGE (completed_at)",
+    )
+    op.create_index(
+        "ix_deploymentarchive_org_completed", "deploymentarchive", ["organization_id", "completed_at"]
+    )
+    op.create_index("ix_deploymentarchive_cluster_id", "deploymentarchive", ["cluster_id"])
+    op.create_index("ix_deployment_status_completed", "deployment", ["status", "completed_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_deployment_status_completed", table_name="deployment")
+    op.drop_table("deploymentarchive")
@@ -0,0 +1,47 @@
+"""cluster nodes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "node",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("cluster_id", sa.Integer(), sa.ForeignKey("cluster.id")),
+        sa.Column("limits", sa.LargeBinary()),
+        sa.Column("available", sa.LargeBinary()),
+    )
+    op.create_index("ix_node_id", "node", ["id"])
+    op.create_index("ix_node_cluster_id", "node", ["cluster_id"])
+
+    with op.batch_alter_table("deployment") as batch:
+        batch.add_column(sa.Column("node_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_deployment_node_id", "node", ["node_id"], ["id"])
+
+    op.add_column("deploymentarchive", sa.Column("node_id", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("deploymentarchive", "node_id")
+
+    with op.batch_alter_table("deployment") as batch:
+        batch.drop_constraint("fk_deployment_node_id", type_="foreignkey")
+        batch.drop_column("node_id")
+
+    op.drop_index("ix_node_cluster_id", table_name="node")
+    op.drop_index("ix_node_id", table_name="node")
+    op.drop_table("node")
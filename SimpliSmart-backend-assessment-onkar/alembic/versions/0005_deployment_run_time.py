@@ -0,0 +1,29 @@
+"""deployment runtime hint and time limit
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ("deployment", "deploymentarchive"):
+        op.add_column(table, sa.Column("expected_duration_seconds", sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column("time_limit_seconds", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    for table in ("deploymentarchive", "deployment"):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("time_limit_seconds")
+            batch.drop_column("expected_duration_seconds")
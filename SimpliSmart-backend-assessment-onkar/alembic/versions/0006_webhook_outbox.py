@@ -0,0 +1,72 @@
+"""webhook endpoints and outbox
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "webhookendpoint",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organization.id")),
+        sa.Column("url", sa.String()),
+        sa.Column("secret", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_webhookendpoint_id", "webhookendpoint", ["id"])
+    op.create_index("ix_webhookendpoint_organization_id", "webhookendpoint", ["organization_id"])
+
+    op.create_table(
+        "webhookevent",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "endpoint_id",
+            sa.Integer(),
+            sa.ForeignKey("webhookendpoint.id", ondelete="CASCADE"),
+        ),
+        sa.Column("deployment_id", sa.Integer()),
+        sa.Column(
+            "event",
+            sa.Enum("STARTED", "COMPLETED", "CANCELLED", name="webhookeventtype"),
+        ),
+        sa.Column("payload", sa.Text()),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "DELIVERED", "DEAD", name="webhookeventstatus"),
+        ),
+        sa.Column("attempts", sa.Integer()),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("next_attempt_at", sa.DateTime()),
+        sa.Column("delivered_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_webhookevent_id", "webhookevent", ["id"])
+    op.create_index("ix_webhookevent_endpoint_id", "webhookevent", ["endpoint_id"])
+    op.create_index(
+        "ix_webhookevent_status_next_attempt", "webhookevent", ["status", "next_attempt_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_webhookevent_status_next_attempt", table_name="webhookevent")
+    op.drop_index("ix_webhookevent_endpoint_id", table_name="webhookevent")
+    op.drop_index("ix_webhookevent_id", table_name="webhookevent")
+    op.drop_table("webhookevent")
+    sa.Enum(name="webhookeventstatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="webhookeventtype").drop(op.get_bind(), checkfirst=True)
+
+    op.drop_index("ix_webhookendpoint_organization_id", table_name="webhookendpoint")
+    op.drop_index("ix_webhookendpoint_id", table_name="webhookendpoint")
+    op.drop_table("webhookendpoint")
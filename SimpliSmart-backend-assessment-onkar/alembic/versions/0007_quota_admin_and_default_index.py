@@ -0,0 +1,46 @@
+"""organization admins and one default quota per organization
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("user") as batch:
+        batch.add_column(sa.Column("is_org_admin", sa.Boolean(), nullable=True))
+    # The earliest member of each organization is taken to be its creator
+    op.execute(
+        'UPDATE "user" SET is_org_admin = (id IN '
+        '(SELECT MIN(id) FROM "user" WHERE organization_id IS NOT NULL GROUP BY organization_id))'
+    )
+
+    # Keep the newest of any duplicate organization defaults
+    op.execute(
+        "DELETE FROM quota WHERE user_id IS NULL AND id NOT IN "
+        "(SELECT MAX(id) FROM quota WHERE user_id IS NULL GROUP BY organization_id)"
+    )
+    op.create_index(
+        "uq_quota_organization_default",
+        "quota",
+        ["organization_id"],
+        unique=True,
+        postgresql_where=sa.text("user_id IS NULL"),
+        sqlite_where=sa.text("user_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_quota_organization_default", table_name="quota")
+    with op.batch_alter_table("user") as batch:
+        batch.drop_column("is_org_admin")
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, organizations, clusters, deployments
+from app.api.v1.endpoints import auth, organizations, clusters, deployments, webhooks
 
 api_router = APIRouter()
 
@@ -7,3 +7,4 @@ api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(organizations.router, prefix="/organizations", tags=["organizations"])
 api_router.include_router(clusters.router, prefix="/clusters", tags=["clusters"])
 api_router.include_router(deployments.router, prefix="/deployments", tags=["deployments"])
+api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
@@ -1,14 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime, timezone
+import time
+from redis import Redis
 from app.core import deps
-from app.schemas.cluster import Cluster, ClusterCreate
+from app.core.redis import get_redis
+from app.core.rate_limit import rate_limit
+from app.scheduler import engine, fairness, placement, queue, utilization
+from app.scheduler.utilization import Resolution
+from app.schemas.cluster import CLUSTER_PROJECTION, Cluster, ClusterCreate, ClusterUpdate, UtilizationPoint
+from app.schemas.node import Fragmentation, Node, NodeCreate
+from app.schemas.quota import FairShare
 from app.models.cluster import Cluster as ClusterModel
+from app.models.deployment import Deployment as DeploymentModel, DeploymentStatus
+from app.models.node import Node as NodeModel
 from app.models.user import User
+from app.webhooks.outbox import CANCEL_UNSCHEDULABLE
 
 router = APIRouter()
 
-@router.post("/", response_model=Cluster)
+@router.post(
+    "/",
+    response_model=Cluster,
+    dependencies=[Depends(rate_limit("clusters:create"))]
+)
 def create_cluster(
     *,
     db: Session = Depends(deps.get_db),
@@ -25,16 +42,13 @@ def create_cluster(
         )
     
     # Create cluster with initial resources
+    limits = cluster_in.limit_vector()
     cluster = ClusterModel(
         name=cluster_in.name,
         organization_id=current_user.organization_id,
-        cpu_limit=cluster_in.cpu_limit,
-        ram_limit=cluster_in.ram_limit,
-        gpu_limit=cluster_in.gpu_limit,
+        limits=limits,
         # Initially, available resources equal the limits
-        cpu_available=cluster_in.cpu_limit,
-        ram_available=cluster_in.ram_limit,
-        gpu_available=cluster_in.gpu_limit
+        available=limits
     )
     
     db.add(cluster)
@@ -45,10 +59,12 @@ def create_cluster(
 @router.get("/", response_model=List[Cluster])
 def list_clusters(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_current_user),
+    fields: Optional[str] = None
 ):
     """
-    List all clusters in user's organization
+    List all clusters in user's organization; ``fields`` (e.g.
+    id,name,gpu_available) returns only those fields
     """
     if not current_user.organization_id:
         raise HTTPException(
@@ -56,8 +72,284 @@ def list_clusters(
             detail="User must belong to an organization to view clusters"
         )
     
+    names = CLUSTER_PROJECTION.select(fields)
     clusters = db.query(ClusterModel).filter(
         ClusterModel.organization_id == current_user.organization_id
-    ).all()
+    ).with_entities(*CLUSTER_PROJECTION.columns(ClusterModel, names)).all()
+    
+    return ORJSONResponse(CLUSTER_PROJECTION.dump(clusters, names))
+
+@router.patch(
+    "/{cluster_id}",
+    response_model=Cluster,
+    dependencies=[Depends(rate_limit("clusters:update"))]
+)
+def update_cluster(
+    *,
+    db: Session = Depends(deps.get_db),
+    redis: Redis = Depends(get_redis),
+    cluster_id: int,
+    cluster_in: ClusterUpdate,
+    allow_preemption: bool = False,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Rename or resize a cluster. Availability moves with the limits, so
+    running deployments keep what they hold. Shrinking below what is
+    allocated is rejected unless allow_preemption is set, in which case
+    running deployments go back to the queue, lowest priority first, until
+    the allocation fits. A resize that frees capacity triggers a scheduling
+    pass, which starts from the head of the queue and stops at the first
+    entry that still does not fit.
+    """
+    cluster = db.query(ClusterModel).filter(
+        ClusterModel.id == cluster_id,
+        ClusterModel.organization_id == current_user.organization_id
+    ).with_for_update().first()
+    
+    if not cluster:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cluster not found or access denied"
+        )
+    
+    limits = cluster_in.limit_vector(cluster.limits)
+    if limits != cluster.limits and db.query(NodeModel.id).filter(
+        NodeModel.cluster_id == cluster.id
+    ).first():
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Limits of a cluster with nodes follow its nodes; add nodes to grow it"
+        )
+    
+    preempted = []
+    if not limits.fits(cluster.limits - cluster.available):
+        if not allow_preemption:
+            over = (cluster.limits - cluster.available - limits).as_dict()
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=(
+                    "New limits are below current allocations ("
+                    + ", ".join(f"{name} by {value:g}" for name, value in over.items() if value > 0)
+                    + "); set allow_preemption to requeue running deployments"
+                )
+            )
+        preempted = engine.preempt_to_fit(db, cluster, limits)
+    
+    # Any resource that grew can fit entries that were blocked
+    grew = not cluster.limits.fits(limits)
+    allocated = cluster.limits - cluster.available
+    cluster.limits = limits
+    cluster.available = limits - allocated
+    if cluster_in.name is not None:
+        cluster.name = cluster_in.name
+    db.commit()
+    
+    engine.requeue_preempted(redis, cluster, preempted)
+    fairness.rescale_shares(redis, cluster)
+    if grew or preempted:
+        queue.signal(redis, [cluster.id])
+    
+    db.refresh(cluster)
+    return cluster
+
+@router.post(
+    "/{cluster_id}/nodes",
+    response_model=Node,
+    dependencies=[Depends(rate_limit("clusters:update"))]
+)
+def add_node(
+    *,
+    db: Session = Depends(deps.get_db),
+    redis: Redis = Depends(get_redis),
+    cluster_id: int,
+    node_in: NodeCreate,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Add a node to a cluster. Its capacity is added to the cluster's and
+    deployments are placed on single nodes from then on. The first node
+    replaces the cluster's aggregate limits, so nothing may be running on
+    the cluster when it is added, and pending deployments too large for it
+    are cancelled: they could never be placed, and at the head of the
+    queue they would hold back everything behind them. Their
+    deployment.cancelled events carry reason "unschedulable".
+    """
+    cluster = db.query(ClusterModel).filter(
+        ClusterModel.id == cluster_id,
+        ClusterModel.organization_id == current_user.organization_id
+    ).with_for_update().first()
+    
+    if not cluster:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cluster not found or access denied"
+        )
+    
+    limits = node_in.limit_vector()
+    first_node = not db.query(NodeModel.id).filter(NodeModel.cluster_id == cluster.id).first()
+    if not first_node:
+        cluster.limits = cluster.limits + limits
+        cluster.available = cluster.available + limits
+    else:
+        running = db.query(DeploymentModel.id).filter(
+            DeploymentModel.cluster_id == cluster.id,
+            DeploymentModel.status == DeploymentStatus.RUNNING
+        ).first()
+        if running:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The first node can only be added while nothing runs on the cluster"
+            )
+        cluster.limits = limits
+        cluster.available = limits
+    
+    node = NodeModel(
+        name=node_in.name,
+        cluster_id=cluster.id,
+        limits=limits,
+        available=limits
+    )
+    db.add(node)
+    db.commit()
+    db.refresh(node)
+    
+    if first_node:
+        # Later nodes only add capacity, and creation checks against them
+        too_large = [
+            row.id for row in db.query(DeploymentModel.id, DeploymentModel.required).filter(
+                DeploymentModel.cluster_id == cluster.id,
+                DeploymentModel.status == DeploymentStatus.PENDING
+            )
+            if not limits.fits(row.required)
+        ]
+        if too_large:
+            engine.cancel_deployments(
+                db, redis, [cluster.id], too_large,
+                statuses=(DeploymentStatus.PENDING,), reason=CANCEL_UNSCHEDULABLE
+            )
+    
+    fairness.rescale_shares(redis, cluster)
+    queue.signal(redis, [cluster.id])
+    return node
+
+@router.get("/{cluster_id}/nodes", response_model=List[Node])
+def list_nodes(
+    cluster_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    List the nodes of a cluster with their free capacity
+    """
+    return db.query(NodeModel).join(
+        ClusterModel, NodeModel.cluster_id == ClusterModel.id
+    ).filter(
+        NodeModel.cluster_id == cluster_id,
+        ClusterModel.organization_id == current_user.organization_id
+    ).order_by(NodeModel.id).all()
+
+@router.get("/{cluster_id}/fragmentation", response_model=Fragmentation)
+def get_fragmentation(
+    cluster_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Fragmentation of a cluster's free capacity across its nodes; the
+    score is that of the most fragmented resource
+    """
+    cluster = db.query(ClusterModel).filter(
+        ClusterModel.id == cluster_id,
+        ClusterModel.organization_id == current_user.organization_id
+    ).first()
+    
+    if not cluster:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cluster not found or access denied"
+        )
+    
+    nodes = db.query(NodeModel).filter(NodeModel.cluster_id == cluster.id).all()
+    if not nodes:
+        # One aggregate pool cannot fragment
+        return Fragmentation(score=0.0, resources={})
+    scores = placement.fragmentation(nodes)
+    return Fragmentation(score=max(scores.values()), resources=scores)
+
+@router.get("/{cluster_id}/shares", response_model=List[FairShare])
+def list_fair_shares(
+    cluster_id: int,
+    db: Session = Depends(deps.get_db),
+    redis: Redis = Depends(get_redis),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Dominant share and held resources of every user running on a cluster,
+    lowest share first
+    """
+    cluster = db.query(ClusterModel).filter(
+        ClusterModel.id == cluster_id,
+        ClusterModel.organization_id == current_user.organization_id
+    ).first()
+    
+    if not cluster:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cluster not found or access denied"
+        )
+    
+    shares = redis.zrange(fairness.shares_key(cluster.id), 0, -1, withscores=True)
+    return [
+        FairShare(
+            user_id=int(owner) or None,
+            dominant_share=share,
+            usage=fairness.owner_usage(redis, cluster.id, int(owner)).as_dict()
+        )
+        for owner, share in shares
+    ]
+
+@router.get("/{cluster_id}/utilization", response_model=List[UtilizationPoint])
+def get_utilization(
+    cluster_id: int,
+    resolution: Resolution = Resolution.MINUTE,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(deps.get_db),
+    redis: Redis = Depends(get_redis),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Utilization history of a cluster from its 1m, 1h or 1d rollup.
+    Defaults to the last 60 buckets; buckets without samples are omitted.
+    """
+    cluster = db.query(ClusterModel).filter(
+        ClusterModel.id == cluster_id,
+        ClusterModel.organization_id == current_user.organization_id
+    ).first()
+    
+    if not cluster:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cluster not found or access denied"
+        )
+    
+    # Naive times are UTC, like every timestamp the API stores
+    def epoch(moment: datetime) -> float:
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+    width, _ = utilization.ROLLUPS[resolution]
+    end_at = epoch(end) if end else time.time()
+    start_at = epoch(start) if start else end_at - 60 * width
+    if start_at > end_at:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
     
-    return clusters
+    return utilization.read_rollup(redis, cluster.id, resolution, start_at, end_at)
@@ -1,119 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import json
-import asyncio
-from datetime import datetime, timedelta
+from collections import defaultdict
+from datetime import datetime
 from redis import Redis
 from app.core import deps
 from app.core.redis import get_redis
-from app.core.config import settings
-from app.schemas.deployment import Deployment, DeploymentCreate
+from app.core.rate_limit import rate_limit
+from app.scheduler import dry_run, eta, queue, trace
+from app.scheduler.archive import needs_archive
+from app.scheduler.engine import CANCELLABLE, cancel_deployments, deallocate_resources, lock_cluster
+from app.schemas.deployment import (
+    DEPLOYMENT_PROJECTION, Deployment, DeploymentCancelFilter, DeploymentCancelResult, DeploymentCreate,
+    DeploymentExplanation, DeploymentSimulation, SimulationResult
+)
 from app.models.deployment import Deployment as DeploymentModel, DeploymentStatus
+from app.models.deployment_archive import DeploymentArchive
 from app.models.cluster import Cluster
+from app.models.node import Node as NodeModel
 from app.models.user import User
-from fastapi.responses import Response
+from app.models.webhook import WebhookEventType
+from app.webhooks.outbox import CANCEL_REQUESTED, record_events
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy import func
 
 router = APIRouter()
 
-def check_resource_availability(cluster: Cluster, deployment: DeploymentCreate) -> bool:
-    """Check if cluster has enough resources for deployment"""
-    return (
-        cluster.cpu_available >= deployment.cpu_required and
-        cluster.ram_available >= deployment.ram_required and
-        cluster.gpu_available >= deployment.gpu_required
-    )
+# Always loaded by the list, to merge live and archived pages
+SORT_COLUMNS = ("priority", "created_at")
+# Fields read from the queue rather than the row
+QUEUE_FIELDS = ("queue_position", "estimated_start_at")
 
-def allocate_resources(db: Session, cluster: Cluster, deployment: DeploymentCreate):
-    """Allocate resources from cluster for deployment"""
-    cluster.cpu_available -= deployment.cpu_required
-    cluster.ram_available -= deployment.ram_required
-    cluster.gpu_available -= deployment.gpu_required
-    db.commit()
+def with_queue_info(redis: Redis, deployments) -> List[Deployment]:
+    """Deployment responses, pending ones with queue position and estimate"""
+    info = eta.queue_info(redis, deployments)
+    return [
+        Deployment.model_validate(deployment).model_copy(update=info.get(deployment.id, {}))
+        for deployment in deployments
+    ]
 
-def deallocate_resources(db: Session, cluster: Cluster, deployment: DeploymentModel):
-    """Return resources to cluster and trigger rescheduling"""
-    cluster.cpu_available += deployment.cpu_required
-    cluster.ram_available += deployment.ram_required
-    cluster.gpu_available += deployment.gpu_required
-    db.commit()
-    
-    # Trigger rescheduling of pending deployments
-    schedule_pending_deployments(db, cluster)
+def queue_records(redis: Redis, rows, names: List[str]) -> List[dict]:
+    """Projected rows, with queue position and estimate when asked for"""
+    records = DEPLOYMENT_PROJECTION.dump(rows, names)
+    queued = [name for name in QUEUE_FIELDS if name in names]
+    if queued:
+        info = eta.queue_info(redis, rows)
+        for record, row in zip(records, rows):
+            if row.id in info:
+                record.update((name, info[row.id][name]) for name in queued)
+    return records
 
-def schedule_pending_deployments(db: Session, cluster: Cluster):
-    """
-    Schedule pending deployments based on priority and resource availability
-    """
-    redis = get_redis()
-    
-    # Get pending deployments from Redis queue
-    while True:
-        # Get highest priority pending deployment for this cluster
-        pending_deployment_data = redis.zrevrange(
-            f"cluster:{cluster.id}:pending_deployments",
-            0, 0,
-            withscores=True
-        )
-        
-        if not pending_deployment_data:
-            break
-            
-        deployment_json, priority = pending_deployment_data[0]
-        deployment_data = json.loads(deployment_json)
-        
-        # Get deployment from database
-        deployment = db.query(DeploymentModel).get(deployment_data['id'])
-        
-        if deployment and deployment.status == DeploymentStatus.PENDING:
-            if check_resource_availability(cluster, deployment):
-                # Allocate resources and start deployment
-                allocate_resources(db, cluster, deployment)
-                deployment.status = DeploymentStatus.RUNNING
-                deployment.started_at = datetime.utcnow()
-                db.commit()
-                
-                # Remove from pending queue
-                redis.zrem(
-                    f"cluster:{cluster.id}:pending_deployments",
-                    deployment_json
-                )
-                
-                # Set expiration timer
-                asyncio.create_task(
-                    handle_deployment_timeout(
-                        db,
-                        deployment.id,
-                        settings.DEPLOYMENT_TIMEOUT_SECONDS
-                    )
-                )
-            else:
-                break
-        else:
-            # Remove invalid entry from queue
-            redis.zrem(
-                f"cluster:{cluster.id}:pending_deployments",
-                deployment_json
-            )
-
-async def handle_deployment_timeout(db: Session, deployment_id: int, timeout_seconds: int):
-    """Handle deployment completion after timeout"""
-    await asyncio.sleep(timeout_seconds)
-    
-    deployment = db.query(DeploymentModel).get(deployment_id)
-    if deployment and deployment.status == DeploymentStatus.RUNNING:
-        cluster = db.query(Cluster).get(deployment.cluster_id)
-        if cluster:
-            # Mark deployment as completed
-            deployment.status = DeploymentStatus.COMPLETED
-            deployment.completed_at = datetime.utcnow()
-            
-            # Deallocate resources and trigger rescheduling
-            deallocate_resources(db, cluster, deployment)
-            db.commit()
-
-@router.post("/", response_model=Deployment)
+@router.post(
+    "/",
+    response_model=Deployment,
+    dependencies=[Depends(rate_limit("deployments:create"))]
+)
 async def create_deployment(
     *,
     db: Session = Depends(deps.get_db),
@@ -121,7 +62,10 @@ async def create_deployment(
     deployment_in: DeploymentCreate,
     current_user: User = Depends(deps.get_current_user)
 ):
-    """Create a new deployment"""
+    """
+    Create a new deployment. It is queued as pending and started by the
+    scheduler worker once its cluster has room.
+    """
     cluster = db.query(Cluster).filter(
         Cluster.id == deployment_in.cluster_id,
         Cluster.organization_id == current_user.organization_id
@@ -133,15 +77,28 @@ async def create_deployment(
             detail="Cluster not found or access denied"
         )
     
+    # On a cluster with nodes it has to fit one of them, or it would block
+    # the queue forever
+    required = deployment_in.required_vector()
+    node_limits = [
+        limits for (limits,) in db.query(NodeModel.limits).filter(NodeModel.cluster_id == cluster.id)
+    ]
+    if node_limits and not any(limits.fits(required) for limits in node_limits):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No node of the cluster is large enough for this deployment"
+        )
+    
     # Create deployment
     deployment = DeploymentModel(
         name=deployment_in.name,
         cluster_id=deployment_in.cluster_id,
         docker_image=deployment_in.docker_image,
-        cpu_required=deployment_in.cpu_required,
-        ram_required=deployment_in.ram_required,
-        gpu_required=deployment_in.gpu_required,
+        owner_id=current_user.id,
+        required=required,
         priority=deployment_in.priority,
+        expected_duration_seconds=deployment_in.expected_duration_seconds,
+        time_limit_seconds=deployment_in.time_limit_seconds,
         status=DeploymentStatus.PENDING
     )
     
@@ -149,32 +106,63 @@ async def create_deployment(
     db.commit()
     db.refresh(deployment)
     
-    # Add to Redis pending queue
-    deployment_data = {
-        "id": deployment.id,
-        "name": deployment.name,
-        "cpu_required": deployment.cpu_required,
-        "ram_required": deployment.ram_required,
-        "gpu_required": deployment.gpu_required
-    }
-    
-    redis.zadd(
-        f"cluster:{cluster.id}:pending_deployments",
-        {json.dumps(deployment_data): deployment.priority}
-    )
-    
-    # Try to schedule pending deployments
-    schedule_pending_deployments(db, cluster)
+    # Queue it and let the scheduler worker start it when it fits
+    queue.enqueue(redis, cluster, deployment)
+    queue.signal(redis, [cluster.id])
     
     return deployment
 
+@router.post(
+    "/simulate",
+    response_model=SimulationResult,
+    dependencies=[Depends(rate_limit("deployments:simulate"))]
+)
+def simulate_deployments(
+    *,
+    db: Session = Depends(deps.get_db),
+    simulation_in: DeploymentSimulation,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Dry run: how the given deployments would fare if created now. Runs the
+    scheduling policy on an in-memory copy of the organization's clusters
+    and queues; nothing is created and the queues are left alone.
+
+    Each item says whether it would start on the next pass (and on which
+    node), or its queue position and estimated start, or why it would be
+    rejected.
+    """
+    if not current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User must belong to an organization"
+        )
+
+    results = dry_run.simulate(
+        db, current_user.organization_id, current_user.id, simulation_in.deployments
+    )
+    counts = defaultdict(int)
+    for result in results:
+        counts[result["outcome"]] += 1
+    # Thousands of items: encode the plain results, as the list endpoint does
+    return ORJSONResponse({
+        "would_start": counts["start"],
+        "queued": counts["queued"],
+        "rejected": counts["rejected"],
+        "deployments": results
+    })
+
 @router.get("/", response_model=List[Deployment])
 def list_deployments(
     db: Session = Depends(deps.get_db),
+    redis: Redis = Depends(get_redis),
     current_user: User = Depends(deps.get_current_user),
     cluster_id: Optional[int] = None,
     deployment_status: Optional[DeploymentStatus] = None,
     priority: Optional[int] = None,
+    completed_after: Optional[datetime] = None,
+    completed_before: Optional[datetime] = None,
+    fields: Optional[str] = None,
     skip: int = 0,
     limit: int = 100
 ):
@@ -183,8 +171,18 @@ def list_deployments(
     - cluster_id: Filter by specific cluster
     - status: Filter by deployment status
     - priority: Filter by priority level
+    - completed_after / completed_before: Filter by completion time
+    - fields: Comma separated fields to return, e.g. id,name,status
     - skip: Number of records to skip (pagination)
     - limit: Maximum number of records to return
+
+    Pending deployments include their queue position and estimated start.
+    Rows are read column by column and encoded with orjson, without a
+    model per row; the total count is in the X-Total-Count header.
+
+    Archived deployments are included only when the filters can match
+    them: a finished or unset status, and no completed_after newer than
+    the archive horizon.
     """
     if not current_user.organization_id:
         raise HTTPException(
@@ -192,6 +190,8 @@ def list_deployments(
             detail="User must belong to an organization to view deployments"
         )
 
+    names = DEPLOYMENT_PROJECTION.select(fields)
+
     # Start with base query
     query = db.query(DeploymentModel).join(
         Cluster, DeploymentModel.cluster_id == Cluster.id
@@ -209,21 +209,60 @@ def list_deployments(
     if priority is not None:
         query = query.filter(DeploymentModel.priority == priority)
 
+    if completed_after is not None:
+        query = query.filter(DeploymentModel.completed_at >= completed_after)
+
+    if completed_before is not None:
+        query = query.filter(DeploymentModel.completed_at < completed_before)
+
     # Order by creation time newest first and priority
     query = query.order_by(
         DeploymentModel.priority.desc(),
         DeploymentModel.created_at.desc()
     )
 
-    # Apply pagination
-    total = query.count()
-    deployments = query.offset(skip).limit(limit).all()
+    # Load only the columns the fields need, and the sort keys
+    query = query.with_entities(
+        *DEPLOYMENT_PROJECTION.columns(DeploymentModel, names, always=SORT_COLUMNS)
+    )
 
-    # Add total count in response headers
-    response = Response()
-    response.headers["X-Total-Count"] = str(total)
-    
-    return deployments
+    if not needs_archive(deployment_status, completed_after):
+        # Apply pagination
+        total = query.count()
+        deployments = query.offset(skip).limit(limit).all()
+    else:
+        # Same filters on the archive; completion bounds prune partitions
+        archived = db.query(DeploymentArchive).filter(
+            DeploymentArchive.organization_id == current_user.organization_id
+        )
+        if cluster_id is not None:
+            archived = archived.filter(DeploymentArchive.cluster_id == cluster_id)
+        if deployment_status is not None:
+            archived = archived.filter(DeploymentArchive.status == deployment_status)
+        if priority is not None:
+            archived = archived.filter(DeploymentArchive.priority == priority)
+        if completed_after is not None:
+            archived = archived.filter(DeploymentArchive.completed_at >= completed_after)
+        if completed_before is not None:
+            archived = archived.filter(DeploymentArchive.completed_at < completed_before)
+        archived = archived.order_by(
+            DeploymentArchive.priority.desc(),
+            DeploymentArchive.created_at.desc()
+        ).with_entities(
+            *DEPLOYMENT_PROJECTION.columns(DeploymentArchive, names, always=SORT_COLUMNS)
+        )
+
+        # Merge the first skip + limit of each side, then paginate
+        window = skip + limit
+        merged = query.limit(window).all() + archived.limit(window).all()
+        merged.sort(key=lambda d: (d.priority, d.created_at or datetime.min), reverse=True)
+        total = query.count() + archived.count()
+        deployments = merged[skip:window]
+
+    return ORJSONResponse(
+        queue_records(redis, deployments, names),
+        headers={"X-Total-Count": str(total)}
+    )
 
 @router.get("/stats")
 async def get_deployment_stats(
@@ -246,9 +285,20 @@ async def get_deployment_stats(
         Cluster.organization_id == current_user.organization_id
     )
 
+    # Archived deployments are all finished; aggregate them per status
+    archived_counts = dict(db.query(
+        DeploymentArchive.status,
+        func.count(DeploymentArchive.id)
+    ).filter(
+        DeploymentArchive.organization_id == current_user.organization_id
+    ).group_by(
+        DeploymentArchive.status
+    ).all())
+
     # Get counts by status
     status_counts = {
         status.value: base_query.filter(DeploymentModel.status == status).count()
+        + archived_counts.get(status, 0)
         for status in DeploymentStatus
     }
 
@@ -263,6 +313,16 @@ async def get_deployment_stats(
     ).group_by(
         DeploymentModel.priority
     ).all()
+    priority_distribution = dict(priority_counts)
+    for priority, count in db.query(
+        DeploymentArchive.priority,
+        func.count(DeploymentArchive.id)
+    ).filter(
+        DeploymentArchive.organization_id == current_user.organization_id
+    ).group_by(
+        DeploymentArchive.priority
+    ):
+        priority_distribution[priority] = priority_distribution.get(priority, 0) + count
 
     # Calculate average completion time for completed deployments
     completed_deployments = base_query.filter(
@@ -270,19 +330,27 @@ async def get_deployment_stats(
         DeploymentModel.started_at.isnot(None),
         DeploymentModel.completed_at.isnot(None)
     ).all()
+    total_time = sum(
+        (d.completed_at - d.started_at).total_seconds()
+        for d in completed_deployments
+    )
+    archived_time, archived_completed = db.query(
+        func.sum(DeploymentArchive.run_seconds),
+        func.count(DeploymentArchive.run_seconds)
+    ).filter(
+        DeploymentArchive.organization_id == current_user.organization_id,
+        DeploymentArchive.status == DeploymentStatus.COMPLETED
+    ).one()
 
     avg_completion_time = None
-    if completed_deployments:
-        total_time = sum(
-            (d.completed_at - d.started_at).total_seconds()
-            for d in completed_deployments
-        )
-        avg_completion_time = total_time / len(completed_deployments)
+    completed_count = len(completed_deployments) + archived_completed
+    if completed_count:
+        avg_completion_time = (total_time + (archived_time or 0)) / completed_count
 
     return {
-        "total_deployments": base_query.count(),
+        "total_deployments": base_query.count() + sum(archived_counts.values()),
         "status_distribution": status_counts,
-        "priority_distribution": dict(priority_counts),
+        "priority_distribution": priority_distribution,
         "average_completion_time_seconds": avg_completion_time,
         "active_deployments": status_counts["running"],
         "pending_deployments": status_counts["pending"]
@@ -292,11 +360,42 @@ async def get_deployment_stats(
 async def get_deployment(
     deployment_id: int,
     db: Session = Depends(deps.get_db),
+    redis: Redis = Depends(get_redis),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Get detailed information about a specific deployment, with its queue
+    position and estimated start while pending
+    """
+    deployment = find_deployment(db, current_user, deployment_id)
+    return with_queue_info(redis, [deployment])[0]
+
+@router.get("/{deployment_id}/explain", response_model=DeploymentExplanation)
+async def explain_deployment(
+    deployment_id: int,
+    db: Session = Depends(deps.get_db),
+    redis: Redis = Depends(get_redis),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
-    Get detailed information about a specific deployment
+    Why a deployment is still pending: what the latest scheduling pass
+    decided for it (started, skipped at quota or blocking the queue), which
+    resources it was short of and by how much, or which blocked deployment
+    at the head of the queue it is waiting behind. Read from the trace the
+    scheduler writes after each pass.
     """
+    deployment = find_deployment(db, current_user, deployment_id)
+    info = eta.queue_info(redis, [deployment]).get(deployment.id, {})
+    return DeploymentExplanation(
+        deployment_id=deployment.id,
+        status=deployment.status,
+        cluster_id=deployment.cluster_id,
+        **info,
+        **trace.explain(redis, deployment)
+    )
+
+def find_deployment(db: Session, current_user: User, deployment_id: int):
+    """A deployment of the user's organization, live or archived, else 404"""
     deployment = db.query(DeploymentModel).join(
         Cluster, DeploymentModel.cluster_id == Cluster.id
     ).filter(
@@ -304,15 +403,89 @@ async def get_deployment(
         Cluster.organization_id == current_user.organization_id
     ).first()
 
+    if not deployment:
+        # Finished long enough ago to have been archived
+        deployment = db.query(DeploymentArchive).filter(
+            DeploymentArchive.id == deployment_id,
+            DeploymentArchive.organization_id == current_user.organization_id
+        ).first()
+
     if not deployment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Deployment not found or access denied"
         )
-
     return deployment
 
-@router.post("/{deployment_id}/cancel", response_model=Deployment)
+@router.post(
+    "/cancel",
+    response_model=DeploymentCancelResult,
+    dependencies=[Depends(rate_limit("deployments:cancel"))]
+)
+async def cancel_deployments_by_filter(
+    *,
+    db: Session = Depends(deps.get_db),
+    redis: Redis = Depends(get_redis),
+    cancel_in: DeploymentCancelFilter,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Cancel every pending or running deployment of the organization that
+    matches all given filters:
+    - cluster_id: Deployments of one cluster
+    - status: Only pending or only running ones
+    - min_priority / max_priority: Priority range, inclusive
+    - name_prefix: Names starting with this
+    - ids: Only these deployments
+
+    Everything is cancelled in one transaction and each affected cluster
+    gets a single scheduling pass.
+    """
+    query = db.query(DeploymentModel.id, DeploymentModel.cluster_id).join(
+        Cluster, DeploymentModel.cluster_id == Cluster.id
+    ).filter(
+        Cluster.organization_id == current_user.organization_id,
+        DeploymentModel.status.in_([cancel_in.status] if cancel_in.status else CANCELLABLE)
+    )
+
+    if cancel_in.cluster_id is not None:
+        query = query.filter(DeploymentModel.cluster_id == cancel_in.cluster_id)
+
+    if cancel_in.min_priority is not None:
+        query = query.filter(DeploymentModel.priority >= cancel_in.min_priority)
+
+    if cancel_in.max_priority is not None:
+        query = query.filter(DeploymentModel.priority <= cancel_in.max_priority)
+
+    if cancel_in.name_prefix is not None:
+        query = query.filter(DeploymentModel.name.startswith(cancel_in.name_prefix, autoescape=True))
+
+    if cancel_in.ids is not None:
+        query = query.filter(DeploymentModel.id.in_(cancel_in.ids))
+
+    matched = query.all()
+    cancelled = cancel_deployments(
+        db, redis,
+        {cluster_id for _, cluster_id in matched},
+        [deployment_id for deployment_id, _ in matched],
+        (cancel_in.status,) if cancel_in.status else CANCELLABLE
+    )
+
+    # One pass per cluster refills what was freed and refreshes estimates
+    cluster_ids = sorted({row.cluster_id for row in cancelled})
+    queue.signal(redis, cluster_ids)
+
+    return DeploymentCancelResult(
+        cancelled=len(cancelled),
+        deployment_ids=sorted(row.id for row in cancelled),
+        cluster_ids=cluster_ids
+    )
+
+@router.post(
+    "/{deployment_id}/cancel",
+    response_model=Deployment,
+    dependencies=[Depends(rate_limit("deployments:cancel"))]
+)
 async def cancel_deployment(
     *,
     db: Session = Depends(deps.get_db),
@@ -334,27 +507,25 @@ async def cancel_deployment(
             detail="Deployment not found or access denied"
         )
     
-    cluster = db.query(Cluster).get(deployment.cluster_id)
+    # Lock the cluster before touching its availability, then re-read the
+    # deployment in case the scheduler changed it meanwhile
+    cluster = lock_cluster(db, deployment.cluster_id)
+    db.refresh(deployment)
     
     if deployment.status == DeploymentStatus.RUNNING:
-        # Deallocate resources and trigger rescheduling
-        deallocate_resources(db, cluster, deployment)
+        # Deallocate resources and let the scheduler refill the cluster
+        deployment.status = DeploymentStatus.FAILED
+        deployment.completed_at = datetime.utcnow()
+        record_events(db, cluster.organization_id, WebhookEventType.CANCELLED, [deployment], CANCEL_REQUESTED)
+        deallocate_resources(db, redis, cluster, deployment)
+        queue.signal(redis, [cluster.id])
     elif deployment.status == DeploymentStatus.PENDING:
-        # Remove from pending queue
-        deployment_data = {
-            "id": deployment.id,
-            "name": deployment.name,
-            "cpu_required": deployment.cpu_required,
-            "ram_required": deployment.ram_required,
-            "gpu_required": deployment.gpu_required
-        }
-        redis.zrem(
-            f"cluster:{cluster.id}:pending_deployments",
-            json.dumps(deployment_data)
-        )
-    
-    deployment.status = DeploymentStatus.FAILED
-    deployment.completed_at = datetime.utcnow()
+        # Remove from pending queue; a pass refreshes the estimates behind it
+        queue.dequeue(redis, deployment)
+        deployment.status = DeploymentStatus.FAILED
+        deployment.completed_at = datetime.utcnow()
+        record_events(db, cluster.organization_id, WebhookEventType.CANCELLED, [deployment], CANCEL_REQUESTED)
+        queue.signal(redis, [cluster.id])
     db.commit()
     
     return deployment
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from typing import List
 import secrets
 from app.core import deps
+from app.core.rate_limit import rate_limit
 from app.schemas.organization import Organization, OrganizationCreate, OrganizationInvite
+from app.schemas.quota import Quota, QuotaCreate
 from app.models.organization import Organization as OrganizationModel
+from app.models.quota import Quota as QuotaModel
 from app.models.user import User
 
 router = APIRouter()
@@ -39,8 +43,9 @@ def create_organization(
         db.commit()
         db.refresh(organization)
         
-        # Add current user to organization
+        # Add current user to organization as its admin
         current_user.organization_id = organization.id
+        current_user.is_org_admin = True
         db.commit()
         
         return organization
@@ -110,3 +115,87 @@ def get_invite(
         )
 
     
+
+@router.put(
+    "/quotas",
+    response_model=Quota,
+    dependencies=[Depends(rate_limit("quotas:set"))]
+)
+def set_quota(
+    *,
+    db: Session = Depends(deps.get_db),
+    quota_in: QuotaCreate,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Set the most a member (or, without user_id, every member by default)
+    may hold on any one cluster of the organization. Organization admins only
+    """
+    if not current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User doesn't belongs to an organization"
+        )
+    
+    if not current_user.is_org_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only organization admins can set quotas"
+        )
+    
+    if quota_in.user_id is not None:
+        member = db.query(User).filter(
+            User.id == quota_in.user_id,
+            User.organization_id == current_user.organization_id
+        ).first()
+        if not member:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found in organization"
+            )
+    
+    # Upsert, so concurrent requests cannot add a second row for the same member
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert(QuotaModel).values(
+        organization_id=current_user.organization_id,
+        user_id=quota_in.user_id,
+        limits=quota_in.limit_vector()
+    )
+    if quota_in.user_id is None:
+        statement = statement.on_conflict_do_update(
+            index_elements=[QuotaModel.organization_id],
+            index_where=QuotaModel.user_id.is_(None),
+            set_={"limits": statement.excluded.limits}
+        )
+    else:
+        statement = statement.on_conflict_do_update(
+            index_elements=[QuotaModel.organization_id, QuotaModel.user_id],
+            set_={"limits": statement.excluded.limits}
+        )
+    db.execute(statement)
+    db.commit()
+    
+    return db.query(QuotaModel).filter(
+        QuotaModel.organization_id == current_user.organization_id,
+        QuotaModel.user_id == quota_in.user_id if quota_in.user_id is not None
+        else QuotaModel.user_id.is_(None)
+    ).one()
+
+@router.get("/quotas", response_model=List[Quota])
+def list_quotas(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    List the organization's quotas
+    """
+    if not current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User doesn't belongs to an organization"
+        )
+    
+    return db.query(QuotaModel).filter(
+        QuotaModel.organization_id == current_user.organization_id
+    ).all()
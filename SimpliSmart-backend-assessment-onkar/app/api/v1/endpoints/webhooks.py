@@ -0,0 +1,178 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List
+from datetime import datetime, timedelta
+from app.core import deps
+from app.core.rate_limit import rate_limit
+from app.schemas.webhook import WebhookEndpoint, WebhookEndpointCreate, WebhookReplay, WebhookStats
+from app.models.webhook import (
+    WebhookEndpoint as WebhookEndpointModel, WebhookEvent as WebhookEventModel, WebhookEventStatus
+)
+from app.models.user import User
+from app.webhooks.addresses import BlockedAddress, resolve
+
+router = APIRouter()
+
+# Seconds of deliveries GET /stats measures throughput and lag over
+STATS_WINDOW_SECONDS = 300
+
+def require_organization(current_user: User) -> int:
+    if not current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User must belong to an organization to manage webhooks"
+        )
+    return current_user.organization_id
+
+def get_endpoint(db: Session, endpoint_id: int, organization_id: int) -> WebhookEndpointModel:
+    endpoint = db.query(WebhookEndpointModel).filter(
+        WebhookEndpointModel.id == endpoint_id,
+        WebhookEndpointModel.organization_id == organization_id
+    ).first()
+    if not endpoint:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook endpoint not found"
+        )
+    return endpoint
+
+def seconds_between(db: Session, start, end):
+    """SQL expression for the seconds from ``start`` to ``end``"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.extract("epoch", end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400
+
+@router.post(
+    "/",
+    response_model=WebhookEndpoint,
+    dependencies=[Depends(rate_limit("webhooks:update"))]
+)
+def create_endpoint(
+    *,
+    db: Session = Depends(deps.get_db),
+    endpoint_in: WebhookEndpointCreate,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Register a URL to be sent the organization's deployment status changes
+    (deployment.started, deployment.completed, deployment.cancelled).
+    The URL must resolve to public addresses only.
+    """
+    organization_id = require_organization(current_user)
+    try:
+        resolve(str(endpoint_in.url))
+    except BlockedAddress as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Webhook URL is not allowed: {exc}"
+        )
+    endpoint = WebhookEndpointModel(
+        organization_id=organization_id,
+        url=str(endpoint_in.url),
+        secret=endpoint_in.secret
+    )
+    db.add(endpoint)
+    db.commit()
+    db.refresh(endpoint)
+    return endpoint
+
+@router.get("/", response_model=List[WebhookEndpoint])
+def list_endpoints(
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    List the organization's webhook endpoints
+    """
+    return db.query(WebhookEndpointModel).filter(
+        WebhookEndpointModel.organization_id == require_organization(current_user)
+    ).all()
+
+@router.get("/stats", response_model=WebhookStats)
+def get_stats(
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Delivery backlog, lag and throughput of the organization's endpoints
+    """
+    endpoint_ids = db.query(WebhookEndpointModel.id).filter(
+        WebhookEndpointModel.organization_id == require_organization(current_user)
+    )
+    events = db.query(WebhookEventModel).filter(WebhookEventModel.endpoint_id.in_(endpoint_ids))
+    now = datetime.utcnow()
+
+    counts = dict(
+        events.with_entities(WebhookEventModel.status, func.count()).filter(
+            WebhookEventModel.status.in_([WebhookEventStatus.PENDING, WebhookEventStatus.DEAD])
+        ).group_by(WebhookEventModel.status).all()
+    )
+    oldest_pending = events.with_entities(func.min(WebhookEventModel.created_at)).filter(
+        WebhookEventModel.status == WebhookEventStatus.PENDING
+    ).scalar()
+    delivered, mean_lag = events.with_entities(
+        func.count(),
+        func.avg(seconds_between(db, WebhookEventModel.created_at, WebhookEventModel.delivered_at))
+    ).filter(
+        WebhookEventModel.status == WebhookEventStatus.DELIVERED,
+        WebhookEventModel.delivered_at >= now - timedelta(seconds=STATS_WINDOW_SECONDS)
+    ).one()
+
+    return WebhookStats(
+        pending=counts.get(WebhookEventStatus.PENDING, 0),
+        dead=counts.get(WebhookEventStatus.DEAD, 0),
+        oldest_pending_seconds=(now - oldest_pending).total_seconds() if oldest_pending else 0.0,
+        delivered_per_second=delivered / STATS_WINDOW_SECONDS,
+        mean_lag_seconds=float(mean_lag or 0.0),
+        window_seconds=STATS_WINDOW_SECONDS
+    )
+
+@router.delete(
+    "/{endpoint_id}",
+    response_model=WebhookEndpoint,
+    dependencies=[Depends(rate_limit("webhooks:update"))]
+)
+def delete_endpoint(
+    *,
+    db: Session = Depends(deps.get_db),
+    endpoint_id: int,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Remove a webhook endpoint together with its undelivered events
+    """
+    endpoint = get_endpoint(db, endpoint_id, require_organization(current_user))
+    deleted = WebhookEndpoint.model_validate(endpoint)
+    db.query(WebhookEventModel).filter(
+        WebhookEventModel.endpoint_id == endpoint.id
+    ).delete(synchronize_session=False)
+    db.delete(endpoint)
+    db.commit()
+    return deleted
+
+@router.post(
+    "/{endpoint_id}/replay",
+    response_model=WebhookReplay,
+    dependencies=[Depends(rate_limit("webhooks:update"))]
+)
+def replay_dead_events(
+    *,
+    db: Session = Depends(deps.get_db),
+    endpoint_id: int,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Send an endpoint's dead-lettered events again, with fresh attempts
+    """
+    endpoint = get_endpoint(db, endpoint_id, require_organization(current_user))
+    replayed = db.query(WebhookEventModel).filter(
+        WebhookEventModel.endpoint_id == endpoint.id,
+        WebhookEventModel.status == WebhookEventStatus.DEAD
+    ).update({
+        WebhookEventModel.status: WebhookEventStatus.PENDING,
+        WebhookEventModel.attempts: 0,
+        WebhookEventModel.next_attempt_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    return WebhookReplay(replayed=replayed)
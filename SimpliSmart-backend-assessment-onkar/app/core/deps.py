@@ -1,15 +1,32 @@
+import time
 from typing import Generator
 from fastapi import Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.core.config import settings
+from app.db.session import SessionLocal, get_replicas, replica_engine
 from app.models.user import User
 
-def get_db() -> Generator:
+# Requests that never write; only these may read from a replica
+READ_ONLY_METHODS = ("GET", "HEAD")
+# Session key: epoch second until which the client reads its writes from the primary
+READ_PRIMARY_UNTIL = "read_primary_until"
+
+def get_db(request: Request) -> Generator:
     """
-    Database dependency
+    Database dependency. Read-only requests use a read replica when one is
+    configured and within REPLICA_MAX_LAG_SECONDS, writes use the primary.
+    A client that wrote in the last READ_YOUR_WRITES_SECONDS also reads
+    from the primary, so it always sees its own writes.
     """
+    bind = None
+    if get_replicas():
+        if request.method not in READ_ONLY_METHODS:
+            request.session[READ_PRIMARY_UNTIL] = time.time() + settings.READ_YOUR_WRITES_SECONDS
+        elif request.session.get(READ_PRIMARY_UNTIL, 0) <= time.time():
+            bind = replica_engine()
+
     try:
-        db = SessionLocal()
+        db = SessionLocal(bind=bind) if bind is not None else SessionLocal()
         yield db
     finally:
         db.close()
@@ -0,0 +1,266 @@
+"""
+Idempotency keys for retried writes.
+
+A client that times out and retries ``POST /deployments/`` must not
+create a second deployment, queue entry and scheduling pass. Requests to
+the routes in ``IDEMPOTENT_ROUTES`` may carry an ``Idempotency-Key``
+header; the first request with a key runs and its response is stored in
+Redis for IDEMPOTENCY_TTL_SECONDS, and any retry with the same key gets
+that response back (marked ``Idempotent-Replayed: true``) without reaching
+the endpoint, its dependencies or Postgres.
+
+Keys are per user, taken from the signed session cookie rather than the
+database. The first request holds a lock (SET NX) while it runs, so a
+duplicate arriving meanwhile waits for its response instead of racing it;
+one still waiting after IDEMPOTENCY_WAIT_SECONDS gets 409 with Retry-After.
+A lock whose holder died expires after IDEMPOTENCY_LOCK_SECONDS. Each
+lock carries a random token and the response is stored, or the key
+released, only while the lock is still the request's own, so a request
+that outran its lock cannot overwrite the answer of one that took over.
+
+Only final answers are stored: server errors and 429s release the key so
+the retry runs again. Rate limit headers describe the moment of the first
+request and are not stored. Reusing a key with a different request is a
+422.
+Without Redis requests run as if they carried no key.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+import time
+import uuid
+from typing import Optional
+
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+HEADER = "idempotency-key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# Seconds between checks while waiting for the first request
+POLL_SECONDS = 0.05
+
+# (method, path) of the routes that honour the header
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(r"^/api/v1/deployments/$")),
+    ("POST", re.compile(r"^/api/v1/deployments/cancel$")),
+    ("POST", re.compile(r"^/api/v1/deployments/\d+/cancel$")),
+]
+
+# Placeholder value while the first request runs
+IN_PROGRESS = "in_progress"
+# Response headers that are not replayed
+UNSTORED_HEADER_PREFIXES = ("ratelimit-", "retry-after")
+
+# Store the response, or release the key, only if the lock is still ours
+_STORE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return 0
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def idempotency_key(user_id: int, method: str, path: str, key: str) -> str:
+    return f"idempotency:{user_id}:{method}:{path}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def is_idempotent(method: str, path: str) -> bool:
+    return any(method == route_method and pattern.match(path) for route_method, pattern in IDEMPOTENT_ROUTES)
+
+
+def should_store(status_code: int) -> bool:
+    """Final answers only; a retry after these should run again"""
+    return status_code < 500 and status_code != 429
+
+
+def stored_headers(headers: list) -> list:
+    return [(name, value) for name, value in headers if not name.lower().startswith(UNSTORED_HEADER_PREFIXES)]
+
+
+class IdempotencyMiddleware:
+    """Sits inside SessionMiddleware, which provides the user id"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not is_idempotent(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        key = dict(scope["headers"]).get(HEADER.encode())
+        user_id = scope.get("session", {}).get("user_id")
+        if key is None or not user_id:
+            await self.app(scope, receive, send)
+            return
+        key = key.decode("latin-1")
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await JSONResponse(
+                {"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"},
+                status_code=400
+            )(scope, receive, send)
+            return
+
+        # The body is read up front for the fingerprint, then replayed to the app
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        redis_key = idempotency_key(user_id, scope["method"], scope["path"], key)
+
+        lock = json.dumps({"state": IN_PROGRESS, "fingerprint": fingerprint, "token": uuid.uuid4().hex})
+        try:
+            stored = await self.acquire(redis_key, lock, fingerprint)
+        except RedisError:
+            logger.warning("Idempotency store unavailable, running request", exc_info=True)
+            stored = None
+            redis_key = None
+
+        if stored is not None:
+            await self.replay(stored, fingerprint, scope, receive, send)
+            return
+        await self.run(scope, body, receive, send, redis_key, lock, fingerprint)
+
+    async def acquire(self, redis_key: str, lock: str, fingerprint: str) -> Optional[dict]:
+        """
+        Take the key's lock and return None, or return the stored (or
+        still running) entry of an earlier request with the key
+        """
+        redis = get_redis()
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            if await run_in_threadpool(
+                redis.set, redis_key, lock, nx=True, ex=settings.IDEMPOTENCY_LOCK_SECONDS
+            ):
+                return None
+            raw = await run_in_threadpool(redis.get, redis_key)
+            if raw is None:
+                # Released between the two calls; try to take it again
+                continue
+            stored = json.loads(raw)
+            if (
+                stored["state"] != IN_PROGRESS
+                or stored["fingerprint"] != fingerprint
+                or time.monotonic() >= deadline
+            ):
+                return stored
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def replay(self, stored: dict, fingerprint: str, scope: Scope, receive: Receive, send: Send):
+        if stored["fingerprint"] != fingerprint:
+            response = JSONResponse(
+                {"detail": "Idempotency-Key was already used for a different request"},
+                status_code=422
+            )
+        elif stored["state"] == IN_PROGRESS:
+            response = JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still being processed"},
+                status_code=409,
+                headers={"Retry-After": "1"}
+            )
+        else:
+            await send({
+                "type": "http.response.start",
+                "status": stored["status"],
+                "headers": [
+                    (name.encode("latin-1"), value.encode("latin-1"))
+                    for name, value in stored["headers"]
+                ] + [(REPLAYED_HEADER.lower().encode(), b"true")],
+            })
+            await send({"type": "http.response.body", "body": base64.b64decode(stored["body"])})
+            return
+        await response(scope, receive, send)
+
+    async def run(
+        self,
+        scope: Scope,
+        body: bytes,
+        receive: Receive,
+        send: Send,
+        redis_key: Optional[str],
+        lock: str,
+        fingerprint: str
+    ):
+        """Run the request, then store its response under the key or release it"""
+        sent = False
+
+        async def receive_body() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # The body is consumed; from here on only a disconnect can arrive
+            return await receive()
+
+        status_code = 500
+        headers = []
+        chunks = []
+
+        async def send_and_record(message: Message):
+            nonlocal status_code, headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_and_record)
+        finally:
+            if redis_key is not None:
+                await self.finish(redis_key, lock, fingerprint, status_code, headers, b"".join(chunks))
+
+    async def finish(
+        self,
+        redis_key: str,
+        lock: str,
+        fingerprint: str,
+        status_code: int,
+        headers: list,
+        body: bytes
+    ):
+        """Store the response or release the key, unless the lock expired and was taken over"""
+        redis = get_redis()
+        try:
+            if should_store(status_code):
+                done = await run_in_threadpool(redis.register_script(_STORE), keys=[redis_key], args=[
+                    lock,
+                    json.dumps({
+                        "state": "done",
+                        "fingerprint": fingerprint,
+                        "status": status_code,
+                        "headers": stored_headers(headers),
+                        "body": base64.b64encode(body).decode(),
+                    }),
+                    settings.IDEMPOTENCY_TTL_SECONDS
+                ])
+            else:
+                done = await run_in_threadpool(redis.register_script(_RELEASE), keys=[redis_key], args=[lock])
+            if not done:
+                logger.warning("Idempotency lock for %s expired before the request finished", redis_key)
+        except RedisError:
+            logger.warning("Could not store idempotent response for %s", redis_key, exc_info=True)
@@ -0,0 +1,179 @@
+"""
+Token-bucket rate limiting for write endpoints.
+
+Buckets live in Redis and are refilled and drawn down atomically by a Lua
+script, so every API worker shares one budget per user and per organization
+for each route. A caller that has just been refused is refused again
+in-process until its retry time without a Redis round trip, so a client
+stuck in a tight retry loop costs neither Redis nor the scheduler anything.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Sequence, Tuple
+
+from fastapi import Depends, HTTPException, Response, status
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.core import deps
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# KEYS: one bucket per scope
+# ARGV: cost, ttl in ms, then rate per second and capacity for each key
+_TOKEN_BUCKET = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local allowed = 1
+local wait_ms = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[1 + 2 * i]) / 1000
+    local capacity = tonumber(ARGV[2 + 2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now_ms
+    tokens = math.min(capacity, tokens + math.max(0, now_ms - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        allowed = 0
+        wait_ms = math.max(wait_ms, math.ceil((cost - tokens) / rate))
+    end
+end
+local remaining = -1
+local reset_ms = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[1 + 2 * i]) / 1000
+    local capacity = tonumber(ARGV[2 + 2 * i])
+    local tokens = levels[i]
+    if allowed == 1 then
+        tokens = tokens - cost
+    end
+    if remaining < 0 or tokens < remaining then
+        remaining = tokens
+    end
+    reset_ms = math.max(reset_ms, math.ceil((capacity - tokens) / rate))
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now_ms)
+    redis.call('PEXPIRE', key, ARGV[2])
+end
+return {allowed, math.floor(remaining), wait_ms, reset_ms}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds
+    reset: float  # seconds until the tightest bucket is full again
+
+    def headers(self) -> dict:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(max(self.remaining, 0)),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class RateLimiter:
+    """
+    Checks a set of token buckets in one Redis call.
+
+    ``buckets`` is a sequence of ``(key, per_minute, burst)``; a request is
+    admitted only if every bucket has a token, and then draws from all.
+    """
+
+    def __init__(self, local_cache_size: int = 10000):
+        self.local_cache_size = local_cache_size
+        self._refused: "OrderedDict[Tuple[str, ...], float]" = OrderedDict()
+        # Sync dependencies run in the threadpool; guards every change to _refused
+        self._lock = threading.Lock()
+        self._script = None
+
+    def check(self, redis: Redis, buckets: Sequence[Tuple[str, int, int]]) -> RateLimitResult:
+        limit = buckets[0][2]
+        keys = tuple(key for key, _, _ in buckets)
+        now = time.monotonic()
+
+        # Fast path: still inside the retry window of a recent refusal
+        retry_at = self._refused.get(keys)
+        if retry_at is not None:
+            if retry_at > now:
+                return RateLimitResult(False, limit, 0, retry_at - now, retry_at - now)
+            with self._lock:
+                self._refused.pop(keys, None)
+
+        args = [1, settings.RATE_LIMIT_BUCKET_TTL_SECONDS * 1000]
+        for _, per_minute, burst in buckets:
+            args.extend((per_minute / 60, burst))
+        if self._script is None:
+            self._script = redis.register_script(_TOKEN_BUCKET)
+        try:
+            allowed, remaining, wait_ms, reset_ms = self._script(
+                keys=list(keys), args=args, client=redis
+            )
+        except RedisError:
+            # Fail open: losing the limiter must not take the API down with it
+            logger.warning("Rate limiter unavailable, admitting request", exc_info=True)
+            return RateLimitResult(True, limit, limit, 0, 0)
+
+        result = RateLimitResult(bool(allowed), limit, int(remaining), wait_ms / 1000, reset_ms / 1000)
+        if not result.allowed:
+            with self._lock:
+                self._refused[keys] = now + result.retry_after
+                self._refused.move_to_end(keys)
+                while len(self._refused) > self.local_cache_size:
+                    self._refused.popitem(last=False)
+        return result
+
+
+limiter = RateLimiter()
+
+
+def rate_limit(route: str):
+    """
+    Dependency limiting ``route`` per user and per organization.
+    Sets the RateLimit-* headers and answers 429 with Retry-After.
+    """
+    def dependency(
+        response: Response,
+        redis: Redis = Depends(get_redis),
+        current_user: User = Depends(deps.get_current_user)
+    ):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        buckets = [(
+            f"ratelimit:{route}:user:{current_user.id}",
+            settings.RATE_LIMIT_USER_PER_MINUTE,
+            settings.RATE_LIMIT_USER_BURST
+        )]
+        if current_user.organization_id:
+            buckets.append((
+                f"ratelimit:{route}:org:{current_user.organization_id}",
+                settings.RATE_LIMIT_ORG_PER_MINUTE,
+                settings.RATE_LIMIT_ORG_BURST
+            ))
+
+        result = limiter.check(redis, buckets)
+        if not result.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers=result.headers()
+            )
+        response.headers.update(result.headers())
+
+    return dependency
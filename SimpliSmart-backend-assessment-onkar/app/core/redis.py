@@ -1,12 +1,23 @@
+from typing import Optional
 from redis import Redis
 from app.core.config import settings
 
-redis_client = Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB,
-    decode_responses=True
-)
+_client: Optional[Redis] = None
 
 def get_redis() -> Redis:
-    return redis_client 
\ No newline at end of file
+    """Shared client, created on first use rather than at import"""
+    global _client
+    if _client is None:
+        _client = Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True
+        )
+    return _client
+
+def close_redis():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -0,0 +1,149 @@
+"""
+Named resource vectors.
+
+Every schedulable resource is listed once in ``RESOURCES``. Clusters and
+deployments store their quantities as a packed vector in that fixed order, so
+adding a resource is a configuration change instead of a new column on every
+model and a new line in every scheduling function.
+"""
+import operator
+import sys
+from array import array
+from typing import Annotated, Dict, Iterable, Mapping, Sequence, Tuple
+
+from pydantic import AfterValidator
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.core.config import settings
+
+# Resources exposed as flat ``<name>_limit`` / ``<name>_required`` fields
+LEGACY_RESOURCES: Tuple[str, ...] = ("cpu", "ram", "gpu")
+
+# Fixed vector order. New resources (e.g. accelerator types such as
+# ``tpu_v4``) are appended through EXTRA_RESOURCES; never reorder or remove
+# entries, stored vectors are positional.
+RESOURCES: Tuple[str, ...] = LEGACY_RESOURCES + ("gpu_memory", "disk") + tuple(
+    name.strip() for name in settings.EXTRA_RESOURCES.split(",") if name.strip()
+)
+EXTRA_RESOURCES: Tuple[str, ...] = RESOURCES[len(LEGACY_RESOURCES):]
+RESOURCE_INDEX: Dict[str, int] = {name: i for i, name in enumerate(RESOURCES)}
+DIMENSIONS = len(RESOURCES)
+
+
+class ResourceVector(tuple):
+    """
+    Immutable fixed-order vector of resource quantities.
+
+    Arithmetic is element-wise, so ``available - required`` and
+    ``available.fits(required)`` work on every resource at once.
+    """
+    __slots__ = ()
+
+    def __new__(cls, values: Iterable[float] = ()):
+        values = [float(v) for v in values]
+        if len(values) < DIMENSIONS:
+            # Vectors stored before a resource was appended read it as zero
+            values.extend([0.0] * (DIMENSIONS - len(values)))
+        return super().__new__(cls, values)
+
+    @classmethod
+    def zeros(cls) -> "ResourceVector":
+        return cls()
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[str, float]) -> "ResourceVector":
+        """Build a vector from ``{name: quantity}``, rejecting unknown names"""
+        values = [0.0] * DIMENSIONS
+        for name, quantity in mapping.items():
+            if name not in RESOURCE_INDEX:
+                raise ValueError(f"Unknown resource '{name}'")
+            values[RESOURCE_INDEX[name]] = quantity
+        return cls(values)
+
+    def __add__(self, other: Iterable[float]) -> "ResourceVector":
+        return ResourceVector(map(operator.add, self, other))
+
+    def __sub__(self, other: Iterable[float]) -> "ResourceVector":
+        return ResourceVector(map(operator.sub, self, other))
+
+    def fits(self, required: Sequence[float]) -> bool:
+        """True if every quantity in ``required`` is available in this vector"""
+        # CPU alone refuses most requests that do not fit; comparing it first
+        # answers those as fast as the flat check did (benchmarks/resource_fits.py)
+        return self[0] >= required[0] and all(map(operator.ge, self, required))
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(zip(RESOURCES, self))
+
+
+def build_vector(
+    cpu: float,
+    ram: float,
+    gpu: float,
+    extra: Mapping[str, float] = None
+) -> ResourceVector:
+    """Combine the flat legacy fields with any extra named resources"""
+    mapping = dict(extra or {})
+    mapping.update(cpu=cpu, ram=ram, gpu=gpu)
+    return ResourceVector.from_mapping(mapping)
+
+
+def validate_extra_resources(mapping: Mapping[str, float]) -> Dict[str, float]:
+    """Reject unknown or negative extra resources"""
+    for name, quantity in mapping.items():
+        if name not in EXTRA_RESOURCES:
+            raise ValueError(
+                f"Unknown resource '{name}', expected one of {', '.join(EXTRA_RESOURCES)}"
+            )
+        if quantity < 0:
+            raise ValueError(f"Resource '{name}' must not be negative")
+    return dict(mapping)
+
+
+# Schema type for the ``resources`` maps of extra named resources
+ExtraResources = Annotated[Dict[str, float], AfterValidator(validate_extra_resources)]
+
+
+def vector_component(attr: str, name: str) -> property:
+    """Read-only model property exposing one resource of a vector column"""
+    index = RESOURCE_INDEX[name]
+
+    def getter(self):
+        vector = getattr(self, attr)
+        return None if vector is None else vector[index]
+
+    return property(getter)
+
+
+def vector_extras(attr: str) -> property:
+    """Read-only model property exposing the non-legacy resources of a vector"""
+    def getter(self):
+        vector = getattr(self, attr)
+        if vector is None:
+            return {}
+        return {name: vector[RESOURCE_INDEX[name]] for name in EXTRA_RESOURCES}
+
+    return property(getter)
+
+
+class ResourceVectorType(TypeDecorator):
+    """Stores a ResourceVector as packed little-endian float64 values"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        packed = array("d", value)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        return packed.tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        packed = array("d")
+        packed.frombytes(value)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        return ResourceVector(packed)
@@ -5,4 +5,8 @@ from app.db.base_class import Base
 from app.models.user import User  # noqa
 from app.models.organization import Organization  # noqa
 from app.models.cluster import Cluster  # noqa
+from app.models.node import Node  # noqa
 from app.models.deployment import Deployment  # noqa
+from app.models.quota import Quota  # noqa
+from app.models.deployment_archive import DeploymentArchive  # noqa
+from app.models.webhook import WebhookEndpoint, WebhookEvent  # noqa
@@ -1,18 +1,28 @@
+import os
+from alembic import command
+from alembic.config import Config
 from sqlalchemy import create_engine, text
 from app.core.config import settings
 from app.db.base import Base
 
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")
+
 def reset_database():
-    """Drop all tables and recreate them"""
+    """Drop all tables and recreate them through the Alembic migrations"""
     engine = create_engine(settings.DATABASE_URL)
     
     # Drop all tables
     Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    engine.dispose()
     
     # Create all tables
-    Base.metadata.create_all(bind=engine)
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    command.upgrade(config, "head")
     
     print("Database reset completed successfully!")
 
 if __name__ == "__main__":
-    reset_database() 
\ No newline at end of file
+    reset_database()
@@ -1,6 +1,103 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import time
+from typing import List, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+logger = logging.getLogger(__name__)
+
+_engine: Optional[Engine] = None
+_replicas: Optional[List["Replica"]] = None
+_next_replica = itertools.count()
+
+# Seconds a Postgres standby is behind its primary; 0 when it has replayed
+# everything it received or is not a standby at all (a plain second
+# instance, as in local testing). NULL when the lag cannot be told.
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+def get_engine() -> Engine:
+    """
+    Create the engine on first use rather than at import, so importing the
+    app (workers, tests, CLIs) never opens a database connection
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+class Replica:
+    """A read replica and its lag, measured at most every REPLICA_LAG_CHECK_SECONDS"""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.lag: Optional[float] = None
+        self.checked_at = float("-inf")
+
+    def measure_lag(self) -> Optional[float]:
+        if self.engine.dialect.name != "postgresql":
+            return 0.0
+        with self.engine.connect() as connection:
+            lag = connection.execute(REPLICA_LAG_SQL).scalar()
+        return None if lag is None else max(float(lag), 0.0)
+
+    def current_lag(self) -> Optional[float]:
+        """Seconds behind the primary, None when unreachable or unknown"""
+        if time.monotonic() - self.checked_at >= settings.REPLICA_LAG_CHECK_SECONDS:
+            self.checked_at = time.monotonic()
+            try:
+                self.lag = self.measure_lag()
+            except SQLAlchemyError:
+                logger.warning("Read replica %s unreachable", self.engine.url.render_as_string())
+                self.lag = None
+        return self.lag
+
+def get_replicas() -> List[Replica]:
+    global _replicas
+    if _replicas is None:
+        _replicas = [
+            Replica(url.strip())
+            for url in settings.DATABASE_REPLICA_URLS.split(",")
+            if url.strip()
+        ]
+    return _replicas
+
+def replica_engine() -> Optional[Engine]:
+    """
+    Next replica within REPLICA_MAX_LAG_SECONDS, round robin; None when
+    there is none and reads have to go to the primary
+    """
+    healthy = [
+        replica for replica in get_replicas()
+        if replica.current_lag() is not None and replica.lag <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+    if not healthy:
+        return None
+    return healthy[next(_next_replica) % len(healthy)].engine
+
+def dispose_engine():
+    global _engine, _replicas
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+    for replica in _replicas or []:
+        replica.engine.dispose()
+    _replicas = None
+
+class LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        if "bind" not in local_kw:
+            get_engine()
+        return super().__call__(**local_kw)
+
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
+from app.core.resources import ResourceVectorType, vector_component, vector_extras
 from app.db.base_class import Base
 
 class Cluster(Base):
@@ -7,16 +8,22 @@ class Cluster(Base):
     name = Column(String, index=True)
     organization_id = Column(Integer, ForeignKey("organization.id"))
     
-    # Resource limits
-    cpu_limit = Column(Float)
-    ram_limit = Column(Float)
-    gpu_limit = Column(Float)
+    # Resource limits and available resources, packed in RESOURCES order
+    limits = Column(ResourceVectorType)
+    available = Column(ResourceVectorType)
     
-    # Available resources
-    cpu_available = Column(Float)
-    ram_available = Column(Float)
-    gpu_available = Column(Float)
+    # Flat views kept for the API schemas
+    cpu_limit = vector_component("limits", "cpu")
+    ram_limit = vector_component("limits", "ram")
+    gpu_limit = vector_component("limits", "gpu")
+    resources = vector_extras("limits")
+    
+    cpu_available = vector_component("available", "cpu")
+    ram_available = vector_component("available", "ram")
+    gpu_available = vector_component("available", "gpu")
+    resources_available = vector_extras("available")
     
     # Relationships
     organization = relationship("Organization", back_populates="clusters")
     deployments = relationship("Deployment", back_populates="cluster")
+    nodes = relationship("Node", back_populates="cluster")
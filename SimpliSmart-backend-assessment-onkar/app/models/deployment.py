@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, DateTime, Index
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
+from app.core.config import settings
+from app.core.resources import ResourceVectorType, vector_component, vector_extras
 from app.db.base_class import Base
 
 class DeploymentStatus(enum.Enum):
@@ -11,22 +13,45 @@ class DeploymentStatus(enum.Enum):
     COMPLETED = "completed"
 
 class Deployment(Base):
+    __table_args__ = (
+        # Per-cluster status scans: scheduling, reconciliation, listings
+        Index("ix_deployment_cluster_status", "cluster_id", "status"),
+        # Finished rows due for archiving (app/scheduler/archive.py)
+        Index("ix_deployment_status_completed", "status", "completed_at"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     cluster_id = Column(Integer, ForeignKey("cluster.id"))
+    owner_id = Column(Integer, ForeignKey("user.id"), nullable=True, index=True)
+    # Node it runs on, for clusters with nodes
+    node_id = Column(Integer, ForeignKey("node.id"), nullable=True)
     docker_image = Column(String)
     status = Column(Enum(DeploymentStatus))
     priority = Column(Integer, default=0)
     
-    # Resource requirements
-    cpu_required = Column(Float)
-    ram_required = Column(Float)
-    gpu_required = Column(Float)
+    # Runtime hint for scheduling, and the run time after which expiry
+    # completes it (DEPLOYMENT_TIMEOUT_SECONDS when unset)
+    expected_duration_seconds = Column(Integer, nullable=True)
+    time_limit_seconds = Column(Integer, nullable=True)
+    
+    # Resource requirements, packed in RESOURCES order
+    required = Column(ResourceVectorType)
+    
+    # Flat views kept for the API schemas
+    cpu_required = vector_component("required", "cpu")
+    ram_required = vector_component("required", "ram")
+    gpu_required = vector_component("required", "gpu")
+    resources = vector_extras("required")
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     
+    @property
+    def time_limit(self) -> int:
+        return self.time_limit_seconds or settings.DEPLOYMENT_TIMEOUT_SECONDS
+    
     # Relationships
     cluster = relationship("Cluster", back_populates="deployments")
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Float, Index
+from datetime import datetime
+from app.core.resources import ResourceVectorType, vector_component, vector_extras
+from app.db.base_class import Base
+from app.models.deployment import DeploymentStatus
+
+# Monthly partitions are named deploymentarchive_YYYY_MM (Postgres only)
+PARTITION_PREFIX = "deploymentarchive_"
+
+class DeploymentArchive(Base):
+    """
+    Finished deployments moved out of the deployment table by the archiver
+    (app/scheduler/archive.py). On Postgres the table is range-partitioned
+    by completed_at into monthly partitions, so queries bounded in time only
+    touch the months they need.
+    """
+    __table_args__ = (
+        Index("ix_deploymentarchive_org_completed", "organization_id", "completed_at"),
+        {"postgresql_partition_by": "RANGE (completed_at)"},
+    )
+
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True)
+    completed_at = Column(DateTime, primary_key=True)
+
+    # Copied from the cluster so org-scoped reads need no join
+    organization_id = Column(Integer, nullable=False)
+    name = Column(String)
+    cluster_id = Column(Integer, index=True)
+    owner_id = Column(Integer, nullable=True)
+    node_id = Column(Integer, nullable=True)
+    docker_image = Column(String)
+    status = Column(Enum(DeploymentStatus))
+    priority = Column(Integer)
+    expected_duration_seconds = Column(Integer, nullable=True)
+    time_limit_seconds = Column(Integer, nullable=True)
+
+    # Resource requirements, packed in RESOURCES order
+    required = Column(ResourceVectorType)
+
+    # Flat views kept for the API schemas
+    cpu_required = vector_component("required", "cpu")
+    ram_required = vector_component("required", "ram")
+    gpu_required = vector_component("required", "gpu")
+    resources = vector_extras("required")
+
+    # Timestamps
+    created_at = Column(DateTime)
+    started_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    # Seconds between start and completion, kept for stats aggregates
+    run_seconds = Column(Float, nullable=True)
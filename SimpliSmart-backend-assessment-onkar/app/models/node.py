@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy.orm import relationship
+from app.core.resources import ResourceVectorType, vector_component, vector_extras
+from app.db.base_class import Base
+
+class Node(Base):
+    """
+    One machine of a cluster. A cluster with nodes has limits equal to the
+    sum of its nodes' and every deployment it runs is placed on one node.
+    """
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    cluster_id = Column(Integer, ForeignKey("cluster.id"), index=True)
+    
+    # Capacity and free capacity, packed in RESOURCES order
+    limits = Column(ResourceVectorType)
+    available = Column(ResourceVectorType)
+    
+    # Flat views kept for the API schemas
+    cpu_limit = vector_component("limits", "cpu")
+    ram_limit = vector_component("limits", "ram")
+    gpu_limit = vector_component("limits", "gpu")
+    resources = vector_extras("limits")
+    
+    cpu_available = vector_component("available", "cpu")
+    ram_available = vector_component("available", "ram")
+    gpu_available = vector_component("available", "gpu")
+    resources_available = vector_extras("available")
+    
+    # Relationships
+    cluster = relationship("Cluster", back_populates="nodes")
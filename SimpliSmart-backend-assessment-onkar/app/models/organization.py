@@ -10,3 +10,4 @@ class Organization(Base):
     # Relationships
     users = relationship("User", back_populates="organization")
     clusters = relationship("Cluster", back_populates="organization")
+    quotas = relationship("Quota", back_populates="organization")
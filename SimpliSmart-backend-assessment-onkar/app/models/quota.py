@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Index, Integer, ForeignKey, UniqueConstraint, text
+from sqlalchemy.orm import relationship
+from app.core.resources import ResourceVectorType, vector_component, vector_extras
+from app.db.base_class import Base
+
+class Quota(Base):
+    """
+    Most a user may hold on any one cluster of their organization.
+    A row without user_id is the organization-wide default.
+    """
+    __table_args__ = (
+        UniqueConstraint("organization_id", "user_id"),
+        # NULL user_ids never collide in the constraint above, so the
+        # organization default needs its own partial index
+        Index(
+            "uq_quota_organization_default",
+            "organization_id",
+            unique=True,
+            postgresql_where=text("user_id IS NULL"),
+            sqlite_where=text("user_id IS NULL")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organization.id"), index=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=True)
+    
+    # Resource limits, packed in RESOURCES order
+    limits = Column(ResourceVectorType)
+    
+    # Flat views kept for the API schemas
+    cpu_limit = vector_component("limits", "cpu")
+    ram_limit = vector_component("limits", "ram")
+    gpu_limit = vector_component("limits", "gpu")
+    resources = vector_extras("limits")
+    
+    # Relationships
+    organization = relationship("Organization", back_populates="quotas")
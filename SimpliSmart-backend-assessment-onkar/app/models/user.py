@@ -8,6 +8,8 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
+    # Whoever created the organization; may set quotas
+    is_org_admin = Column(Boolean, default=False)
     organization_id = Column(Integer, ForeignKey("organization.id"))
     
     # Relationships
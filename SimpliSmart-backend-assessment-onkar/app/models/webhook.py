@@ -0,0 +1,56 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, DateTime, Index
+from sqlalchemy.orm import relationship
+import enum
+from datetime import datetime
+from app.db.base_class import Base
+
+class WebhookEventType(enum.Enum):
+    STARTED = "deployment.started"
+    COMPLETED = "deployment.completed"
+    CANCELLED = "deployment.cancelled"
+
+class WebhookEventStatus(enum.Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    # Gave up after WEBHOOK_MAX_ATTEMPTS; kept until replayed
+    DEAD = "dead"
+
+class WebhookEndpoint(Base):
+    """A URL of an organization that is sent its deployments' status changes"""
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organization.id"), index=True)
+    url = Column(String)
+    # Signs each request body (X-Webhook-Signature: sha256=<hmac>)
+    secret = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    events = relationship("WebhookEvent", back_populates="endpoint", cascade="all, delete-orphan")
+
+class WebhookEvent(Base):
+    """
+    Outbox row: one status change for one endpoint, written in the same
+    transaction as the change and sent by app/webhooks/delivery.py
+    """
+    __table_args__ = (
+        # The delivery worker's claim: due pending events
+        Index("ix_webhookevent_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    endpoint_id = Column(Integer, ForeignKey("webhookendpoint.id", ondelete="CASCADE"), index=True)
+    deployment_id = Column(Integer)
+    event = Column(Enum(WebhookEventType))
+    # JSON body of the event, serialized when it is recorded
+    payload = Column(Text)
+    status = Column(Enum(WebhookEventStatus), default=WebhookEventStatus.PENDING)
+    attempts = Column(Integer, default=0)
+    last_error = Column(String, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    delivered_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    endpoint = relationship("WebhookEndpoint", back_populates="events")
@@ -0,0 +1,107 @@
+"""
+Priority aging for the pending queues.
+
+With PRIORITY_AGING_SECONDS set, a queued entry moves up one band for every
+PRIORITY_AGING_SECONDS it waits, until it sits above every band a fresh
+entry can get (``aged_ceiling``). From then on nothing submitted later is
+ordered ahead of it except other aged entries with an earlier start tag, so
+steady higher-priority load can hold an entry of band ``w`` back for at most
+``aging_horizon(w)`` seconds; after that it only waits for what was already
+ahead of it.
+
+Scores are not recomputed on every tick. ``queue.enqueue`` records when the
+entry is next due a promotion in a per-cluster sorted set, and before each pass
+the worker promotes only the entries that are due, raising their score by
+whole bands in place; the start tag below the band is untouched (see
+``fairness.tag_from_score``). An entry is rewritten at most once per pass
+and never after reaching the ceiling. Entries that left the queue are
+dropped from the set when they come due.
+"""
+import math
+import time
+from typing import Optional
+
+from redis import Redis
+
+from app.core.config import settings
+from app.scheduler import fairness
+from app.scheduler.queue import aging_key, pending_queue_key
+
+# Due entries promoted per pass; the rest wait for the next one
+PROMOTE_BATCH_SIZE = 1000
+
+_PROMOTE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[5])
+local now = tonumber(ARGV[1])
+local step = tonumber(ARGV[2])
+local band = tonumber(ARGV[3])
+local ceiling = tonumber(ARGV[4])
+local promoted = 0
+for i = 1, #due, 2 do
+    local member = due[i]
+    local score = redis.call('ZSCORE', KEYS[1], member)
+    local levels = 0
+    local room = 0
+    if score then
+        levels = math.floor((now - tonumber(due[i + 1])) / step) + 1
+        room = math.floor((ceiling - tonumber(score)) / band)
+        levels = math.min(levels, room)
+    end
+    if levels > 0 then
+        -- ZINCRBY adds in double precision; the score never passes through Lua
+        redis.call('ZINCRBY', KEYS[1], levels * band, member)
+        promoted = promoted + 1
+    end
+    if levels > 0 and levels < room then
+        redis.call('ZINCRBY', KEYS[2], levels * step, member)
+    else
+        redis.call('ZREM', KEYS[2], member)
+    end
+end
+return promoted
+"""
+
+
+def aged_ceiling(policy: str = None) -> float:
+    """Band entries age up to: one above the highest band a fresh entry gets"""
+    return fairness.queue_weight(fairness.MAX_PRIORITY, 1, policy) + 1
+
+def aging_horizon(weight: float, policy: str = None, step: Optional[float] = None) -> float:
+    """
+    Seconds after which nothing submitted later is ordered ahead of an entry
+    of band ``weight``: the promotions it needs to clear every fresh band,
+    plus a sweep interval for the pass that applies the last one.
+    """
+    step = settings.PRIORITY_AGING_SECONDS if step is None else step
+    levels = math.floor(aged_ceiling(policy) - 1 - weight) + 1
+    return max(levels, 0) * step + settings.SCHEDULER_SWEEP_SECONDS
+
+
+def aged_weight(weight: float, waited: float, policy: str = None) -> float:
+    """Band an entry queued with ``weight`` has reached after ``waited`` seconds"""
+    if settings.PRIORITY_AGING_SECONDS <= 0:
+        return weight
+    levels = math.floor(waited / settings.PRIORITY_AGING_SECONDS)
+    room = math.floor(aged_ceiling(policy) - weight)
+    return weight + max(min(levels, room), 0)
+
+
+def promote_due(redis: Redis, cluster_id: int, now: Optional[float] = None) -> int:
+    """
+    Raise the entries of a cluster's queue that are due a promotion by the
+    bands they have earned since; returns how many moved. The worker runs
+    this at the start of each pass.
+    """
+    if settings.PRIORITY_AGING_SECONDS <= 0:
+        return 0
+    now = time.time() if now is None else now
+    return redis.register_script(_PROMOTE)(
+        keys=[pending_queue_key(cluster_id), aging_key(cluster_id)],
+        args=[
+            repr(now),
+            settings.PRIORITY_AGING_SECONDS,
+            repr(fairness.PRIORITY_BAND),
+            repr(aged_ceiling() * fairness.PRIORITY_BAND),
+            PROMOTE_BATCH_SIZE
+        ]
+    )
@@ -0,0 +1,139 @@
+"""
+Hot/cold split of the deployment table.
+
+Finished deployments older than ARCHIVE_AFTER_DAYS are moved in batches
+from ``deployment`` into ``deploymentarchive`` (monthly range partitions on
+Postgres), so scheduling, listing and stats over live deployments stop
+paying for history. Each batch is copied and deleted in one transaction;
+rows are claimed with SKIP LOCKED so the archiver never waits on the API.
+
+The scheduler worker runs it every ARCHIVE_INTERVAL_SECONDS.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import and_, or_, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.cluster import Cluster
+from app.models.deployment import Deployment, DeploymentStatus
+from app.models.deployment_archive import PARTITION_PREFIX, DeploymentArchive
+
+logger = logging.getLogger(__name__)
+
+FINISHED = (DeploymentStatus.COMPLETED, DeploymentStatus.FAILED)
+# Upper bound on batches per run so a large backlog never stalls a tick
+MAX_BATCHES_PER_RUN = 10
+
+
+def archive_horizon(now: Optional[datetime] = None) -> datetime:
+    """Deployments finished before this may already be archived"""
+    return (now or datetime.utcnow()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+def needs_archive(
+    deployment_status: Optional[DeploymentStatus],
+    completed_after: Optional[datetime] = None
+) -> bool:
+    """Whether a query with these filters can match archived deployments"""
+    if deployment_status is not None and deployment_status not in FINISHED:
+        return False
+    return completed_after is None or completed_after < archive_horizon()
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+def next_month(start: datetime) -> datetime:
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+def partition_name(start: datetime) -> str:
+    return f"{PARTITION_PREFIX}{start.year:04d}_{start.month:02d}"
+
+def ensure_partitions(db: Session, months: Iterable[datetime]):
+    """Create the monthly archive partitions a batch is about to land in"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for start in sorted(set(months)):
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} "
+            f"PARTITION OF {DeploymentArchive.__tablename__} "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{next_month(start):%Y-%m-%d}')"
+        ))
+
+
+def archive_batch(db: Session, horizon: datetime, batch_size: int) -> int:
+    """Move one batch of finished deployments; returns how many moved"""
+    rows = db.query(Deployment, Cluster.organization_id).join(
+        Cluster, Deployment.cluster_id == Cluster.id
+    ).filter(
+        Deployment.status.in_(FINISHED),
+        or_(
+            Deployment.completed_at < horizon,
+            # Rows finished before completed_at was always recorded
+            and_(Deployment.completed_at.is_(None), Deployment.created_at < horizon)
+        )
+    ).order_by(
+        Deployment.id
+    ).limit(batch_size).with_for_update(of=Deployment, skip_locked=True).all()
+
+    if not rows:
+        db.rollback()
+        return 0
+
+    archived = [
+        DeploymentArchive(
+            id=deployment.id,
+            completed_at=deployment.completed_at or deployment.created_at,
+            organization_id=organization_id,
+            name=deployment.name,
+            cluster_id=deployment.cluster_id,
+            owner_id=deployment.owner_id,
+            node_id=deployment.node_id,
+            docker_image=deployment.docker_image,
+            status=deployment.status,
+            priority=deployment.priority,
+            expected_duration_seconds=deployment.expected_duration_seconds,
+            time_limit_seconds=deployment.time_limit_seconds,
+            required=deployment.required,
+            created_at=deployment.created_at,
+            started_at=deployment.started_at,
+            run_seconds=(
+                (deployment.completed_at - deployment.started_at).total_seconds()
+                if deployment.started_at and deployment.completed_at else None
+            )
+        )
+        for deployment, organization_id in rows
+    ]
+    ensure_partitions(db, (month_start(row.completed_at) for row in archived))
+    db.add_all(archived)
+    db.flush()
+    db.query(Deployment).filter(
+        Deployment.id.in_([row.id for row in archived])
+    ).delete(synchronize_session=False)
+    db.commit()
+    db.expunge_all()
+    return len(archived)
+
+def archive_finished_deployments(
+    db: Session,
+    now: Optional[datetime] = None,
+    keep_going: Optional[Callable[[], bool]] = None
+) -> int:
+    """
+    Archive what is due, at most MAX_BATCHES_PER_RUN batches, stopping
+    early once ``keep_going`` returns False; returns rows moved
+    """
+    horizon = archive_horizon(now)
+    moved = 0
+    for _ in range(MAX_BATCHES_PER_RUN):
+        if keep_going is not None and not keep_going():
+            break
+        count = archive_batch(db, horizon, settings.ARCHIVE_BATCH_SIZE)
+        moved += count
+        if count < settings.ARCHIVE_BATCH_SIZE:
+            break
+    if moved:
+        logger.info("Archived %s finished deployments", moved)
+    return moved
@@ -0,0 +1,248 @@
+"""
+What-if placement of proposed deployments.
+
+``POST /api/v1/deployments/simulate`` answers how a batch would fare if it
+were submitted now, without creating rows or touching Redis. ``snapshot``
+copies what a scheduling pass reads into memory, from the database only:
+cluster and node availability, pending and running deployments, and what
+each owner holds (the running deployments, which is what reconciliation
+rebuilds the Redis usage from). ``simulate`` then runs ``plan``, the live
+scheduler's policy, over each cluster's queue with the proposals added,
+places entries on nodes with the same ``NodePlacer``, and projects when
+the rest would start with ``eta.project_start_times``.
+
+The queue is rebuilt from the database: within a band, existing entries
+are ordered by submission instead of by their fair-share start tags, and
+proposals go behind them in the order given. Aging is applied from each
+entry's submission time. As with the live estimates, projected starts
+leave out quotas and nodes.
+"""
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.resources import ResourceVector
+from app.models.cluster import Cluster
+from app.models.deployment import Deployment, DeploymentStatus
+from app.models.node import Node
+from app.scheduler import aging, fairness
+from app.scheduler.eta import project_start_times
+from app.scheduler.placement import NodePlacer
+from app.scheduler.policy import Action, QueueEntry, plan
+from app.schemas.deployment import DeploymentCreate
+
+
+@dataclass
+class NodeSnapshot:
+    id: int
+    limits: ResourceVector
+    available: ResourceVector
+
+
+@dataclass
+class ClusterSnapshot:
+    id: int
+    limits: ResourceVector
+    available: ResourceVector
+    nodes: List[NodeSnapshot] = field(default_factory=list)
+    # Pending deployment rows, in no particular order
+    pending: list = field(default_factory=list)
+    # Expected finish (epoch seconds) and resources of each running deployment
+    running: List[Tuple[float, ResourceVector]] = field(default_factory=list)
+    usage: Dict[Optional[int], ResourceVector] = field(
+        default_factory=lambda: defaultdict(ResourceVector.zeros)
+    )
+
+
+def run_seconds(deployment) -> float:
+    """How long a deployment, or a row or proposal with its fields, is expected to run"""
+    return (
+        deployment.expected_duration_seconds
+        or deployment.time_limit_seconds
+        or settings.DEPLOYMENT_TIMEOUT_SECONDS
+    )
+
+def epoch(moment: Optional[datetime], default: float) -> float:
+    # Timestamps are stored as naive UTC
+    return moment.replace(tzinfo=timezone.utc).timestamp() if moment else default
+
+
+def snapshot(
+    db: Session,
+    organization_id: int,
+    cluster_ids: Iterable[int],
+    now: float
+) -> Dict[int, ClusterSnapshot]:
+    """The organization's clusters among ``cluster_ids``, as scheduling sees them"""
+    clusters = {
+        row.id: ClusterSnapshot(row.id, row.limits, row.available)
+        for row in db.query(Cluster.id, Cluster.limits, Cluster.available).filter(
+            Cluster.organization_id == organization_id,
+            Cluster.id.in_(set(cluster_ids))
+        )
+    }
+    if not clusters:
+        return clusters
+
+    for row in db.query(Node.id, Node.cluster_id, Node.limits, Node.available).filter(
+        Node.cluster_id.in_(list(clusters))
+    ):
+        clusters[row.cluster_id].nodes.append(NodeSnapshot(row.id, row.limits, row.available))
+
+    rows = db.query(
+        Deployment.id, Deployment.cluster_id, Deployment.owner_id, Deployment.status,
+        Deployment.priority, Deployment.required, Deployment.expected_duration_seconds,
+        Deployment.time_limit_seconds, Deployment.created_at, Deployment.started_at
+    ).filter(
+        Deployment.cluster_id.in_(list(clusters)),
+        Deployment.status.in_([DeploymentStatus.PENDING, DeploymentStatus.RUNNING])
+    )
+    for row in rows:
+        cluster = clusters[row.cluster_id]
+        if row.status == DeploymentStatus.PENDING:
+            cluster.pending.append(row)
+            continue
+        started = epoch(row.started_at, now)
+        finish = started + (row.time_limit_seconds or settings.DEPLOYMENT_TIMEOUT_SECONDS)
+        if row.expected_duration_seconds:
+            finish = min(finish, started + row.expected_duration_seconds)
+        cluster.running.append((max(finish, now), row.required))
+        cluster.usage[row.owner_id] = cluster.usage[row.owner_id] + row.required
+    return clusters
+
+
+def simulate_cluster(
+    cluster: ClusterSnapshot,
+    proposals: List[Tuple[int, DeploymentCreate, ResourceVector]],
+    owner_id: Optional[int],
+    quota_for: Callable[[Optional[int]], Optional[ResourceVector]],
+    now: float
+) -> Dict[int, dict]:
+    """Outcome of each proposal on one cluster, by proposal index"""
+    # Queue order: band (aged for existing entries), then submission;
+    # proposals get negative ids so they never collide with rows
+    queue = []
+    for row in cluster.pending:
+        queued_at = epoch(row.created_at, now)
+        weight = aging.aged_weight(fairness.deployment_weight(row), now - queued_at)
+        entry = QueueEntry(row.id, row.owner_id, row.priority, row.required)
+        queue.append(((-weight, 0, queued_at), entry, run_seconds(row)))
+    for index, proposal, required in proposals:
+        entry = QueueEntry(-(index + 1), owner_id, proposal.priority, required)
+        queue.append(((-fairness.deployment_weight(proposal), 1, index), entry, run_seconds(proposal)))
+    queue.sort(key=lambda item: item[0])
+
+    placer = NodePlacer(cluster.nodes, cluster.limits) if cluster.nodes else None
+    placements = {}
+
+    def place(entry: QueueEntry) -> bool:
+        node = placer.place(entry.required)
+        if node is not None:
+            placements[entry.id] = node.id
+        return node is not None
+
+    durations = {entry.id: seconds for _, entry, seconds in queue}
+    actions = {}
+    available = cluster.available
+    running = list(cluster.running)
+    for entry, action in plan(
+        (entry for _, entry, _ in queue), available, cluster.usage, quota_for,
+        place if placer else None
+    ):
+        actions[entry.id] = action
+        if action is Action.START:
+            available = available - entry.required
+            running.append((now + durations[entry.id], entry.required))
+
+    waiting = [entry for _, entry, _ in queue if actions.get(entry.id) is not Action.START]
+    estimates = project_start_times(
+        ((entry.id, entry.required, durations[entry.id]) for entry in waiting),
+        available, running, now
+    )
+
+    outcomes = {}
+    for index, _, _ in proposals:
+        entry_id = -(index + 1)
+        if actions.get(entry_id) is Action.START:
+            outcomes[index] = {
+                "outcome": "start",
+                "node_id": placements.get(entry_id),
+                "estimated_start_at": now,
+            }
+    for position, entry in enumerate(waiting, start=1):
+        if entry.id >= 0:
+            continue
+        outcome = {
+            "outcome": "queued",
+            "queue_position": position,
+            "estimated_start_at": estimates.get(entry.id),
+        }
+        if actions.get(entry.id) is Action.OVER_QUOTA:
+            outcome["detail"] = "Owner is at quota; it starts once their usage drops"
+        elif not cluster.limits.fits(entry.required):
+            outcome["detail"] = "Larger than the cluster; it would block the queue"
+        outcomes[-entry.id - 1] = outcome
+    return outcomes
+
+
+def simulate(
+    db: Session,
+    organization_id: int,
+    owner_id: Optional[int],
+    proposals: List[DeploymentCreate],
+    now: float = None
+) -> List[dict]:
+    """
+    Outcome of each proposal, in order: "start" (with its node on a
+    cluster with nodes), "queued" (with queue position and estimated
+    start when one can be projected) or "rejected" (with the reason the
+    create endpoint would give)
+    """
+    now = time.time() if now is None else now
+    clusters = snapshot(db, organization_id, (proposal.cluster_id for proposal in proposals), now)
+    quotas = {}
+
+    def quota_for(owner: Optional[int]) -> Optional[ResourceVector]:
+        if owner not in quotas:
+            quotas[owner] = fairness.load_quota(db, organization_id, owner)
+        return quotas[owner]
+
+    outcomes: Dict[int, dict] = {}
+    by_cluster = defaultdict(list)
+    for index, proposal in enumerate(proposals):
+        cluster = clusters.get(proposal.cluster_id)
+        required = proposal.required_vector()
+        if cluster is None:
+            outcomes[index] = {"outcome": "rejected", "detail": "Cluster not found or access denied"}
+        elif cluster.nodes and not any(node.limits.fits(required) for node in cluster.nodes):
+            outcomes[index] = {
+                "outcome": "rejected",
+                "detail": "No node of the cluster is large enough for this deployment"
+            }
+        else:
+            by_cluster[cluster.id].append((index, proposal, required))
+
+    for cluster_id, proposed in by_cluster.items():
+        outcomes.update(simulate_cluster(clusters[cluster_id], proposed, owner_id, quota_for, now))
+
+    results = []
+    for index, proposal in enumerate(proposals):
+        outcome = outcomes[index]
+        estimate = outcome.get("estimated_start_at")
+        results.append({
+            "index": index,
+            "cluster_id": proposal.cluster_id,
+            "outcome": outcome["outcome"],
+            "node_id": outcome.get("node_id"),
+            "queue_position": outcome.get("queue_position"),
+            "estimated_start_at": None if estimate is None else datetime.fromtimestamp(
+                estimate, timezone.utc
+            ),
+            "detail": outcome.get("detail"),
+        })
+    return results
@@ -0,0 +1,362 @@
+"""
+Scheduling passes and deployment expiry.
+
+These run only in the scheduler worker, except ``deallocate_resources``
+and ``cancel_deployments`` which the API uses when cancelling, and the
+preemption helpers used when a cluster is resized. Starts, completions and
+cancellations add their webhook outbox rows to the same transaction. Every change
+to a cluster's availability happens with its row locked, so the API and the
+worker never overwrite each other's updates.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from redis import Redis
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.resources import ResourceVector
+from app.models.cluster import Cluster
+from app.models.deployment import Deployment, DeploymentStatus
+from app.models.node import Node
+from app.models.webhook import WebhookEventType
+from app.scheduler import fairness
+from app.scheduler.placement import NodePlacer
+from app.scheduler.policy import Action, QueueEntry, plan
+from app.scheduler.queue import DEADLINES_KEY, enqueue, member_id, pending_queue_key, queue_member
+from app.scheduler.trace import PassTrace, blocked_detail, quota_detail
+from app.webhooks.outbox import CANCEL_REQUESTED, record_events
+
+# Queue entries fetched from Redis per round trip during a scheduling pass
+QUEUE_PAGE_SIZE = 100
+# Expired deployments completed per expiry sweep
+EXPIRY_BATCH_SIZE = 500
+# Ids per IN clause or Redis command when cancelling in bulk
+CANCEL_CHUNK_SIZE = 1000
+CANCELLABLE = (DeploymentStatus.PENDING, DeploymentStatus.RUNNING)
+
+
+def lock_cluster(db: Session, cluster_id: int) -> Optional[Cluster]:
+    """Load a cluster with its row locked until the session commits"""
+    return db.query(Cluster).filter(Cluster.id == cluster_id).with_for_update().first()
+
+def check_resource_availability(cluster: Cluster, deployment: Deployment) -> bool:
+    """Check if cluster has enough resources for deployment"""
+    return cluster.available.fits(deployment.required)
+
+def release_node(db: Session, deployment: Deployment):
+    """Give a deployment's share of its node back; nodes change under the cluster lock"""
+    if deployment.node_id is not None:
+        node = db.get(Node, deployment.node_id)
+        if node:
+            node.available = node.available + deployment.required
+
+def deallocate_resources(db: Session, redis: Redis, cluster: Cluster, deployment: Deployment):
+    """
+    Return a finished deployment's resources to its cluster and node. The
+    caller holds the cluster row lock and signals the worker afterwards.
+    """
+    cluster.available = cluster.available + deployment.required
+    release_node(db, deployment)
+    db.commit()
+
+    pipe = redis.pipeline(transaction=False)
+    fairness.record_allocation(
+        pipe, cluster, deployment.owner_id, ResourceVector.zeros() - deployment.required
+    )
+    pipe.zrem(DEADLINES_KEY, deployment.id)
+    pipe.execute()
+
+def cancel_deployments(
+    db: Session,
+    redis: Redis,
+    cluster_ids: Iterable[int],
+    deployment_ids: Iterable[int],
+    statuses: Tuple[DeploymentStatus, ...] = CANCELLABLE,
+    reason: str = CANCEL_REQUESTED
+) -> list:
+    """
+    Fail many deployments at once. Locks their clusters, re-reads which of
+    ``deployment_ids`` are still in ``statuses``, marks them failed with
+    set-based UPDATEs and gives running ones' resources back to their
+    clusters and nodes, all in one transaction. One pipeline then removes
+    queue entries and deadlines and releases fair-share usage. Returns the
+    cancelled rows with their status before cancelling; the caller signals
+    their clusters. ``reason`` goes with their deployment.cancelled events.
+    """
+    ids = sorted(set(deployment_ids))
+    id_chunks = [ids[start:start + CANCEL_CHUNK_SIZE] for start in range(0, len(ids), CANCEL_CHUNK_SIZE)]
+    # Lock in id order so concurrent bulk cancels cannot deadlock
+    clusters = {
+        cluster.id: cluster
+        for cluster in db.query(Cluster).filter(
+            Cluster.id.in_(sorted(set(cluster_ids)))
+        ).order_by(Cluster.id).with_for_update()
+    }
+    rows = [
+        row
+        for chunk in id_chunks
+        for row in db.query(
+            Deployment.id, Deployment.name, Deployment.cluster_id, Deployment.owner_id,
+            Deployment.node_id, Deployment.status, Deployment.required
+        ).filter(
+            Deployment.id.in_(chunk),
+            Deployment.cluster_id.in_(list(clusters)),
+            Deployment.status.in_(statuses)
+        )
+    ]
+    if not rows:
+        db.rollback()
+        return []
+
+    now = datetime.utcnow()
+    cancelled = [row.id for row in rows]
+    for start in range(0, len(cancelled), CANCEL_CHUNK_SIZE):
+        db.query(Deployment).filter(
+            Deployment.id.in_(cancelled[start:start + CANCEL_CHUNK_SIZE])
+        ).update(
+            {Deployment.status: DeploymentStatus.FAILED, Deployment.completed_at: now},
+            synchronize_session=False
+        )
+
+    # Sum what running ones held per cluster, node and owner
+    running = [row for row in rows if row.status == DeploymentStatus.RUNNING]
+    freed_clusters = defaultdict(ResourceVector.zeros)
+    freed_nodes = defaultdict(ResourceVector.zeros)
+    freed_owners = defaultdict(ResourceVector.zeros)
+    for row in running:
+        freed_clusters[row.cluster_id] = freed_clusters[row.cluster_id] + row.required
+        if row.node_id is not None:
+            freed_nodes[row.node_id] = freed_nodes[row.node_id] + row.required
+        freed_owners[row.cluster_id, row.owner_id] = freed_owners[row.cluster_id, row.owner_id] + row.required
+    for cluster_id, freed in freed_clusters.items():
+        clusters[cluster_id].available = clusters[cluster_id].available + freed
+    if freed_nodes:
+        for node in db.query(Node).filter(Node.id.in_(list(freed_nodes))):
+            node.available = node.available + freed_nodes[node.id]
+    by_organization = defaultdict(list)
+    for row in rows:
+        by_organization[clusters[row.cluster_id].organization_id].append(row)
+    for organization_id, cancelled_rows in by_organization.items():
+        record_events(db, organization_id, WebhookEventType.CANCELLED, cancelled_rows, reason)
+    db.commit()
+
+    members = defaultdict(list)
+    for row in rows:
+        if row.status == DeploymentStatus.PENDING:
+            members[row.cluster_id].append(queue_member(row))
+    pipe = redis.pipeline(transaction=False)
+    for cluster_id, queued in members.items():
+        for start in range(0, len(queued), CANCEL_CHUNK_SIZE):
+            pipe.zrem(pending_queue_key(cluster_id), *queued[start:start + CANCEL_CHUNK_SIZE])
+    for start in range(0, len(running), CANCEL_CHUNK_SIZE):
+        pipe.zrem(DEADLINES_KEY, *(row.id for row in running[start:start + CANCEL_CHUNK_SIZE]))
+    for (cluster_id, owner_id), freed in freed_owners.items():
+        fairness.record_allocation(pipe, clusters[cluster_id], owner_id, ResourceVector.zeros() - freed)
+    pipe.execute()
+    return rows
+
+def preempt_to_fit(db: Session, cluster: Cluster, limits: ResourceVector) -> List[Deployment]:
+    """
+    Send running deployments back to pending until what the cluster has
+    allocated fits ``limits``: lowest priority first, then the most
+    recently started, skipping any that hold none of the overcommitted
+    resources. The caller holds the cluster row lock and commits, then
+    calls ``requeue_preempted``.
+    """
+    allocated = cluster.limits - cluster.available
+    running = db.query(Deployment).filter(
+        Deployment.cluster_id == cluster.id,
+        Deployment.status == DeploymentStatus.RUNNING
+    ).order_by(
+        Deployment.priority.asc(),
+        Deployment.started_at.desc()
+    ).all()
+
+    preempted = []
+    for deployment in running:
+        if limits.fits(allocated):
+            break
+        over = [index for index, (held, limit) in enumerate(zip(allocated, limits)) if held > limit]
+        if not any(deployment.required[index] > 0 for index in over):
+            continue
+        allocated = allocated - deployment.required
+        cluster.available = cluster.available + deployment.required
+        release_node(db, deployment)
+        deployment.status = DeploymentStatus.PENDING
+        deployment.started_at = None
+        deployment.node_id = None
+        preempted.append(deployment)
+    return preempted
+
+def requeue_preempted(redis: Redis, cluster: Cluster, deployments: List[Deployment]):
+    """Redis side of a committed preemption: release usage, disarm expiry, queue again"""
+    if not deployments:
+        return
+    pipe = redis.pipeline(transaction=False)
+    for deployment in deployments:
+        fairness.record_allocation(
+            pipe, cluster, deployment.owner_id, ResourceVector.zeros() - deployment.required
+        )
+        pipe.zrem(DEADLINES_KEY, deployment.id)
+    pipe.execute()
+    for deployment in deployments:
+        enqueue(redis, cluster, deployment)
+
+
+def iter_pending_queue(redis: Redis, cluster_id: int) -> Iterator[Tuple[str, float]]:
+    """
+    Walk a pending queue from the highest score down, one page at a time.
+    Paging by score rather than rank stays correct while entries are removed.
+    """
+    key = pending_queue_key(cluster_id)
+    max_score = "+inf"
+    seen = set()
+    while True:
+        page = redis.zrevrangebyscore(
+            key, max_score, "-inf", start=0, num=QUEUE_PAGE_SIZE, withscores=True
+        )
+        fresh = [(member, score) for member, score in page if member not in seen]
+        if not fresh:
+            return
+        for member, score in fresh:
+            seen.add(member)
+            yield member, score
+        max_score = page[-1][1]
+
+
+def schedule_pending_deployments(
+    db: Session,
+    redis: Redis,
+    cluster: Cluster,
+    trace: Optional[PassTrace] = None
+) -> List[Deployment]:
+    """
+    Start pending deployments based on priority, fair share, quotas and
+    resource availability. The caller holds the cluster row lock and saves
+    ``trace``, which gets each decision and the time spent per phase.
+    """
+    trace = PassTrace(cluster.id) if trace is None else trace
+    key = pending_queue_key(cluster.id)
+    queued = {}
+    quotas = {}
+
+    def entries() -> Iterator[QueueEntry]:
+        members = iter_pending_queue(redis, cluster.id)
+        while True:
+            # Only the reads count as queue time, not what plan does in between
+            with trace.phase("queue"):
+                member, score = next(members, (None, None))
+                if member is None:
+                    return
+                deployment = db.get(Deployment, member_id(member))
+                if not deployment or deployment.status != DeploymentStatus.PENDING:
+                    # Remove invalid entry from queue
+                    redis.zrem(key, member)
+                    continue
+                queued[deployment.id] = (member, deployment)
+            yield QueueEntry(
+                id=deployment.id,
+                owner_id=deployment.owner_id,
+                priority=deployment.priority,
+                required=deployment.required,
+                score=score
+            )
+
+    def quota_for(owner_id: Optional[int]) -> Optional[ResourceVector]:
+        if owner_id not in quotas:
+            quotas[owner_id] = fairness.load_quota(db, cluster.organization_id, owner_id)
+        return quotas[owner_id]
+
+    # Clusters with nodes place every deployment on one of them
+    nodes = db.query(Node).filter(Node.cluster_id == cluster.id).all()
+    placer = NodePlacer(nodes, cluster.limits) if nodes else None
+    placements = {}
+
+    def place(entry: QueueEntry) -> bool:
+        node = placer.place(entry.required)
+        if node is not None:
+            placements[entry.id] = node.id
+        return node is not None
+
+    started = []
+    now = datetime.utcnow()
+    usage = fairness.OwnerUsage(redis, cluster.id)
+    policy_start = time.perf_counter()
+    for entry, action in plan(entries(), cluster.available, usage, quota_for, place if placer else None):
+        if action is Action.OVER_QUOTA:
+            trace.record(entry, action, **quota_detail(
+                usage[entry.owner_id], quotas[entry.owner_id], entry.required
+            ))
+            continue
+        if action is Action.BLOCKED:
+            trace.record(entry, action, **blocked_detail(
+                entry.required, cluster.available, cluster.limits, nodes if placer else None
+            ))
+            continue
+        member, deployment = queued.pop(entry.id)
+
+        # Allocate resources and start deployment
+        cluster.available = cluster.available - deployment.required
+        deployment.node_id = placements.get(entry.id)
+        deployment.status = DeploymentStatus.RUNNING
+        deployment.started_at = now
+        started.append((entry, member, deployment))
+        trace.record(entry, action, node_id=deployment.node_id)
+    # Policy time is the walk minus the queue reads inside it
+    trace.timings["policy"] += (time.perf_counter() - policy_start) * 1000 - trace.timings["queue"]
+
+    with trace.phase("commit"):
+        record_events(
+            db, cluster.organization_id, WebhookEventType.STARTED,
+            [deployment for _, _, deployment in started]
+        )
+        db.commit()
+    if not started:
+        return []
+
+    # Redis follows the committed state: dequeue, track usage, arm expiry
+    with trace.phase("redis"):
+        started_at = time.time()
+        pipe = redis.pipeline(transaction=False)
+        for entry, member, deployment in started:
+            pipe.zrem(key, member)
+            pipe.zadd(DEADLINES_KEY, {deployment.id: started_at + deployment.time_limit})
+            fairness.record_allocation(pipe, cluster, deployment.owner_id, deployment.required)
+        last_tag = max(
+            fairness.tag_from_score(fairness.deployment_weight(deployment), entry.score)
+            for entry, _, deployment in started
+        )
+        fairness.advance_virtual_time(pipe, cluster.id, last_tag)
+        pipe.execute()
+
+    return [deployment for _, _, deployment in started]
+
+
+def complete_expired_deployments(db: Session, redis: Redis, now: float = None) -> Set[int]:
+    """
+    Complete running deployments whose run time is up.
+    Returns the ids of clusters that got capacity back.
+    """
+    now = time.time() if now is None else now
+    due = redis.zrangebyscore(DEADLINES_KEY, "-inf", now, start=0, num=EXPIRY_BATCH_SIZE)
+    freed = set()
+    for deployment_id in due:
+        deployment = db.get(Deployment, int(deployment_id))
+        cluster = lock_cluster(db, deployment.cluster_id) if deployment else None
+        if cluster:
+            # Re-read under the lock: a cancel may have released it meanwhile
+            db.refresh(deployment)
+        if cluster and deployment.status == DeploymentStatus.RUNNING:
+            # Mark deployment as completed and give its resources back
+            deployment.status = DeploymentStatus.COMPLETED
+            deployment.completed_at = datetime.utcnow()
+            record_events(db, cluster.organization_id, WebhookEventType.COMPLETED, [deployment])
+            deallocate_resources(db, redis, cluster, deployment)
+            freed.add(cluster.id)
+        else:
+            db.rollback()
+            redis.zrem(DEADLINES_KEY, deployment_id)
+    return freed
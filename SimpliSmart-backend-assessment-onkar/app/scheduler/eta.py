@@ -0,0 +1,148 @@
+"""
+Queue position and estimated start time of pending deployments.
+
+Every scheduling pass ends by projecting when the head of the queue will
+start: running deployments free their resources when they are expected to
+finish (their runtime hint, else their expiry deadline) and queued entries
+start in score order as soon as they fit, mirroring ``plan``, each then
+running for its hint or time limit. The estimates are written to a per-cluster
+hash, so reading them costs one ZREVRANK and one HGET per deployment
+instead of a simulation per request.
+
+Quotas are left out of the projection; an owner at quota may start later
+than estimated.
+"""
+import heapq
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from redis import Redis
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.resources import ResourceVector
+from app.models.cluster import Cluster
+from app.models.deployment import Deployment, DeploymentStatus
+from app.scheduler.queue import DEADLINES_KEY, pending_queue_key, queue_member
+
+# Queue entries estimated per pass; deeper ones get a position but no estimate
+ETA_DEPTH = 1000
+
+
+def eta_key(cluster_id: int) -> str:
+    """Redis hash of deployment id -> estimated start (epoch seconds)"""
+    return f"cluster:{cluster_id}:eta"
+
+
+def project_start_times(
+    queued: Iterable[Tuple[int, ResourceVector, float]],
+    available: ResourceVector,
+    running: Iterable[Tuple[float, ResourceVector]],
+    now: float
+) -> Dict[int, float]:
+    """
+    Estimated start per queued id, in queue order. ``queued`` holds the id,
+    resources and run seconds of each entry, ``running`` the finish time
+    and resources of each running deployment. Stops at the first entry
+    that would not fit even with the cluster empty.
+    """
+    releases = [(finish, index, required) for index, (finish, required) in enumerate(running)]
+    heapq.heapify(releases)
+    counter = len(releases)
+    estimates = {}
+    for deployment_id, required, run_seconds in queued:
+        while not available.fits(required):
+            if not releases:
+                return estimates
+            finish, _, freed = heapq.heappop(releases)
+            available = available + freed
+            now = max(now, finish)
+        estimates[deployment_id] = now
+        available = available - required
+        heapq.heappush(releases, (now + run_seconds, counter, required))
+        counter += 1
+    return estimates
+
+
+def refresh_estimates(db: Session, redis: Redis, cluster: Cluster):
+    """
+    Recompute a cluster's estimates; the worker runs this right after each
+    scheduling pass while it still holds the cluster's lease.
+    """
+    now = time.time()
+    members = redis.zrevrange(pending_queue_key(cluster.id), 0, ETA_DEPTH - 1)
+    if not members:
+        redis.delete(eta_key(cluster.id))
+        return
+
+    entries = [json.loads(member) for member in members]
+    hints = {
+        row.id: row.expected_duration_seconds or row.time_limit_seconds
+        for row in db.query(
+            Deployment.id, Deployment.expected_duration_seconds, Deployment.time_limit_seconds
+        ).filter(Deployment.id.in_([entry["id"] for entry in entries]))
+    }
+    queued = [
+        (
+            entry["id"],
+            ResourceVector(entry["required"]),
+            hints.get(entry["id"]) or settings.DEPLOYMENT_TIMEOUT_SECONDS
+        )
+        for entry in entries
+    ]
+
+    rows = db.query(
+        Deployment.id, Deployment.required, Deployment.started_at,
+        Deployment.expected_duration_seconds, Deployment.time_limit_seconds
+    ).filter(
+        Deployment.cluster_id == cluster.id,
+        Deployment.status == DeploymentStatus.RUNNING
+    ).all()
+    deadlines = redis.zmscore(DEADLINES_KEY, [row.id for row in rows]) if rows else []
+    running = []
+    for row, deadline in zip(rows, deadlines):
+        # started_at is naive UTC
+        started = row.started_at.replace(tzinfo=timezone.utc).timestamp() if row.started_at else now
+        if deadline is None:
+            deadline = started + (row.time_limit_seconds or settings.DEPLOYMENT_TIMEOUT_SECONDS)
+        if row.expected_duration_seconds:
+            deadline = min(deadline, started + row.expected_duration_seconds)
+        running.append((max(deadline, now), row.required))
+
+    estimates = project_start_times(queued, cluster.available, running, now)
+    pipe = redis.pipeline()
+    pipe.delete(eta_key(cluster.id))
+    if estimates:
+        pipe.hset(eta_key(cluster.id), mapping=estimates)
+    pipe.execute()
+
+
+def queue_info(redis: Redis, deployments: List[Deployment]) -> Dict[int, dict]:
+    """
+    Queue position (1 is next) and estimated start of each pending
+    deployment, read in one round trip.
+    """
+    pending = [d for d in deployments if d.status == DeploymentStatus.PENDING]
+    if not pending:
+        return {}
+
+    pipe = redis.pipeline(transaction=False)
+    for deployment in pending:
+        pipe.zrevrank(pending_queue_key(deployment.cluster_id), queue_member(deployment))
+        pipe.hget(eta_key(deployment.cluster_id), deployment.id)
+    replies = pipe.execute()
+
+    now = time.time()
+    info = {}
+    for index, deployment in enumerate(pending):
+        rank, estimate = replies[2 * index], replies[2 * index + 1]
+        info[deployment.id] = {
+            "queue_position": None if rank is None else rank + 1,
+            # An estimate in the past means the next pass has not run yet
+            "estimated_start_at": None if estimate is None else datetime.fromtimestamp(
+                max(float(estimate), now), timezone.utc
+            )
+        }
+    return info
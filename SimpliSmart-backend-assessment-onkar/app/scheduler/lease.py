@@ -0,0 +1,55 @@
+"""
+Redis leases for leader election and per-cluster mutual exclusion.
+
+A lease is a key holding a random token with a TTL. Only the holder of the
+token can renew or release it, so a process that stalled past its TTL can
+never extend or drop a lease another process has since taken over.
+"""
+import uuid
+
+from redis import Redis
+
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class Lease:
+    def __init__(self, redis: Redis, key: str, ttl_seconds: float):
+        self.redis = redis
+        self.key = key
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.token = uuid.uuid4().hex
+        self.held = False
+
+    def acquire(self) -> bool:
+        self.held = bool(self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms))
+        return self.held
+
+    def renew(self) -> bool:
+        """Extend the lease; False means it expired and may now be someone else's"""
+        self.held = bool(self.redis.register_script(_RENEW)(
+            keys=[self.key], args=[self.token, self.ttl_ms]
+        ))
+        return self.held
+
+    def release(self):
+        if self.held:
+            self.redis.register_script(_RELEASE)(keys=[self.key], args=[self.token])
+            self.held = False
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,80 @@
+"""
+Placement of deployments on the nodes of a cluster.
+
+A cluster's aggregate availability says nothing about whether a deployment
+fits on one machine: eight free GPUs spread two per node cannot run an
+eight-GPU job. For clusters with nodes every scheduling pass builds a
+``NodePlacer`` over the nodes and ``plan`` asks it to place each entry;
+an entry that fits no single node blocks the queue like one that does not
+fit the cluster.
+
+Placement is best fit on the deployment's dominant resource (the one it
+needs the largest share of): the node left with the least of that
+resource that still fits the whole request. That keeps large holes open
+for large jobs. Each resource has an index of nodes sorted by free
+amount, so a placement bisects past every node short of the dominant
+resource instead of scanning all of them, and the indexes are updated in
+place as the pass places entries.
+"""
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional
+
+from app.core.resources import DIMENSIONS, RESOURCES, ResourceVector
+from app.models.node import Node
+
+
+class NodePlacer:
+    def __init__(self, nodes: Iterable[Node], capacity: ResourceVector):
+        self.nodes = {node.id: node for node in nodes}
+        self.capacity = capacity
+        # Per resource, (free amount, node id) in ascending order
+        self.index = [
+            sorted((node.available[dimension], node.id) for node in self.nodes.values())
+            for dimension in range(DIMENSIONS)
+        ]
+
+    def dominant(self, required: ResourceVector) -> int:
+        shares = [
+            amount / total if total > 0 else 0.0
+            for amount, total in zip(required, self.capacity)
+        ]
+        return max(range(DIMENSIONS), key=shares.__getitem__)
+
+    def find(self, required: ResourceVector) -> Optional[Node]:
+        """Best-fit node for ``required``, without taking its resources"""
+        dimension = self.dominant(required)
+        column = self.index[dimension]
+        for position in range(bisect_left(column, (required[dimension], float("-inf"))), len(column)):
+            node = self.nodes[column[position][1]]
+            if node.available.fits(required):
+                return node
+        return None
+
+    def place(self, required: ResourceVector) -> Optional[Node]:
+        """Take ``required`` from the best-fit node and return it, if any fits"""
+        node = self.find(required)
+        if node is not None:
+            self.update(node, node.available - required)
+        return node
+
+    def update(self, node: Node, available: ResourceVector):
+        for dimension, column in enumerate(self.index):
+            del column[bisect_left(column, (node.available[dimension], node.id))]
+            insort(column, (available[dimension], node.id))
+        node.available = available
+
+
+def fragmentation(nodes: List[Node]) -> Dict[str, float]:
+    """
+    Per resource, how much of the free capacity sits in holes smaller than
+    the largest node: 1 - sum(free_i^2) / (total free * largest capacity).
+    Idle identical nodes score 0; two free GPUs on each of several 8-GPU
+    nodes score 0.75, however many GPUs are free in total.
+    """
+    scores = {}
+    for dimension, name in enumerate(RESOURCES):
+        free = [node.available[dimension] for node in nodes]
+        total = sum(free)
+        largest = max(node.limits[dimension] for node in nodes)
+        scores[name] = 1 - sum(hole * hole for hole in free) / (total * largest) if total > 0 else 0.0
+    return scores
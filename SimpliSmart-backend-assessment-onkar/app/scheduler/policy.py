@@ -0,0 +1,65 @@
+"""
+Scheduling policy shared by the live scheduler and the simulator.
+
+``plan`` walks queue entries in score order and decides, for each one,
+whether it starts, is skipped because its owner is at quota, or blocks the
+queue because the cluster cannot fit it. Callers own where entries come
+from and what happens to the decisions.
+"""
+import enum
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, MutableMapping, Optional, Tuple
+
+from app.core.resources import ResourceVector
+
+
+class Action(enum.Enum):
+    START = "start"
+    OVER_QUOTA = "over_quota"
+    BLOCKED = "blocked"
+
+
+@dataclass
+class QueueEntry:
+    id: int
+    owner_id: Optional[int]
+    priority: int
+    required: ResourceVector
+    score: float = 0.0
+
+
+def plan(
+    entries: Iterable[QueueEntry],
+    available: ResourceVector,
+    usage: MutableMapping[Optional[int], ResourceVector],
+    quota_for: Callable[[Optional[int]], Optional[ResourceVector]],
+    place: Optional[Callable[[QueueEntry], bool]] = None
+) -> Iterator[Tuple[QueueEntry, Action]]:
+    """
+    Yield a decision per entry until the head of the queue no longer fits.
+
+    ``usage`` maps owners to what they hold and must supply a zero vector
+    for unknown owners (a defaultdict or a ``__missing__`` lookup); it is
+    updated in place as entries start. Entries whose owner would exceed
+    their quota are skipped rather than blocking, so one user at quota
+    never holds back everyone queued behind them.
+
+    ``place``, given for clusters with nodes, puts an entry on a node and
+    returns whether one had room; it replaces the aggregate fit check and
+    is only called for entries that are about to start.
+    """
+    for entry in entries:
+        held = usage[entry.owner_id]
+        quota = quota_for(entry.owner_id)
+        if quota is not None and not quota.fits(held + entry.required):
+            yield entry, Action.OVER_QUOTA
+            continue
+
+        fits = place(entry) if place else available.fits(entry.required)
+        if not fits:
+            yield entry, Action.BLOCKED
+            return
+
+        available = available - entry.required
+        usage[entry.owner_id] = held + entry.required
+        yield entry, Action.START
@@ -0,0 +1,78 @@
+"""
+Redis keys and operations shared by the API and the scheduler worker.
+
+The API only ever enqueues, dequeues and signals; every scheduling pass and
+expiry runs in the worker (app/scheduler/worker.py).
+"""
+import json
+import time
+from typing import Iterable
+
+from redis import Redis
+
+from app.core.config import settings
+from app.models.cluster import Cluster
+from app.models.deployment import Deployment
+from app.scheduler import fairness
+
+# Clusters with work for the scheduler, drained by the leader
+DIRTY_CLUSTERS_KEY = "scheduler:dirty_clusters"
+# Short list the worker blocks on so a signal wakes it immediately
+WAKEUP_KEY = "scheduler:wakeup"
+# Deployment id -> epoch second its run time expires
+DEADLINES_KEY = "scheduler:deadlines"
+
+
+def pending_queue_key(cluster_id: int) -> str:
+    """Redis sorted set holding a cluster's pending deployments"""
+    return f"cluster:{cluster_id}:pending_deployments"
+
+def aging_key(cluster_id: int) -> str:
+    """Sorted set of queue member -> epoch second of its next promotion"""
+    return f"cluster:{cluster_id}:aging"
+
+def queue_member(deployment: Deployment) -> str:
+    """Serialized pending queue entry for a deployment"""
+    return json.dumps({
+        "id": deployment.id,
+        "name": deployment.name,
+        "required": list(deployment.required)
+    })
+
+
+def member_id(member: str) -> int:
+    """Deployment id of a queue member, without a full JSON parse when possible"""
+    if member.startswith('{"id": '):
+        end = member.find(",", 7)
+        if end > 0 and member[7:end].isdigit():
+            return int(member[7:end])
+    return int(json.loads(member)["id"])
+
+
+def enqueue(redis: Redis, cluster: Cluster, deployment: Deployment):
+    """Add a deployment to its cluster's queue, ordered by band then fair-share tag"""
+    tag = fairness.assign_start_tag(redis, cluster, deployment)
+    member = queue_member(deployment)
+    pipe = redis.pipeline(transaction=False)
+    pipe.zadd(
+        pending_queue_key(cluster.id),
+        {member: fairness.queue_score(fairness.deployment_weight(deployment), tag)}
+    )
+    if settings.PRIORITY_AGING_SECONDS > 0:
+        # First promotion, see app/scheduler/aging.py
+        pipe.zadd(aging_key(cluster.id), {member: time.time() + settings.PRIORITY_AGING_SECONDS})
+    pipe.execute()
+
+def dequeue(redis: Redis, deployment: Deployment):
+    redis.zrem(pending_queue_key(deployment.cluster_id), queue_member(deployment))
+
+def signal(redis: Redis, cluster_ids: Iterable[int]):
+    """Ask the scheduler worker for a pass over each cluster"""
+    cluster_ids = list(cluster_ids)
+    if not cluster_ids:
+        return
+    pipe = redis.pipeline(transaction=False)
+    pipe.sadd(DIRTY_CLUSTERS_KEY, *cluster_ids)
+    pipe.lpush(WAKEUP_KEY, 1)
+    pipe.ltrim(WAKEUP_KEY, 0, 0)
+    pipe.execute()
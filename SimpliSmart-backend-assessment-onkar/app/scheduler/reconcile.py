@@ -0,0 +1,290 @@
+"""
+Reconciliation between Postgres and the scheduler state in Redis.
+
+Postgres is the source of truth. For every cluster the pending queue, the
+expiry deadlines and the fair-share usage in Redis are diffed against the
+deployment rows with set operations over whole snapshots, never one query
+per row, and both sides are repaired:
+
+- PENDING rows missing from the queue are re-queued; queue members for
+  anything that is no longer PENDING (or no longer exists) are removed
+- RUNNING rows without a deadline get one; deadlines of finished rows go
+- per-owner usage and dominant shares are rebuilt where they drifted
+- a cluster's stored availability, and each of its nodes', is corrected
+  if it no longer equals its limits minus what its RUNNING rows hold
+
+Redis is snapshotted before the database so an entry enqueued in between
+is at worst re-added (members are deterministic), never dropped.
+
+The worker runs this when it becomes leader and every
+RECONCILE_INTERVAL_SECONDS. Run by hand with:
+python -m app.scheduler.reconcile [--dry-run]
+"""
+import argparse
+import json
+import logging
+import math
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from datetime import timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from redis import Redis
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.resources import ResourceVector
+from app.models.cluster import Cluster
+from app.models.deployment import Deployment, DeploymentStatus
+from app.models.node import Node
+from app.scheduler import fairness
+from app.scheduler.engine import lock_cluster
+from app.scheduler.queue import DEADLINES_KEY, aging_key, member_id, pending_queue_key, queue_member
+
+logger = logging.getLogger(__name__)
+
+# Rows streamed from Postgres and members read or written per Redis round trip
+BATCH_SIZE = 10000
+
+
+@dataclass
+class ReconcileReport:
+    clusters: int = 0
+    queue_missing: int = 0
+    queue_stale: int = 0
+    deadlines_missing: int = 0
+    deadlines_stale: int = 0
+    usage_repaired: int = 0
+    availability_repaired: int = 0
+    seconds: float = 0.0
+    # False when stopped early by ``keep_going``
+    complete: bool = True
+
+    @property
+    def drift(self) -> int:
+        return (
+            self.queue_missing + self.queue_stale + self.deadlines_missing +
+            self.deadlines_stale + self.usage_repaired + self.availability_repaired
+        )
+
+
+def iter_sorted_set(redis: Redis, key: str) -> Iterator[str]:
+    """Every member of a sorted set, read in rank order one batch at a time"""
+    position = 0
+    while True:
+        members = redis.zrange(key, position, position + BATCH_SIZE - 1)
+        yield from members
+        if len(members) < BATCH_SIZE:
+            return
+        position += BATCH_SIZE
+
+
+def chunks(items: List, size: int = BATCH_SIZE) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def same_vector(a: Optional[ResourceVector], b: Optional[ResourceVector]) -> bool:
+    """Equal up to float rounding, which differs with summation order"""
+    if a is None or b is None:
+        return a is b
+    return len(a) == len(b) and all(math.isclose(x, y, abs_tol=1e-9) for x, y in zip(a, b))
+
+
+def reconcile_cluster(
+    db: Session,
+    redis: Redis,
+    cluster_id: int,
+    deadline_ids: Set[int],
+    report: ReconcileReport,
+    dry_run: bool = False
+) -> Set[int]:
+    """Repair one cluster; returns the ids of its RUNNING deployments"""
+    key = pending_queue_key(cluster_id)
+
+    # Redis snapshot first
+    queued: Dict[int, List[str]] = defaultdict(list)
+    for member in iter_sorted_set(redis, key):
+        queued[member_id(member)].append(member)
+    virtual_time = float(redis.get(fairness.virtual_time_key(cluster_id)) or 0)
+
+    pending = {
+        row.id: row
+        for row in db.query(
+            Deployment.id, Deployment.name, Deployment.required, Deployment.priority,
+            Deployment.expected_duration_seconds, Deployment.time_limit_seconds
+        ).filter(
+            Deployment.cluster_id == cluster_id,
+            Deployment.status == DeploymentStatus.PENDING
+        ).yield_per(BATCH_SIZE)
+    }
+
+    # Availability and usage are derived from RUNNING rows read under the
+    # cluster lock, so no start or release can land in between
+    cluster = lock_cluster(db, cluster_id)
+    if cluster is None:
+        # Deleted since reconcile() listed it
+        db.rollback()
+        return set()
+    running = db.query(
+        Deployment.id, Deployment.owner_id, Deployment.node_id, Deployment.required,
+        Deployment.started_at, Deployment.time_limit_seconds
+    ).filter(
+        Deployment.cluster_id == cluster_id,
+        Deployment.status == DeploymentStatus.RUNNING
+    ).yield_per(BATCH_SIZE).all()
+
+    held: Dict[str, ResourceVector] = defaultdict(ResourceVector.zeros)
+    on_node: Dict[int, ResourceVector] = defaultdict(ResourceVector.zeros)
+    total = ResourceVector.zeros()
+    for row in running:
+        held[fairness.owner_field(row.owner_id)] += row.required
+        if row.node_id is not None:
+            on_node[row.node_id] += row.required
+        total += row.required
+
+    # The API releases usage right after its commit, so read it only now
+    raw_usage = redis.hgetall(fairness.usage_key(cluster_id))
+
+    expected_available = cluster.limits - total
+    if not same_vector(cluster.available, expected_available):
+        report.availability_repaired += 1
+        if not dry_run:
+            cluster.available = expected_available
+    for node in db.query(Node).filter(Node.cluster_id == cluster_id):
+        expected_available = node.limits - on_node[node.id]
+        if not same_vector(node.available, expected_available):
+            report.availability_repaired += 1
+            if not dry_run:
+                node.available = expected_available
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+
+    # Queue: set differences between what is queued and what is pending
+    queued_ids = queued.keys()
+    stale = [member for deployment_id in queued_ids - pending.keys() for member in queued[deployment_id]]
+    missing = [pending[deployment_id] for deployment_id in pending.keys() - queued_ids]
+    for deployment_id in queued_ids & pending.keys():
+        # Members of a pending deployment that no longer match its row
+        canonical = queue_member(pending[deployment_id])
+        stale.extend(member for member in queued[deployment_id] if member != canonical)
+        if canonical not in queued[deployment_id]:
+            missing.append(pending[deployment_id])
+    report.queue_stale += len(stale)
+    report.queue_missing += len(missing)
+
+    # Deadlines for RUNNING rows that lost theirs; already overdue ones
+    # simply expire on the next tick
+    running_ids = {row.id for row in running}
+    no_deadline = [row for row in running if row.id not in deadline_ids]
+    report.deadlines_missing += len(no_deadline)
+
+    # Usage and dominant shares per owner
+    # Owners holding nothing have no entry, as record_allocation leaves it
+    held = {owner: vector for owner, vector in held.items() if any(vector)}
+    stored = {owner: ResourceVector(json.loads(raw)) for owner, raw in raw_usage.items()}
+    drifted = [
+        owner for owner in stored.keys() | held.keys()
+        if not same_vector(stored.get(owner), held.get(owner))
+    ]
+    report.usage_repaired += len(drifted)
+
+    if dry_run:
+        return running_ids
+
+    for batch in chunks(stale):
+        redis.zrem(key, *batch)
+    for batch in chunks(missing):
+        # Lost entries re-enter at the current virtual time of their band;
+        # nx keeps the score of one the API enqueued since the snapshot
+        redis.zadd(key, {
+            queue_member(row): fairness.queue_score(fairness.deployment_weight(row), virtual_time)
+            for row in batch
+        }, nx=True)
+        if settings.PRIORITY_AGING_SECONDS > 0:
+            redis.zadd(aging_key(cluster_id), {
+                queue_member(row): time.time() + settings.PRIORITY_AGING_SECONDS
+                for row in batch
+            }, nx=True)
+    for batch in chunks(no_deadline):
+        redis.zadd(DEADLINES_KEY, {
+            # started_at is naive UTC
+            row.id: (
+                row.started_at.replace(tzinfo=timezone.utc)
+                + timedelta(seconds=row.time_limit_seconds or settings.DEPLOYMENT_TIMEOUT_SECONDS)
+            ).timestamp() if row.started_at else 0
+            for row in batch
+        }, nx=True)
+    if drifted:
+        pipe = redis.pipeline()
+        for owner in drifted:
+            if owner in held:
+                pipe.hset(fairness.usage_key(cluster_id), owner, json.dumps(list(held[owner])))
+                pipe.zadd(fairness.shares_key(cluster_id), {
+                    owner: fairness.dominant_share(held[owner], cluster.limits)
+                })
+            else:
+                pipe.hdel(fairness.usage_key(cluster_id), owner)
+                pipe.zrem(fairness.shares_key(cluster_id), owner)
+        pipe.execute()
+
+    return running_ids
+
+
+def reconcile(
+    db: Session,
+    redis: Redis,
+    dry_run: bool = False,
+    keep_going: Optional[Callable[[], bool]] = None
+) -> ReconcileReport:
+    """
+    Reconcile every cluster and return the drift found (and repaired).
+    ``keep_going`` is asked before each cluster; when it returns False the
+    run stops there, leaving the deadlines of other clusters alone.
+    """
+    start = time.perf_counter()
+    report = ReconcileReport()
+
+    deadline_ids = {int(member) for member in iter_sorted_set(redis, DEADLINES_KEY)}
+    all_running: Set[int] = set()
+    for (cluster_id,) in db.query(Cluster.id).all():
+        if keep_going is not None and not keep_going():
+            report.complete = False
+            report.seconds = time.perf_counter() - start
+            logger.warning("Reconciliation stopped after %s clusters", report.clusters)
+            return report
+        all_running |= reconcile_cluster(db, redis, cluster_id, deadline_ids, report, dry_run)
+        report.clusters += 1
+
+    stale_deadlines = list(deadline_ids - all_running)
+    report.deadlines_stale = len(stale_deadlines)
+    if not dry_run:
+        for batch in chunks(stale_deadlines):
+            redis.zrem(DEADLINES_KEY, *batch)
+
+    report.seconds = time.perf_counter() - start
+    level = logging.WARNING if report.drift else logging.INFO
+    logger.log(level, "Reconciliation %s: %s", "dry run" if dry_run else "done", asdict(report))
+    return report
+
+
+def main():
+    from app.core.redis import get_redis
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dry-run", action="store_true", help="report drift without repairing it")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(name)s] %(message)s")
+    with SessionLocal() as db:
+        report = reconcile(db, get_redis(), dry_run=args.dry_run)
+    for field, value in asdict(report).items():
+        print(f"{field:<22}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Discrete-event simulator for the cluster scheduler.
+
+Replays a synthetic workload against one cluster using the same ``plan``
+function and queue scores as the live scheduler, and reports utilization,
+waits and fairness for each queueing policy:
+
+priority  priority bands, first come first served within a band
+drf       priority bands, DRF start tags within a band (the live default)
+wspt      DRF tags, bands by priority per expected second (SCHEDULING_POLICY=wspt)
+sjf       shortest expected run time first, priority ignored
+
+Any policy can run with priority aging (PRIORITY_AGING_SECONDS), promoting
+queued entries the way the worker does at the start of each pass.
+
+Run with: python -m app.scheduler.simulator
+"""
+import argparse
+import bisect
+import heapq
+import math
+import random
+import statistics
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.core.resources import RESOURCES, ResourceVector, build_vector
+from app.scheduler import aging, fairness
+from app.scheduler.policy import Action, QueueEntry, plan
+
+POLICIES = ("priority", "drf", "wspt", "sjf")
+# Policies whose tags come from DRF rather than arrival time
+FAIR_TAGGED = ("drf", "wspt")
+
+
+@dataclass
+class Job:
+    id: int
+    owner_id: int
+    priority: int
+    required: ResourceVector
+    arrival: float
+    duration: float
+    # Runtime hint given at submission; may be off from ``duration``
+    expected: Optional[float] = None
+
+
+@dataclass
+class SimulationResult:
+    policy: str
+    makespan: float
+    utilization: Dict[str, float]
+    mean_wait: Dict[int, float]
+    mean_share: Dict[int, float]
+    fairness_index: float
+    mean_wait_by_priority: Dict[int, float] = field(default_factory=dict)
+    p99_wait_by_priority: Dict[int, float] = field(default_factory=dict)
+    max_wait_by_priority: Dict[int, float] = field(default_factory=dict)
+    p95_wait: float = 0.0
+    waits: Dict[int, float] = field(default_factory=dict, repr=False)
+
+
+def jain_index(values: List[float]) -> float:
+    """1.0 when every value is equal, 1/n when one value takes everything"""
+    if not values or not any(values):
+        return 1.0
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def band(job: Job, policy: str) -> float:
+    """Queue band of a job under a policy, as ``fairness.queue_weight`` computes it live"""
+    if policy == "wspt":
+        return fairness.queue_weight(job.priority, job.expected, "wspt")
+    if policy == "sjf":
+        return fairness.queue_weight(1, job.expected, "wspt")
+    return fairness.queue_weight(job.priority, policy="priority")
+
+def live_policy(policy: str) -> str:
+    """SCHEDULING_POLICY whose bands a simulator policy uses"""
+    return "wspt" if policy in ("wspt", "sjf") else "priority"
+
+
+def simulate(
+    jobs: List[Job],
+    capacity: ResourceVector,
+    policy: str = "drf",
+    quota: Optional[ResourceVector] = None,
+    aging_seconds: Optional[float] = None
+) -> SimulationResult:
+    """
+    Run ``jobs`` to completion on a cluster of ``capacity``, with entries
+    aging one band per ``aging_seconds`` waited when given
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy '{policy}'")
+
+    events = [(job.arrival, 0, job.id) for job in jobs]
+    heapq.heapify(events)
+    by_id = {job.id: job for job in jobs}
+
+    queue: List[tuple] = []  # (-score, id) kept sorted
+    scores: Dict[int, float] = {}
+    available = capacity
+    usage = defaultdict(ResourceVector.zeros)
+    virtual_time = 0.0
+    finish_tags: Dict[int, float] = defaultdict(float)
+    waits: Dict[int, float] = {}
+    # (due, id) of the next promotion of each aging entry
+    promotions: List[tuple] = []
+    ceiling = aging.aged_ceiling(live_policy(policy)) * fairness.PRIORITY_BAND
+
+    now = 0.0
+    used_area = [0.0] * len(capacity)
+    share_area: Dict[int, float] = defaultdict(float)
+
+    while events:
+        time, kind, job_id = heapq.heappop(events)
+        elapsed = time - now
+        if elapsed > 0:
+            for i, (total, free) in enumerate(zip(capacity, available)):
+                used_area[i] += (total - free) * elapsed
+            for owner, held in usage.items():
+                share_area[owner] += fairness.dominant_share(held, capacity) * elapsed
+        now = time
+        job = by_id[job_id]
+
+        if kind == 0:
+            # Arrival: score the job exactly as the live enqueue path does
+            if policy in FAIR_TAGGED:
+                tag = fairness.start_tag(virtual_time, finish_tags[job.owner_id])
+                finish_tags[job.owner_id] = tag + fairness.dominant_share(job.required, capacity)
+            else:
+                tag = job.arrival
+            scores[job.id] = fairness.queue_score(band(job, policy), tag)
+            bisect.insort(queue, (-scores[job.id], job.id))
+            if aging_seconds:
+                heapq.heappush(promotions, (now + aging_seconds, job.id))
+        else:
+            # Completion: release resources
+            available = available + job.required
+            usage[job.owner_id] = usage[job.owner_id] - job.required
+
+        # Promote what is due, as aging.promote_due does before a pass
+        while promotions and promotions[0][0] <= now:
+            due, queued_id = heapq.heappop(promotions)
+            if queued_id not in scores:
+                continue
+            score = scores[queued_id]
+            room = math.floor((ceiling - score) / fairness.PRIORITY_BAND)
+            levels = min(math.floor((now - due) / aging_seconds) + 1, room)
+            if levels > 0:
+                queue.remove((-score, queued_id))
+                scores[queued_id] = score + levels * fairness.PRIORITY_BAND
+                bisect.insort(queue, (-scores[queued_id], queued_id))
+            if 0 < levels < room:
+                heapq.heappush(promotions, (due + levels * aging_seconds, queued_id))
+
+        entries = (
+            QueueEntry(
+                id=queued_id,
+                owner_id=by_id[queued_id].owner_id,
+                priority=by_id[queued_id].priority,
+                required=by_id[queued_id].required,
+                score=scores[queued_id]
+            )
+            for _, queued_id in queue
+        )
+        started = []
+        for entry, action in plan(entries, available, usage, lambda owner: quota):
+            if action is not Action.START:
+                continue
+            started.append(entry)
+
+        for entry in started:
+            queue.remove((-entry.score, entry.id))
+            del scores[entry.id]
+            job = by_id[entry.id]
+            available = available - job.required
+            waits[job.id] = now - job.arrival
+            if policy in FAIR_TAGGED:
+                virtual_time = max(virtual_time, fairness.tag_from_score(band(job, policy), entry.score))
+            heapq.heappush(events, (now + job.duration, 1, job.id))
+
+    owners = sorted({job.owner_id for job in jobs})
+    makespan = now or 1.0
+    mean_wait = {
+        owner: sum(waits[j.id] for j in jobs if j.owner_id == owner) /
+        max(1, sum(1 for j in jobs if j.owner_id == owner))
+        for owner in owners
+    }
+    by_priority = {
+        priority: [waits[j.id] for j in jobs if j.priority == priority]
+        for priority in sorted({job.priority for job in jobs})
+    }
+    mean_share = {owner: share_area[owner] / makespan for owner in owners}
+    utilization = {
+        name: used_area[i] / (capacity[i] * makespan)
+        for i, name in enumerate(RESOURCES)
+        if capacity[i] > 0
+    }
+    return SimulationResult(
+        policy=policy,
+        makespan=makespan,
+        utilization=utilization,
+        mean_wait=mean_wait,
+        mean_share=mean_share,
+        fairness_index=jain_index(list(mean_share.values())),
+        mean_wait_by_priority={p: statistics.mean(w) for p, w in by_priority.items()},
+        p99_wait_by_priority={p: percentile(w, 0.99) for p, w in by_priority.items()},
+        max_wait_by_priority={p: max(w) for p, w in by_priority.items()},
+        p95_wait=percentile(list(waits.values()), 0.95),
+        waits=waits
+    )
+
+
+def flood_workload(jobs: int, users: int = 3, seed: int = 7) -> List[Job]:
+    """
+    User 1 dumps a burst of top-priority jobs at t=0 while the other users
+    submit a steady stream at the same priority.
+    """
+    rng = random.Random(seed)
+    workload = []
+    for i in range(jobs):
+        if i < jobs // 2:
+            owner, arrival = 1, 0.0
+        else:
+            owner, arrival = 2 + i % (users - 1), rng.uniform(0, 3000)
+        workload.append(Job(
+            id=i,
+            owner_id=owner,
+            priority=3,
+            required=build_vector(rng.choice((1, 2, 4)), rng.choice((2, 4, 8)), rng.choice((0, 0, 1))),
+            arrival=arrival,
+            duration=rng.uniform(30, 300)
+        ))
+    return workload
+
+
+def mixed_workload(jobs: int, users: int = 3, seed: int = 7) -> List[Job]:
+    """
+    Mixed priorities and run times: mostly short smoke tests and a tail of
+    long training runs, submitted with runtime hints that are up to 50% off.
+    """
+    rng = random.Random(seed)
+    workload = []
+    for i in range(jobs):
+        duration = rng.uniform(10, 60) if rng.random() < 0.7 else rng.uniform(300, 1800)
+        workload.append(Job(
+            id=i,
+            owner_id=1 + i % users,
+            priority=rng.choice((1, 2, 3)),
+            required=build_vector(rng.choice((2, 4, 8)), rng.choice((4, 8, 16)), rng.choice((0, 0, 1))),
+            arrival=rng.uniform(0, 3000),
+            duration=duration,
+            expected=duration * rng.uniform(0.5, 1.5)
+        ))
+    return workload
+
+
+def saturated_workload(jobs: int, users: int = 3, seed: int = 7) -> List[Job]:
+    """
+    Top-priority jobs arriving at close to the rate the cluster runs them,
+    with one job in ten submitted at priority 1 or 2.
+    """
+    rng = random.Random(seed)
+    workload = []
+    arrival = 0.0
+    for i in range(jobs):
+        arrival += rng.expovariate(1 / 15.5)
+        workload.append(Job(
+            id=i,
+            owner_id=1 + i % users,
+            priority=3 if rng.random() < 0.9 else rng.choice((1, 2)),
+            required=build_vector(4, 8, 0),
+            arrival=arrival,
+            duration=rng.uniform(60, 180)
+        ))
+    return workload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=400)
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--quota", type=float, default=0.5,
+                        help="per-user quota as a fraction of the cluster")
+    parser.add_argument("--aging", type=float, default=300,
+                        help="seconds per band of priority aging")
+    args = parser.parse_args()
+
+    capacity = build_vector(32, 128, 4)
+    quota = ResourceVector(value * args.quota for value in capacity)
+    workload = flood_workload(args.jobs, args.users, args.seed)
+    runs = [
+        ("priority", None),
+        ("drf", None),
+        ("drf", quota),
+    ]
+
+    print(f"{'policy':<16}{'makespan':>10}{'cpu util':>10}{'jain':>8}  mean wait by user")
+    for policy, run_quota in runs:
+        result = simulate(workload, capacity, policy, run_quota)
+        label = policy + ("+quota" if run_quota is not None else "")
+        waits = "  ".join(f"u{owner}={wait:7.1f}s" for owner, wait in result.mean_wait.items())
+        print(
+            f"{label:<16}{result.makespan:>10.0f}{result.utilization['cpu']:>10.2%}"
+            f"{result.fairness_index:>8.3f}  {waits}"
+        )
+
+    # Runtime hints: mean and tail wait of strict priority against
+    # duration-aware ordering on a mixed workload
+    workload = mixed_workload(args.jobs, args.users, args.seed)
+    print()
+    print(f"{'policy':<16}{'mean wait':>10}{'p95 wait':>10}  mean wait by priority")
+    for policy in ("priority", "drf", "wspt", "sjf"):
+        result = simulate(workload, capacity, policy)
+        mean_wait = statistics.mean(result.waits.values())
+        waits = "  ".join(f"p{priority}={wait:7.1f}s" for priority, wait in result.mean_wait_by_priority.items())
+        print(f"{policy:<16}{mean_wait:>9.1f}s{result.p95_wait:>9.1f}s  {waits}")
+
+    # Aging: tail wait of low priorities under steady top-priority load,
+    # against the bound after which nothing newer overtakes them
+    workload = saturated_workload(args.jobs * 2, args.users, args.seed)
+    print()
+    print(f"{'policy':<16}  p99 / max wait by priority")
+    for policy, aging_seconds in (("drf", None), ("drf", args.aging)):
+        result = simulate(workload, capacity, policy, aging_seconds=aging_seconds)
+        label = policy + (f"+aging{aging_seconds:g}" if aging_seconds else "")
+        waits = "  ".join(
+            f"p{priority}={result.p99_wait_by_priority[priority]:6.0f}/{wait:6.0f}s"
+            for priority, wait in result.max_wait_by_priority.items()
+        )
+        print(f"{label:<16}  {waits}")
+    bounds = "  ".join(
+        f"p{priority}={aging.aging_horizon(priority, 'priority', args.aging):6.0f}s"
+        for priority in range(1, fairness.MAX_PRIORITY + 1)
+    )
+    print(f"{'overtake bound':<16}  {bounds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Decision trace of scheduling passes.
+
+Every pass over a cluster records what ``plan`` decided for each entry it
+considered (started, skipped at quota, or blocked at the head of the
+queue), which resources were short and by how much, and how long each
+phase of the pass took. The trace is written once, at the end of the pass:
+
+- ``cluster:{id}:decisions``, a hash of deployment id -> decision of the
+  latest pass, replaced every pass, so explaining a deployment is one HGET
+- ``cluster:{id}:last_pass``, the latest pass summary, which also names
+  the blocked head everything behind it is waiting for
+- ``scheduler:trace``, a stream of pass summaries trimmed to about
+  SCHEDULER_TRACE_LENGTH entries, mirroring the worker's in-memory
+  ``RECENT_PASSES`` ring buffer for other processes
+
+Summaries carry per-phase timings in milliseconds; ``python -m
+app.scheduler.trace`` reads the stream and reports where passes spend
+their time.
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from redis import Redis
+
+from app.core.config import settings
+from app.core.resources import DIMENSIONS, RESOURCES, ResourceVector
+from app.models.deployment import DeploymentStatus
+from app.models.node import Node
+from app.scheduler.policy import Action, QueueEntry
+
+TRACE_STREAM_KEY = "scheduler:trace"
+# Decisions kept per pass; the blocked head is always kept
+DECISION_DEPTH = 1000
+
+# Summaries of the passes this process ran, newest last
+RECENT_PASSES: deque = deque(maxlen=settings.SCHEDULER_TRACE_LENGTH)
+
+
+def decisions_key(cluster_id: int) -> str:
+    """Redis hash of deployment id -> decision of the latest pass"""
+    return f"cluster:{cluster_id}:decisions"
+
+def last_pass_key(cluster_id: int) -> str:
+    return f"cluster:{cluster_id}:last_pass"
+
+
+def shortfall(have: ResourceVector, need: ResourceVector) -> Dict[str, float]:
+    """Resource name -> how much of ``need`` exceeds ``have``"""
+    return {
+        name: need[index] - have[index]
+        for index, name in enumerate(RESOURCES)
+        if need[index] > have[index]
+    }
+
+
+def quota_detail(held: ResourceVector, quota: ResourceVector, required: ResourceVector) -> dict:
+    return {"reason": "quota", "short": shortfall(quota, held + required)}
+
+
+def blocked_detail(
+    required: ResourceVector,
+    available: ResourceVector,
+    limits: ResourceVector,
+    nodes: Optional[Iterable[Node]] = None
+) -> dict:
+    """Why the head of the queue does not fit, and what it is short of"""
+    if not limits.fits(required):
+        # Blocks until the cluster grows or the deployment is cancelled
+        return {"reason": "larger_than_cluster", "short": shortfall(limits, required)}
+    if nodes is None or not available.fits(required):
+        return {"reason": "resources", "short": shortfall(available, required)}
+    # Enough in total, but spread over nodes; report against the freest node
+    # per resource, which leaves nothing short when no node has all of it
+    nodes = list(nodes)
+    best = ResourceVector(
+        max(node.available[dimension] for node in nodes) for dimension in range(DIMENSIONS)
+    )
+    return {"reason": "no_node", "short": shortfall(best, required)}
+
+
+class PassTrace:
+    """Decisions and phase timings of one scheduling pass over a cluster"""
+
+    def __init__(self, cluster_id: int):
+        self.cluster_id = cluster_id
+        self.at = time.time()
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = defaultdict(float)
+        self.decisions: Dict[int, dict] = {}
+        self.counts: Counter = Counter()
+        self.blocked: Optional[dict] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += (time.perf_counter() - start) * 1000
+
+    def record(self, entry: QueueEntry, action: Action, **detail):
+        self.counts[action.value] += 1
+        decision = {"action": action.value, "position": sum(self.counts.values()), **detail}
+        if action is Action.BLOCKED:
+            self.blocked = {"id": entry.id, **decision}
+        if len(self.decisions) < DECISION_DEPTH or action is Action.BLOCKED:
+            self.decisions[entry.id] = decision
+
+    def summary(self) -> dict:
+        timings = {name: round(millis, 3) for name, millis in self.timings.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 3)
+        return {
+            "cluster_id": self.cluster_id,
+            "at": self.at,
+            "considered": sum(self.counts.values()),
+            "started": self.counts[Action.START.value],
+            "over_quota": self.counts[Action.OVER_QUOTA.value],
+            "blocked": self.blocked,
+            "timings": timings,
+        }
+
+    def save(self, redis: Redis):
+        """Write the trace; called once the pass, estimates included, is done"""
+        summary = self.summary()
+        RECENT_PASSES.append(summary)
+        encoded = json.dumps(summary)
+        pipe = redis.pipeline(transaction=False)
+        pipe.delete(decisions_key(self.cluster_id))
+        if self.decisions:
+            pipe.hset(decisions_key(self.cluster_id), mapping={
+                deployment_id: json.dumps(decision)
+                for deployment_id, decision in self.decisions.items()
+            })
+        pipe.set(last_pass_key(self.cluster_id), encoded)
+        pipe.xadd(
+            TRACE_STREAM_KEY, {"pass": encoded},
+            maxlen=settings.SCHEDULER_TRACE_LENGTH, approximate=True
+        )
+        pipe.execute()
+
+
+def describe_short(short: Dict[str, float]) -> str:
+    return ", ".join(f"{name} (short by {amount:g})" for name, amount in short.items())
+
+
+def describe(decision: dict) -> str:
+    reason = decision.get("reason")
+    short = describe_short(decision.get("short", {}))
+    if decision["action"] == Action.START.value:
+        return "Started by the latest scheduling pass"
+    if reason == "quota":
+        return f"Owner is at quota for {short}; skipped until their usage drops"
+    if reason == "larger_than_cluster":
+        return f"Larger than the cluster in {short}; it blocks the queue until it is cancelled or the cluster grows"
+    if reason == "no_node":
+        if short:
+            return f"No node has enough free {short}"
+        return "Enough is free in total, but no single node has all of it"
+    return f"Head of the queue; not enough free {short}"
+
+
+def explain(redis: Redis, deployment) -> dict:
+    """
+    Why a deployment is where it is, from the latest pass over its cluster.
+    Reads one hash field and one key.
+    """
+    pipe = redis.pipeline(transaction=False)
+    pipe.hget(decisions_key(deployment.cluster_id), deployment.id)
+    pipe.get(last_pass_key(deployment.cluster_id))
+    raw_decision, raw_pass = pipe.execute()
+    decision = json.loads(raw_decision) if raw_decision else None
+    last_pass = json.loads(raw_pass) if raw_pass else None
+
+    explanation = {
+        "decision": decision["action"] if decision else None,
+        "considered_position": decision["position"] if decision else None,
+        "blocking_resources": list(decision.get("short", {})) if decision else [],
+        "shortfall": decision.get("short", {}) if decision else {},
+        "blocked_by": None,
+        "last_pass_at": None if last_pass is None else datetime.fromtimestamp(
+            last_pass["at"], timezone.utc
+        ),
+    }
+    if deployment.status != DeploymentStatus.PENDING:
+        explanation["reason"] = f"Deployment is {deployment.status.value}"
+    elif decision is not None:
+        explanation["reason"] = describe(decision)
+    elif last_pass is None:
+        explanation["reason"] = "No scheduling pass has run on this cluster yet"
+    elif last_pass["blocked"] is not None:
+        head = last_pass["blocked"]
+        explanation["blocked_by"] = head["id"]
+        explanation["reason"] = f"Waiting behind deployment {head['id']}: {describe(head)}"
+    elif last_pass["considered"] > DECISION_DEPTH:
+        explanation["reason"] = "Skipped at quota by the latest pass, beyond the traced entries"
+    else:
+        explanation["reason"] = "Submitted after the latest scheduling pass; the next one considers it"
+    return explanation
+
+
+def read_passes(redis: Redis, count: int, cluster_id: Optional[int] = None) -> List[dict]:
+    """The latest ``count`` pass summaries from the stream, oldest first"""
+    entries = redis.xrevrange(TRACE_STREAM_KEY, count=count)
+    passes = [json.loads(fields["pass"]) for _, fields in reversed(entries)]
+    if cluster_id is not None:
+        passes = [summary for summary in passes if summary["cluster_id"] == cluster_id]
+    return passes
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[round(fraction * 100) - 1]
+
+
+def main():
+    from app.core.redis import get_redis
+
+    parser = argparse.ArgumentParser(description="Phase timings of recent scheduling passes")
+    parser.add_argument("--passes", type=int, default=1000, help="latest passes to read")
+    parser.add_argument("--cluster", type=int, help="only passes over this cluster")
+    parser.add_argument("--slowest", type=int, default=5, help="slowest passes to list")
+    args = parser.parse_args()
+
+    passes = read_passes(get_redis(), args.passes, args.cluster)
+    if not passes:
+        print("No scheduling passes traced")
+        return
+
+    phases = defaultdict(list)
+    for summary in passes:
+        for name, millis in summary["timings"].items():
+            phases[name].append(millis)
+    print(f"{len(passes)} passes")
+    print(f"{'phase':<14}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'share':>8}")
+    total = sum(phases["total"])
+    for name, samples in sorted(phases.items(), key=lambda item: -sum(item[1])):
+        print(
+            f"{name:<14}{percentile(samples, 0.5):>10.2f}{percentile(samples, 0.95):>10.2f}"
+            f"{max(samples):>10.2f}{sum(samples) / total if total else 0:>8.0%}"
+        )
+    print("slowest:")
+    for summary in sorted(passes, key=lambda s: -s["timings"]["total"])[:args.slowest]:
+        print(
+            f"  cluster {summary['cluster_id']} at "
+            f"{datetime.fromtimestamp(summary['at'], timezone.utc):%Y-%m-%d %H:%M:%S} "
+            f"{summary['timings']['total']:.2f}ms, {summary['considered']} considered, "
+            f"{summary['started']} started"
+        )
+
+
+if __name__ == "__main__":
+    main()
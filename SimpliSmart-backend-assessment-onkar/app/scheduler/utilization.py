@@ -0,0 +1,188 @@
+"""
+Cluster utilization history.
+
+Utilization is the allocated fraction of each resource's limit. The
+worker samples a cluster after every scheduling pass, which every
+allocation change goes through, and on a fixed tick. Each sample closes
+the interval since the previous one and credits it, time weighted,
+straight into three rollups, so reads never scan raw samples:
+
+    1m  1440 buckets  (one day)
+    1h   720 buckets  (30 days)
+    1d   730 buckets  (two years)
+
+Each rollup is a single Redis string used as an array-backed ring buffer:
+fixed-size slots, addressed by bucket number modulo the slot count and
+accessed with GETRANGE/SETRANGE. A slot holds its bucket number, the
+seconds sampled and, per resource, utilization-seconds and the peak. A
+slot left from an earlier lap has a different bucket number and reads as
+empty. Only the leading worker writes, so updates need no Lua.
+
+The slot layout depends on the number of resources, so the keys carry it
+and adding an EXTRA_RESOURCES entry starts a fresh history.
+"""
+import enum
+import json
+import struct
+import time
+from typing import Iterator, List, Tuple
+
+from redis import Redis
+from redis.client import NEVER_DECODE
+
+from app.core.resources import DIMENSIONS, RESOURCES, ResourceVector
+from app.models.cluster import Cluster
+
+
+class Resolution(str, enum.Enum):
+    MINUTE = "1m"
+    HOUR = "1h"
+    DAY = "1d"
+
+
+# Bucket width in seconds and ring size per rollup
+ROLLUPS = {
+    Resolution.MINUTE: (60, 1440),
+    Resolution.HOUR: (3600, 720),
+    Resolution.DAY: (86400, 730),
+}
+# bucket, seconds sampled, then utilization-seconds and peak per resource
+SLOT = struct.Struct("<If" + "ff" * DIMENSIONS)
+# Intervals longer than this (no leader, worker down) are not credited
+MAX_GAP_SECONDS = 300
+
+
+def rollup_key(cluster_id: int, resolution: Resolution) -> str:
+    return f"cluster:{cluster_id}:utilization:{DIMENSIONS}:{resolution.value}"
+
+def last_sample_key(cluster_id: int) -> str:
+    """Hash with the time and value of a cluster's latest sample"""
+    return f"cluster:{cluster_id}:utilization:{DIMENSIONS}:last"
+
+
+def utilization(limits: ResourceVector, available: ResourceVector) -> List[float]:
+    return [
+        (limit - free) / limit if limit > 0 else 0.0
+        for limit, free in zip(limits, available)
+    ]
+
+def segments(since: float, until: float, width: int) -> Iterator[Tuple[int, float]]:
+    """(bucket, seconds) pieces of [since, until) split at bucket boundaries"""
+    bucket = int(since // width)
+    while bucket * width < until:
+        seconds = min((bucket + 1) * width, until) - max(since, bucket * width)
+        if seconds > 0:
+            yield bucket, seconds
+        bucket += 1
+
+
+def slot_offset(resolution: Resolution, bucket: int) -> int:
+    _, slots = ROLLUPS[resolution]
+    return (bucket % slots) * SLOT.size
+
+def get_range(client, key: str, start: int, end: int):
+    """GETRANGE returning raw bytes on a client that decodes responses"""
+    return client.execute_command("GETRANGE", key, start, end, **{NEVER_DECODE: True})
+
+def decode_slot(raw: bytes) -> Tuple[int, float, List[float], List[float]]:
+    values = SLOT.unpack(raw.ljust(SLOT.size, b"\0"))
+    return values[0], values[1], list(values[2::2]), list(values[3::2])
+
+def encode_slot(bucket: int, seconds: float, areas: List[float], peaks: List[float]) -> bytes:
+    return SLOT.pack(bucket, seconds, *(value for pair in zip(areas, peaks) for value in pair))
+
+
+def record_utilization(redis: Redis, cluster: Cluster, now: float = None):
+    """Sample a cluster and credit the interval since its previous sample"""
+    now = time.time() if now is None else now
+    current = utilization(cluster.limits, cluster.available)
+    last = redis.hgetall(last_sample_key(cluster.id))
+
+    pieces = []
+    if last and len(json.loads(last["value"])) == DIMENSIONS:
+        since = float(last["at"])
+        previous = json.loads(last["value"])
+        if 0 < now - since <= MAX_GAP_SECONDS:
+            pieces = [
+                (resolution, bucket, seconds)
+                for resolution, (width, _) in ROLLUPS.items()
+                for bucket, seconds in segments(since, now, width)
+            ]
+
+    slots = []
+    if pieces:
+        pipe = redis.pipeline(transaction=False)
+        for resolution, bucket, _ in pieces:
+            offset = slot_offset(resolution, bucket)
+            get_range(pipe, rollup_key(cluster.id, resolution), offset, offset + SLOT.size - 1)
+        slots = pipe.execute()
+
+    pipe = redis.pipeline(transaction=False)
+    for (resolution, bucket, seconds), raw in zip(pieces, slots):
+        stored, covered, areas, peaks = decode_slot(raw)
+        if stored != bucket:
+            # Left from the previous lap of the ring
+            covered, areas, peaks = 0.0, [0.0] * DIMENSIONS, [0.0] * DIMENSIONS
+        pipe.setrange(
+            rollup_key(cluster.id, resolution),
+            slot_offset(resolution, bucket),
+            encode_slot(
+                bucket,
+                covered + seconds,
+                [area + value * seconds for area, value in zip(areas, previous)],
+                [max(peak, value) for peak, value in zip(peaks, previous)]
+            )
+        )
+    pipe.hset(last_sample_key(cluster.id), mapping={"at": now, "value": json.dumps(current)})
+    pipe.execute()
+
+
+def read_rollup(
+    redis: Redis,
+    cluster_id: int,
+    resolution: Resolution,
+    start: float,
+    end: float
+) -> List[dict]:
+    """
+    Sampled buckets of one rollup between two epoch times, oldest first.
+    Costs at most two GETRANGE calls whatever the range.
+    """
+    width, slots = ROLLUPS[resolution]
+    last = int(end // width)
+    first = max(int(start // width), last - slots + 1)
+    if first > last:
+        return []
+
+    # The range is contiguous in the ring unless it wraps around its end
+    count = last - first + 1
+    index = first % slots
+    spans = [(index, min(count, slots - index))]
+    if spans[0][1] < count:
+        spans.append((0, count - spans[0][1]))
+    pipe = redis.pipeline(transaction=False)
+    for slot_index, length in spans:
+        get_range(
+            pipe, rollup_key(cluster_id, resolution),
+            slot_index * SLOT.size, (slot_index + length) * SLOT.size - 1
+        )
+    # A ring not yet written to its end returns short spans; pad each one so
+    # the second span of a wrapped read still starts at its own offset
+    raw = b"".join(
+        (chunk or b"").ljust(length * SLOT.size, b"\0")[:length * SLOT.size]
+        for (_, length), chunk in zip(spans, pipe.execute())
+    )
+
+    points = []
+    for position in range(count):
+        bucket = first + position
+        stored, covered, areas, peaks = decode_slot(raw[position * SLOT.size:(position + 1) * SLOT.size])
+        if stored != bucket or covered <= 0:
+            continue
+        points.append({
+            "timestamp": bucket * width,
+            "coverage": min(covered / width, 1.0),
+            "average": {name: area / covered for name, area in zip(RESOURCES, areas)},
+            "peak": dict(zip(RESOURCES, peaks))
+        })
+    return points
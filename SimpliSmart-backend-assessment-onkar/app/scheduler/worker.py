@@ -0,0 +1,208 @@
+"""
+Standalone scheduler worker.
+
+Any number of workers can run; they elect one leader through a Redis lease
+and only the leader schedules. The leader drains the clusters the API has
+signalled, runs one pass per cluster under a per-cluster lock, completes
+expired deployments and periodically sweeps every cluster in case a signal
+was lost. Followers keep retrying the lease and take over when the leader
+stops renewing it. The leader renews its lease between the phases of a
+tick and between clusters, and abandons the tick as soon as a renewal
+fails, so it never keeps writing after another worker has taken over.
+Reconciliation and archiving check in the same way between clusters and
+batches. An iteration that fails, for example while Postgres or Redis is
+unreachable, is logged, rolled back and retried after a short pause.
+
+The leader also
+- reconciles Redis against Postgres when it takes over and every
+  RECONCILE_INTERVAL_SECONDS (app/scheduler/reconcile.py)
+- samples cluster utilization after each pass and every
+  UTILIZATION_SAMPLE_SECONDS (app/scheduler/utilization.py)
+- raises the band of queue entries that have waited long enough when
+  PRIORITY_AGING_SECONDS is set (app/scheduler/aging.py)
+- moves old finished deployments to the archive every
+  ARCHIVE_INTERVAL_SECONDS (app/scheduler/archive.py)
+- records each pass's decisions and phase timings (app/scheduler/trace.py)
+
+Run with: python -m app.scheduler.worker
+"""
+import logging
+import signal
+import time
+
+from redis import Redis
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.db.session import SessionLocal
+from app.models.cluster import Cluster
+from app.scheduler import aging, engine, eta, queue, trace, utilization
+from app.scheduler.archive import archive_finished_deployments
+from app.scheduler.reconcile import reconcile
+from app.scheduler.lease import Lease
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = "scheduler:leader"
+# Clusters drained from the signal set per loop iteration
+SIGNAL_BATCH_SIZE = 1000
+# Pause after an iteration failed, e.g. while Postgres or Redis is down
+ERROR_BACKOFF_SECONDS = 1.0
+
+
+def cluster_lock_key(cluster_id: int) -> str:
+    return f"scheduler:lock:cluster:{cluster_id}"
+
+
+class SchedulerWorker:
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.leader = Lease(redis, LEADER_KEY, settings.SCHEDULER_LEASE_TTL_SECONDS)
+        self.running = True
+        self.last_sweep = 0.0
+        self.last_reconcile = 0.0
+        self.last_archive = 0.0
+        self.last_sample = 0.0
+        self.renewed_at = 0.0
+
+    def stop(self, *_):
+        self.running = False
+
+    def run(self):
+        logger.info("Scheduler worker started")
+        while self.running:
+            try:
+                if not self.hold_leadership():
+                    time.sleep(settings.SCHEDULER_LEASE_TTL_SECONDS / 3)
+                    continue
+
+                # Sleep until the API signals or the tick elapses
+                self.redis.blpop(queue.WAKEUP_KEY, timeout=settings.SCHEDULER_TICK_SECONDS)
+                self.tick()
+            except Exception:
+                # A failed iteration is retried rather than ending the
+                # worker, which would leave the lease held until its TTL
+                logger.exception("Scheduler iteration failed; retrying in %ss", ERROR_BACKOFF_SECONDS)
+                time.sleep(ERROR_BACKOFF_SECONDS)
+
+        self.leader.release()
+        logger.info("Scheduler worker stopped")
+
+    def hold_leadership(self) -> bool:
+        if self.leader.held:
+            if not self.leader.renew():
+                logger.warning("Lost scheduler leadership")
+            self.renewed_at = time.monotonic()
+            return self.leader.held
+        if self.leader.acquire():
+            logger.info("Became scheduler leader")
+            self.renewed_at = time.monotonic()
+            # Catch up on anything signalled while no one was leading, and
+            # on whatever the previous leader left half done
+            self.last_sweep = 0.0
+            self.last_reconcile = 0.0
+        return self.leader.held
+
+    def still_leader(self) -> bool:
+        """
+        Renew the lease once a third of its TTL has passed since the last
+        renewal; False once it has been lost, and the caller must stop
+        """
+        if not self.leader.held:
+            return False
+        if time.monotonic() - self.renewed_at >= settings.SCHEDULER_LEASE_TTL_SECONDS / 3:
+            if not self.leader.renew():
+                logger.warning("Lost scheduler leadership during a tick; abandoning it")
+                return False
+            self.renewed_at = time.monotonic()
+        return True
+
+    def tick(self):
+        """One iteration in its own session, rolled back if it fails"""
+        with SessionLocal() as db:
+            try:
+                self.run_tick(db)
+            except Exception:
+                db.rollback()
+                raise
+
+    def run_tick(self, db):
+        if time.monotonic() - self.last_reconcile >= settings.RECONCILE_INTERVAL_SECONDS:
+            report = reconcile(db, self.redis, keep_going=self.still_leader)
+            if not report.complete:
+                return
+            self.last_reconcile = time.monotonic()
+            # Re-queued entries and repaired capacity need a pass
+            self.last_sweep = 0.0
+
+        if not self.still_leader():
+            return
+        dirty = engine.complete_expired_deployments(db, self.redis)
+
+        if time.monotonic() - self.last_sweep >= settings.SCHEDULER_SWEEP_SECONDS:
+            dirty.update(cluster_id for (cluster_id,) in db.query(Cluster.id))
+            self.last_sweep = time.monotonic()
+
+        signalled = self.redis.spop(queue.DIRTY_CLUSTERS_KEY, SIGNAL_BATCH_SIZE) or []
+        dirty.update(int(cluster_id) for cluster_id in signalled)
+
+        clusters = sorted(dirty)
+        for position, cluster_id in enumerate(clusters):
+            if not self.still_leader():
+                # Whoever leads next gets the rest of them
+                self.redis.sadd(queue.DIRTY_CLUSTERS_KEY, *clusters[position:])
+                return
+            self.schedule_cluster(db, cluster_id)
+
+        if not self.still_leader():
+            return
+        # Clusters without allocation changes are sampled on a fixed tick
+        if time.monotonic() - self.last_sample >= settings.UTILIZATION_SAMPLE_SECONDS:
+            for cluster in db.query(Cluster):
+                utilization.record_utilization(self.redis, cluster)
+            db.rollback()
+            self.last_sample = time.monotonic()
+
+        # History last, after everything that frees or uses capacity
+        if time.monotonic() - self.last_archive >= settings.ARCHIVE_INTERVAL_SECONDS:
+            archive_finished_deployments(db, keep_going=self.still_leader)
+            self.last_archive = time.monotonic()
+
+    def schedule_cluster(self, db, cluster_id: int):
+        """One scheduling pass, skipped if another process holds the cluster"""
+        with Lease(self.redis, cluster_lock_key(cluster_id),
+                   settings.SCHEDULER_LEASE_TTL_SECONDS) as locked:
+            if not locked:
+                # Retry on a later tick
+                self.redis.sadd(queue.DIRTY_CLUSTERS_KEY, cluster_id)
+                return
+            cluster = engine.lock_cluster(db, cluster_id)
+            if not cluster:
+                db.rollback()
+                return
+            pass_trace = trace.PassTrace(cluster_id)
+            with pass_trace.phase("aging"):
+                aging.promote_due(self.redis, cluster_id)
+            started = engine.schedule_pending_deployments(db, self.redis, cluster, pass_trace)
+            if started:
+                logger.info("Cluster %s: started %s deployments", cluster_id, len(started))
+            with pass_trace.phase("eta"):
+                eta.refresh_estimates(db, self.redis, cluster)
+            with pass_trace.phase("utilization"):
+                utilization.record_utilization(self.redis, cluster)
+            pass_trace.save(self.redis)
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s"
+    )
+    worker = SchedulerWorker(get_redis())
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,41 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+from datetime import datetime
+from app.core.resources import ResourceVector, ExtraResources, build_vector
+from app.core.serialization import Projection, column, component, extras
 
 class ClusterBase(BaseModel):
     name: str
     cpu_limit: float
     ram_limit: float
     gpu_limit: float
+    # Limits for the other named resources, e.g. {"gpu_memory": 320, "disk": 2000}
+    resources: ExtraResources = {}
+
+    def limit_vector(self) -> ResourceVector:
+        return build_vector(self.cpu_limit, self.ram_limit, self.gpu_limit, self.resources)
 
 class ClusterCreate(ClusterBase):
     # organization_id: int
     pass
 
-class ClusterUpdate(ClusterBase):
-    pass
+class ClusterUpdate(BaseModel):
+    """Fields left out keep their current value"""
+    name: Optional[str] = None
+    cpu_limit: Optional[float] = Field(None, ge=0)
+    ram_limit: Optional[float] = Field(None, ge=0)
+    gpu_limit: Optional[float] = Field(None, ge=0)
+    # Only the named resources given change
+    resources: ExtraResources = {}
+
+    def limit_vector(self, current: ResourceVector) -> ResourceVector:
+        mapping = current.as_dict()
+        mapping.update(self.resources)
+        for name in ("cpu", "ram", "gpu"):
+            value = getattr(self, f"{name}_limit")
+            if value is not None:
+                mapping[name] = value
+        return ResourceVector.from_mapping(mapping)
 
 class Cluster(ClusterBase):
     id: int
@@ -20,6 +43,30 @@ class Cluster(ClusterBase):
     cpu_available: float
     ram_available: float
     gpu_available: float
+    resources_available: Dict[str, float] = {}
 
     class Config:
         from_attributes = True
+
+# Cluster read straight from rows, for the list fast path
+CLUSTER_PROJECTION = Projection({
+    "name": column("name"),
+    "cpu_limit": component("limits", "cpu"),
+    "ram_limit": component("limits", "ram"),
+    "gpu_limit": component("limits", "gpu"),
+    "resources": extras("limits"),
+    "id": column("id"),
+    "organization_id": column("organization_id"),
+    "cpu_available": component("available", "cpu"),
+    "ram_available": component("available", "ram"),
+    "gpu_available": component("available", "gpu"),
+    "resources_available": extras("available"),
+})
+
+class UtilizationPoint(BaseModel):
+    """Allocated fraction of each resource over one rollup bucket"""
+    timestamp: datetime
+    # Share of the bucket covered by samples
+    coverage: float
+    average: Dict[str, float]
+    peak: Dict[str, float]
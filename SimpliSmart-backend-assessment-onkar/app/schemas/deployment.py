@@ -1,5 +1,9 @@
-from pydantic import Field, BaseModel
-from typing import Optional
+from pydantic import Field, BaseModel, model_validator
+from typing import Dict, List, Optional
+from datetime import datetime
+from app.core.config import settings
+from app.core.resources import ResourceVector, ExtraResources, build_vector
+from app.core.serialization import Projection, column, component, computed, extras
 from app.models.deployment import DeploymentStatus
 
 class DeploymentBase(BaseModel):
@@ -8,18 +12,132 @@ class DeploymentBase(BaseModel):
     cpu_required: float
     ram_required: float
     gpu_required: float
+    # Requirements for the other named resources, e.g. {"gpu_memory": 40}
+    resources: ExtraResources = {}
     priority: int = Field(1, ge=1, le=3)
+    # How long it is expected to run; shorter jobs can go first under the
+    # "wspt" scheduling policy and start estimates use it
+    expected_duration_seconds: Optional[int] = Field(None, gt=0)
+    # Run time after which it is completed; defaults to DEPLOYMENT_TIMEOUT_SECONDS
+    time_limit_seconds: Optional[int] = Field(None, gt=0)
+
+    def required_vector(self) -> ResourceVector:
+        return build_vector(self.cpu_required, self.ram_required, self.gpu_required, self.resources)
 
 class DeploymentCreate(DeploymentBase):
     cluster_id: int
 
+    @model_validator(mode="after")
+    def check_run_time(self):
+        if self.time_limit_seconds and self.time_limit_seconds > settings.MAX_DEPLOYMENT_TIMEOUT_SECONDS:
+            raise ValueError(
+                f"time_limit_seconds may be at most {settings.MAX_DEPLOYMENT_TIMEOUT_SECONDS}"
+            )
+        limit = self.time_limit_seconds or settings.DEPLOYMENT_TIMEOUT_SECONDS
+        if self.expected_duration_seconds and self.expected_duration_seconds > limit:
+            raise ValueError("expected_duration_seconds exceeds the time limit")
+        return self
+
 class DeploymentUpdate(DeploymentBase):
     pass
 
 class Deployment(DeploymentBase):
     id: int
     cluster_id: int
+    owner_id: Optional[int] = None
+    node_id: Optional[int] = None
     status: DeploymentStatus
+    # Set while pending: 1 is next to start; the estimate trusts runtime
+    # hints and otherwise assumes full time limits
+    queue_position: Optional[int] = None
+    estimated_start_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+# Deployment read straight from rows of deployment or deploymentarchive,
+# for the list fast path (app/core/serialization.py)
+DEPLOYMENT_PROJECTION = Projection({
+    "name": column("name"),
+    "docker_image": column("docker_image"),
+    "cpu_required": component("required", "cpu"),
+    "ram_required": component("required", "ram"),
+    "gpu_required": component("required", "gpu"),
+    "resources": extras("required"),
+    "priority": column("priority"),
+    "expected_duration_seconds": column("expected_duration_seconds"),
+    "time_limit_seconds": column("time_limit_seconds"),
+    "id": column("id"),
+    "cluster_id": column("cluster_id"),
+    "owner_id": column("owner_id"),
+    "node_id": column("node_id"),
+    "status": column("status"),
+    # From the queue (eta.queue_info), which needs the queue member
+    "queue_position": computed("id", "name", "required", "status", "cluster_id"),
+    "estimated_start_at": computed("id", "name", "required", "status", "cluster_id"),
+})
+
+class DeploymentCancelFilter(BaseModel):
+    """
+    Selects the pending and running deployments to cancel; every given
+    filter must match. At least one is required.
+    """
+    cluster_id: Optional[int] = None
+    status: Optional[DeploymentStatus] = None
+    min_priority: Optional[int] = Field(None, ge=1, le=3)
+    max_priority: Optional[int] = Field(None, ge=1, le=3)
+    name_prefix: Optional[str] = Field(None, min_length=1)
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+
+    @model_validator(mode="after")
+    def check_filters(self):
+        if all(value is None for value in self.model_dump().values()):
+            raise ValueError("At least one filter is required")
+        if self.status not in (None, DeploymentStatus.PENDING, DeploymentStatus.RUNNING):
+            raise ValueError("Only pending or running deployments can be cancelled")
+        return self
+
+class DeploymentCancelResult(BaseModel):
+    cancelled: int
+    deployment_ids: List[int]
+    cluster_ids: List[int]
+
+class DeploymentSimulation(BaseModel):
+    """Deployments to try against the current state, without submitting them"""
+    deployments: List[DeploymentCreate] = Field(..., min_length=1, max_length=10000)
+
+class SimulatedDeployment(BaseModel):
+    # Position in the request
+    index: int
+    cluster_id: int
+    # "start": starts on the next pass; "queued": waits; "rejected": would not be accepted
+    outcome: str
+    node_id: Optional[int] = None
+    queue_position: Optional[int] = None
+    estimated_start_at: Optional[datetime] = None
+    detail: Optional[str] = None
+
+class SimulationResult(BaseModel):
+    would_start: int
+    queued: int
+    rejected: int
+    deployments: List[SimulatedDeployment]
+
+class DeploymentExplanation(BaseModel):
+    """Why a deployment is pending, from the latest scheduling pass over its cluster"""
+    deployment_id: int
+    status: DeploymentStatus
+    cluster_id: int
+    queue_position: Optional[int] = None
+    estimated_start_at: Optional[datetime] = None
+    # Decision of the latest pass: "start", "over_quota" or "blocked"; None if it was not reached
+    decision: Optional[str] = None
+    # Order in which the latest pass considered it
+    considered_position: Optional[int] = None
+    reason: str
+    blocking_resources: List[str] = []
+    # Resource -> how much more it needs than is free (or than its quota allows)
+    shortfall: Dict[str, float] = {}
+    # The blocked head of the queue it is waiting behind
+    blocked_by: Optional[int] = None
+    last_pass_at: Optional[datetime] = None
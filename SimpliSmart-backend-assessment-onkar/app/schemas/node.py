@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from typing import Dict
+from app.core.resources import ResourceVector, ExtraResources, build_vector
+
+class NodeBase(BaseModel):
+    name: str
+    cpu_limit: float
+    ram_limit: float
+    gpu_limit: float
+    # Capacity of the other named resources, e.g. {"gpu_memory": 80}
+    resources: ExtraResources = {}
+
+    def limit_vector(self) -> ResourceVector:
+        return build_vector(self.cpu_limit, self.ram_limit, self.gpu_limit, self.resources)
+
+class NodeCreate(NodeBase):
+    pass
+
+class Node(NodeBase):
+    id: int
+    cluster_id: int
+    cpu_available: float
+    ram_available: float
+    gpu_available: float
+    resources_available: Dict[str, float] = {}
+
+    class Config:
+        from_attributes = True
+
+class Fragmentation(BaseModel):
+    """
+    How scattered a cluster's free capacity is across its nodes, per
+    resource: 0 when every hole is a whole node, towards 1 as free
+    capacity splinters into slivers no large deployment can use
+    """
+    score: float
+    resources: Dict[str, float]
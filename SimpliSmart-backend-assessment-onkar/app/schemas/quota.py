@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+from app.core.resources import ResourceVector, ExtraResources, build_vector
+
+class QuotaBase(BaseModel):
+    # Leave empty to set the organization-wide default
+    user_id: Optional[int] = None
+    cpu_limit: float
+    ram_limit: float
+    gpu_limit: float
+    resources: ExtraResources = {}
+
+    def limit_vector(self) -> ResourceVector:
+        return build_vector(self.cpu_limit, self.ram_limit, self.gpu_limit, self.resources)
+
+class QuotaCreate(QuotaBase):
+    pass
+
+class Quota(QuotaBase):
+    id: int
+    organization_id: int
+
+    class Config:
+        from_attributes = True
+
+class FairShare(BaseModel):
+    user_id: Optional[int]
+    dominant_share: float
+    usage: Dict[str, float]
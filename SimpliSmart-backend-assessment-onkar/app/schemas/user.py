@@ -15,6 +15,7 @@ class UserInDBBase(UserBase):
     id: int
     is_active: bool
     organization_id: Optional[int] = None
+    is_org_admin: bool = False
 
     class Config:
         from_attributes = True
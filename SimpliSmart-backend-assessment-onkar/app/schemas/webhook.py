@@ -0,0 +1,32 @@
+from pydantic import BaseModel, AnyHttpUrl
+from typing import Optional
+from datetime import datetime
+
+class WebhookEndpointCreate(BaseModel):
+    url: AnyHttpUrl
+    # Signs each request body (X-Webhook-Signature: sha256=<hmac>); never returned
+    secret: Optional[str] = None
+
+class WebhookEndpoint(BaseModel):
+    id: int
+    organization_id: int
+    url: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class WebhookStats(BaseModel):
+    """Outbox state of an organization's endpoints"""
+    pending: int
+    dead: int
+    # Age of the oldest undelivered event: how far delivery is behind
+    oldest_pending_seconds: float
+    # Events delivered over the last window_seconds, per second
+    delivered_per_second: float
+    # Mean recorded-to-delivered time of those events
+    mean_lag_seconds: float
+    window_seconds: int
+
+class WebhookReplay(BaseModel):
+    replayed: int
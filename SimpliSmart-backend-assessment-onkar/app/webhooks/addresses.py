@@ -0,0 +1,89 @@
+"""
+Which addresses webhook requests may go to.
+
+Endpoint URLs are user supplied, so one resolving to a private, loopback,
+link-local or otherwise non-public address would let any organization make
+the delivery worker POST into the internal network. The host is resolved
+and checked when an endpoint is registered, and again by the worker before
+each request, which then connects to the address it checked (``pin``), so
+a DNS answer that changes in between cannot send it elsewhere. Redirects
+are not followed.
+
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES turns the check off, for local receivers
+such as app.webhooks.stub.
+"""
+import asyncio
+import ipaddress
+import socket
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+
+class BlockedAddress(ValueError):
+    """The URL's host does not resolve, or resolves to a non-public address"""
+
+
+def is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    # is_global excludes private, loopback, link-local, reserved, shared
+    # (100.64/10) and unspecified ranges
+    return ip.is_global and not ip.is_multicast
+
+def port(url: httpx.URL) -> int:
+    return url.port or (443 if url.scheme == "https" else 80)
+
+def checked_address(host: str, addresses: List[str]) -> str:
+    """The address to connect to; every address the host has must be public"""
+    if not addresses:
+        raise BlockedAddress(f"{host} does not resolve")
+    blocked = [address for address in addresses if not is_public(address)]
+    if blocked:
+        raise BlockedAddress(f"{host} resolves to non-public address {blocked[0]}")
+    return addresses[0]
+
+
+def resolve(url: str) -> Optional[str]:
+    """
+    Check a URL at registration; returns the address it resolves to, or
+    None when the check is off. Blocks on DNS.
+    """
+    if settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES:
+        return None
+    parsed = httpx.URL(url)
+    try:
+        infos = socket.getaddrinfo(parsed.host, port(parsed), type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as exc:
+        raise BlockedAddress(f"{parsed.host} does not resolve: {exc}") from exc
+    return checked_address(parsed.host, [info[4][0] for info in infos])
+
+async def resolve_async(url: httpx.URL) -> Optional[str]:
+    """``resolve`` for the delivery worker, without blocking the event loop"""
+    if settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES:
+        return None
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            url.host, port(url), type=socket.SOCK_STREAM
+        )
+    except (socket.gaierror, UnicodeError) as exc:
+        raise BlockedAddress(f"{url.host} does not resolve: {exc}") from exc
+    return checked_address(url.host, [info[4][0] for info in infos])
+
+
+def pin(url: httpx.URL, address: Optional[str]) -> Tuple[httpx.URL, Dict[str, str], dict]:
+    """
+    URL, extra headers and request extensions that reach ``address`` while
+    presenting the original host in the Host header and TLS (SNI and
+    certificate check)
+    """
+    if address is None:
+        return url, {}, {}
+    return (
+        url.copy_with(host=address.split("%", 1)[0]),
+        {"Host": url.netloc.decode("ascii")},
+        {"sni_hostname": url.host}
+    )
@@ -0,0 +1,318 @@
+"""
+Webhook delivery worker.
+
+Deployment status changes land in the ``webhookevent`` outbox in the same
+transaction as the change (app/webhooks/outbox.py); this worker sends them.
+Each round claims due events, takes up to WEBHOOK_BATCH_SIZE of them per
+endpoint, oldest first, and POSTs each endpoint its batch as one request
+over a single pooled httpx.AsyncClient, endpoints in parallel.
+
+Claiming pushes an event's next attempt WEBHOOK_CLAIM_SECONDS ahead, with
+the rows locked SKIP LOCKED on Postgres, so any number of workers can run
+and events held by a worker that died come back on their own. Delivery is
+at least once: receivers dedupe on the event id.
+
+Each endpoint gets a deployment's events in the order they were recorded:
+an event is held back while an earlier undelivered one of the same
+deployment is in backoff or claimed elsewhere, and events of one batch go
+in recording order. A dead-lettered event stops holding later ones, so a
+replayed one arrives after them; event ids increase in recording order,
+so receivers can recognise it as older.
+
+Every request first re-resolves the endpoint's host and goes to the
+address it checked (app/webhooks/addresses.py); a non-public address
+fails the batch like any other error.
+
+A failed request is retried with exponential backoff and jitter. After
+WEBHOOK_MAX_ATTEMPTS its events are dead-lettered (status "dead") until
+replayed with POST /api/v1/webhooks/{id}/replay. Delivered events are
+deleted after WEBHOOK_RETENTION_DAYS.
+
+The worker logs throughput and delivery lag (recorded to delivered) every
+minute; GET /api/v1/webhooks/stats reports the same from the outbox.
+
+Run with: python -m app.webhooks.delivery
+Try it against the stub receiver: python -m app.webhooks.stub
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import random
+import signal
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.webhook import WebhookEndpoint, WebhookEvent, WebhookEventStatus
+from app.webhooks.addresses import BlockedAddress, pin, resolve_async
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+# Seconds between throughput and lag log lines
+METRICS_INTERVAL_SECONDS = 60
+# Seconds between deletions of old delivered events
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+@dataclass
+class Endpoint:
+    id: int
+    url: str
+    secret: Optional[str]
+
+
+@dataclass
+class ClaimedEvent:
+    id: int
+    payload: str
+    attempts: int
+    created_at: datetime
+
+
+@dataclass
+class DeliveryStats:
+    """Counters for the current metrics interval"""
+    delivered: int = 0
+    failed: int = 0
+    dead: int = 0
+    lags: List[float] = field(default_factory=list)
+    since: float = field(default_factory=time.monotonic)
+
+    def log(self):
+        elapsed = max(time.monotonic() - self.since, 1e-9)
+        lags = sorted(self.lags)
+        logger.info(
+            "Webhooks: %.1f events/s delivered, %s failed, %s dead-lettered; "
+            "lag p50 %.2fs p99 %.2fs max %.2fs",
+            self.delivered / elapsed, self.failed, self.dead,
+            lags[len(lags) // 2] if lags else 0.0,
+            lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0,
+            lags[-1] if lags else 0.0
+        )
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before attempt ``attempts + 1``: doubling, capped, with jitter"""
+    delay = min(
+        settings.WEBHOOK_BACKOFF_SECONDS * 2 ** (attempts - 1),
+        settings.WEBHOOK_MAX_BACKOFF_SECONDS
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+def signature(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def request_body(events: List[ClaimedEvent]) -> bytes:
+    return json.dumps({
+        "events": [{"id": event.id, **json.loads(event.payload)} for event in events]
+    }).encode()
+
+
+def in_order(db: Session, rows: List[WebhookEvent]) -> List[WebhookEvent]:
+    """
+    The due ``rows`` (in id order) that may be sent now: for each endpoint
+    and deployment, the leading run of its undelivered events that are all
+    due. An event behind one in backoff, or claimed by another worker,
+    waits for it.
+    """
+    due = {row.id for row in rows}
+    undelivered = db.query(
+        WebhookEvent.endpoint_id, WebhookEvent.deployment_id, WebhookEvent.id
+    ).filter(
+        WebhookEvent.status == WebhookEventStatus.PENDING,
+        WebhookEvent.deployment_id.in_({row.deployment_id for row in rows}),
+        WebhookEvent.id <= rows[-1].id
+    ).order_by(WebhookEvent.id)
+
+    sendable = set()
+    held = set()
+    for endpoint_id, deployment_id, event_id in undelivered:
+        pair = (endpoint_id, deployment_id)
+        if pair in held:
+            continue
+        if event_id in due:
+            sendable.add(event_id)
+        else:
+            held.add(pair)
+    return [row for row in rows if row.id in sendable]
+
+def claim(db: Session, now: datetime) -> Dict[int, Tuple[Endpoint, List[ClaimedEvent]]]:
+    """
+    Claim the next batch of due events of each endpoint, oldest first.
+    Events beyond an endpoint's batch, or behind an earlier event of their
+    deployment that is not due, are left for a later round.
+    """
+    rows = db.query(WebhookEvent).filter(
+        WebhookEvent.status == WebhookEventStatus.PENDING,
+        WebhookEvent.next_attempt_at <= now
+    ).order_by(
+        WebhookEvent.id
+    ).limit(settings.WEBHOOK_CLAIM_SIZE).with_for_update(skip_locked=True).all()
+    if rows:
+        rows = in_order(db, rows)
+
+    batches: Dict[int, List[WebhookEvent]] = defaultdict(list)
+    for row in rows:
+        if len(batches[row.endpoint_id]) < settings.WEBHOOK_BATCH_SIZE:
+            batches[row.endpoint_id].append(row)
+    if not batches:
+        db.rollback()
+        return {}
+
+    claimed_until = now + timedelta(seconds=settings.WEBHOOK_CLAIM_SECONDS)
+    endpoints = {
+        endpoint.id: Endpoint(endpoint.id, endpoint.url, endpoint.secret)
+        for endpoint in db.query(WebhookEndpoint).filter(WebhookEndpoint.id.in_(list(batches)))
+    }
+    claimed = {}
+    for endpoint_id, events in batches.items():
+        if endpoint_id not in endpoints:
+            # Endpoint deleted; its events go with it
+            continue
+        for row in events:
+            row.next_attempt_at = claimed_until
+        claimed[endpoint_id] = (
+            endpoints[endpoint_id],
+            [ClaimedEvent(row.id, row.payload, row.attempts, row.created_at) for row in events]
+        )
+    db.commit()
+    return claimed
+
+async def post_batch(client: httpx.AsyncClient, endpoint: Endpoint, events: List[ClaimedEvent]) -> Optional[str]:
+    """Send one endpoint its batch; returns the error, None when delivered"""
+    body = request_body(events)
+    headers = {"Content-Type": "application/json"}
+    if endpoint.secret:
+        headers[SIGNATURE_HEADER] = signature(endpoint.secret, body)
+    try:
+        url = httpx.URL(endpoint.url)
+        url, host_headers, extensions = pin(url, await resolve_async(url))
+        headers.update(host_headers)
+        response = await client.post(url, content=body, headers=headers, extensions=extensions)
+    except BlockedAddress as exc:
+        return f"Blocked: {exc}"[:500]
+    except httpx.HTTPError as exc:
+        return f"{type(exc).__name__}: {exc}"[:500]
+    if response.is_success:
+        return None
+    return f"HTTP {response.status_code}"
+
+def record_results(
+    db: Session,
+    results: List[Tuple[List[ClaimedEvent], Optional[str]]],
+    stats: DeliveryStats
+):
+    """Mark delivered events, reschedule failed ones or dead-letter them"""
+    now = datetime.utcnow()
+    delivered = [event for events, error in results if error is None for event in events]
+    if delivered:
+        db.query(WebhookEvent).filter(
+            WebhookEvent.id.in_([event.id for event in delivered])
+        ).update(
+            {WebhookEvent.status: WebhookEventStatus.DELIVERED, WebhookEvent.delivered_at: now},
+            synchronize_session=False
+        )
+        stats.delivered += len(delivered)
+        stats.lags.extend((now - event.created_at).total_seconds() for event in delivered)
+
+    # One UPDATE per batch and attempt count
+    for events, error in results:
+        if error is None:
+            continue
+        by_attempts = defaultdict(list)
+        for event in events:
+            by_attempts[event.attempts + 1].append(event.id)
+        for attempts, ids in by_attempts.items():
+            values = {WebhookEvent.attempts: attempts, WebhookEvent.last_error: error}
+            if attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                values[WebhookEvent.status] = WebhookEventStatus.DEAD
+                stats.dead += len(ids)
+            else:
+                values[WebhookEvent.next_attempt_at] = now + timedelta(seconds=backoff_seconds(attempts))
+                stats.failed += len(ids)
+            db.query(WebhookEvent).filter(WebhookEvent.id.in_(ids)).update(
+                values, synchronize_session=False
+            )
+    db.commit()
+
+def prune_delivered(db: Session, now: datetime) -> int:
+    horizon = now - timedelta(days=settings.WEBHOOK_RETENTION_DAYS)
+    deleted = db.query(WebhookEvent).filter(
+        WebhookEvent.status == WebhookEventStatus.DELIVERED,
+        WebhookEvent.delivered_at < horizon
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+class DeliveryWorker:
+    def __init__(self):
+        self.running = True
+        self.stats = DeliveryStats()
+        self.last_prune = 0.0
+
+    def stop(self, *_):
+        self.running = False
+
+    async def deliver_round(self, client: httpx.AsyncClient) -> int:
+        """Claim, send and record one round; returns the events sent"""
+        with SessionLocal() as db:
+            claimed = claim(db, datetime.utcnow())
+        if not claimed:
+            return 0
+
+        semaphore = asyncio.Semaphore(settings.WEBHOOK_CONCURRENCY)
+
+        async def send(endpoint: Endpoint, events: List[ClaimedEvent]):
+            async with semaphore:
+                return events, await post_batch(client, endpoint, events)
+
+        results = await asyncio.gather(*(send(endpoint, events) for endpoint, events in claimed.values()))
+        with SessionLocal() as db:
+            record_results(db, list(results), self.stats)
+        return sum(len(events) for _, events in claimed.values())
+
+    async def run(self):
+        logger.info("Webhook delivery worker started")
+        limits = httpx.Limits(
+            max_connections=settings.WEBHOOK_CONCURRENCY,
+            max_keepalive_connections=settings.WEBHOOK_CONCURRENCY
+        )
+        async with httpx.AsyncClient(timeout=settings.WEBHOOK_TIMEOUT_SECONDS, limits=limits) as client:
+            while self.running:
+                sent = await self.deliver_round(client)
+                if time.monotonic() - self.stats.since >= METRICS_INTERVAL_SECONDS:
+                    self.stats.log()
+                    self.stats = DeliveryStats()
+                if time.monotonic() - self.last_prune >= PRUNE_INTERVAL_SECONDS:
+                    with SessionLocal() as db:
+                        prune_delivered(db, datetime.utcnow())
+                    self.last_prune = time.monotonic()
+                if not sent:
+                    await asyncio.sleep(settings.WEBHOOK_POLL_SECONDS)
+        logger.info("Webhook delivery worker stopped")
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s"
+    )
+    worker = DeliveryWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    asyncio.run(worker.run())
+
+
+if __name__ == "__main__":
+    main()
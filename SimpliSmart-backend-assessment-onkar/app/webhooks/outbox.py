@@ -0,0 +1,90 @@
+"""
+Webhook outbox.
+
+Every status change a webhook reports is recorded here in the same
+transaction as the change: one ``webhookevent`` row per endpoint of the
+deployment's organization. The delivery worker (app/webhooks/delivery.py)
+sends them later, so no remote endpoint ever sits on the scheduling path,
+and an event exists exactly when its change was committed.
+"""
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.deployment import DeploymentStatus
+from app.models.webhook import WebhookEndpoint, WebhookEvent, WebhookEventType
+
+# Status a deployment has after each event
+STATUS_AFTER = {
+    WebhookEventType.STARTED: DeploymentStatus.RUNNING,
+    WebhookEventType.COMPLETED: DeploymentStatus.COMPLETED,
+    WebhookEventType.CANCELLED: DeploymentStatus.FAILED,
+}
+# Why a deployment was cancelled, sent as "reason" with deployment.cancelled:
+# a user asked for it, or no node of its cluster can ever fit it
+CANCEL_REQUESTED = "requested"
+CANCEL_UNSCHEDULABLE = "unschedulable"
+
+
+def event_payload(
+    event: WebhookEventType,
+    deployment,
+    occurred_at: datetime,
+    reason: Optional[str] = None
+) -> str:
+    """JSON body of one event; ``deployment`` may be a row with the same columns"""
+    payload = {
+        "event": event.value,
+        "occurred_at": occurred_at.isoformat() + "Z",
+        "deployment": {
+            "id": deployment.id,
+            "name": deployment.name,
+            "cluster_id": deployment.cluster_id,
+            "owner_id": deployment.owner_id,
+            "status": STATUS_AFTER[event].value,
+        }
+    }
+    if reason is not None:
+        payload["reason"] = reason
+    return json.dumps(payload)
+
+
+def record_events(
+    db: Session,
+    organization_id: int,
+    event: WebhookEventType,
+    deployments: Iterable,
+    reason: Optional[str] = None
+):
+    """
+    Add the outbox rows for ``event`` on ``deployments`` of one
+    organization to the caller's transaction; the caller commits.
+    Cancellations pass their ``reason``.
+    """
+    deployments = list(deployments)
+    if not deployments:
+        return
+    endpoint_ids = [
+        endpoint_id for (endpoint_id,) in db.query(WebhookEndpoint.id).filter(
+            WebhookEndpoint.organization_id == organization_id
+        )
+    ]
+    if not endpoint_ids:
+        return
+
+    now = datetime.utcnow()
+    db.execute(insert(WebhookEvent), [
+        {
+            "endpoint_id": endpoint_id,
+            "deployment_id": deployment.id,
+            "event": event,
+            "payload": event_payload(event, deployment, now, reason),
+            "created_at": now,
+            "next_attempt_at": now,
+        }
+        for deployment in deployments
+        for endpoint_id in endpoint_ids
+    ])
@@ -0,0 +1,87 @@
+"""
+Local webhook receiver for trying out and load testing delivery.
+
+Accepts POSTed batches on any path, checks the signature when given a
+secret, and prints each batch. ``--fail-rate`` answers that fraction of
+requests with a 503 and ``--delay`` slows every answer down, to watch
+retries, dead-lettering and lag.
+
+Run with: python -m app.webhooks.stub --port 9000
+Then, with WEBHOOK_ALLOW_PRIVATE_ADDRESSES=true on the API and worker,
+register it: POST /api/v1/webhooks/ {"url": "http://localhost:9000/hook"}
+"""
+import argparse
+import hmac
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.webhooks.delivery import SIGNATURE_HEADER, signature
+
+
+class StubReceiver(BaseHTTPRequestHandler):
+    secret = None
+    fail_rate = 0.0
+    delay = 0.0
+    received = 0
+    seen = set()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        if random.random() < self.fail_rate:
+            self.answer(503)
+            return
+        if self.secret and not hmac.compare_digest(
+            self.headers.get(SIGNATURE_HEADER, ""), signature(self.secret, body)
+        ):
+            self.answer(401)
+            return
+
+        events = json.loads(body)["events"]
+        with self.lock:
+            duplicates = sum(1 for event in events if event["id"] in self.seen)
+            self.seen.update(event["id"] for event in events)
+            StubReceiver.received += len(events)
+            total = StubReceiver.received
+        print(
+            f"{self.path}: {len(events)} events ({duplicates} redelivered), {total} total; "
+            + ", ".join(f"{event['event']} #{event['deployment']['id']}" for event in events[:5]),
+            flush=True
+        )
+        self.answer(204)
+
+    def answer(self, code: int):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--secret", help="check X-Webhook-Signature against this secret")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before answering")
+    args = parser.parse_args()
+
+    StubReceiver.secret = args.secret
+    StubReceiver.fail_rate = args.fail_rate
+    StubReceiver.delay = args.delay
+    server = ThreadingHTTPServer((args.host, args.port), StubReceiver)
+    print(f"Listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
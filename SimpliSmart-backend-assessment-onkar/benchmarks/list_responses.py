@@ -0,0 +1,112 @@
+"""
+Time and size of a deployment list page, before and after the fast path.
+
+model:      ORM rows -> Deployment model per row -> JSON, what the list
+            endpoint did before (validation plus FastAPI's encoding)
+projection: selected columns -> dicts -> orjson (app/core/serialization.py)
+sparse:     the same with fields=id,name,status
+
+Rows live in a throwaway in-memory SQLite database, so the numbers cover
+the query, row loading and encoding but no network or Redis. Each
+payload is also compressed with gzip and brotli at the configured levels.
+
+Run with: python -m benchmarks.list_responses
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse
+
+from app.core.compression import compress
+from app.core.resources import build_vector
+from app.db.base import Base
+from app.models.deployment import Deployment as DeploymentModel, DeploymentStatus
+from app.schemas.deployment import DEPLOYMENT_PROJECTION, Deployment
+
+SPARSE_FIELDS = "id,name,status"
+
+
+def seed(session: Session, rows: int):
+    now = datetime.utcnow()
+    session.execute(insert(DeploymentModel), [
+        {
+            "name": f"deployment-{i}",
+            "docker_image": f"registry.example.com/team/model-{i % 50}:v{i % 7}",
+            "cluster_id": 1 + i % 4,
+            "owner_id": 1 + i % 20,
+            "status": DeploymentStatus.RUNNING if i % 3 else DeploymentStatus.COMPLETED,
+            "priority": 1 + i % 3,
+            "expected_duration_seconds": 60 * (1 + i % 30),
+            "time_limit_seconds": 3600,
+            "required": build_vector(1 + i % 8, 4 + i % 32, i % 2, {"gpu_memory": 16 * (i % 2)}),
+            "created_at": now - timedelta(seconds=i),
+        }
+        for i in range(rows)
+    ])
+    session.commit()
+
+
+def page_query(session: Session):
+    return session.query(DeploymentModel).order_by(
+        DeploymentModel.priority.desc(),
+        DeploymentModel.created_at.desc()
+    )
+
+
+def model_page(session: Session, limit: int) -> bytes:
+    adapter = TypeAdapter(List[Deployment])
+    deployments = [Deployment.model_validate(d) for d in page_query(session).limit(limit).all()]
+    return JSONResponse(adapter.dump_python(deployments, mode="json")).body
+
+
+def projected_page(session: Session, limit: int, fields: str = None) -> bytes:
+    names = DEPLOYMENT_PROJECTION.select(fields)
+    rows = page_query(session).with_entities(
+        *DEPLOYMENT_PROJECTION.columns(DeploymentModel, names)
+    ).limit(limit).all()
+    return orjson.dumps(DEPLOYMENT_PROJECTION.dump(rows, names))
+
+
+def measure(render, runs: int):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        body = render()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, args.rows)
+        paths = (
+            ("model", lambda: model_page(session, args.rows)),
+            ("projection", lambda: projected_page(session, args.rows)),
+            ("sparse", lambda: projected_page(session, args.rows, SPARSE_FIELDS)),
+        )
+        print(f"{'path':<12}{'ms/page':>10}{'bytes':>10}{'gzip':>10}{'brotli':>10}{'br ms':>8}")
+        for label, render in paths:
+            millis, body = measure(render, args.runs)
+            compress_millis, compressed = measure(lambda: compress(body, "br"), args.runs)
+            print(
+                f"{label:<12}{millis:>10.2f}{len(body):>10}{len(compress(body, 'gzip')):>10}"
+                f"{len(compressed):>10}{compress_millis:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
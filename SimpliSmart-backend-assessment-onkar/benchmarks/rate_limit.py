@@ -0,0 +1,68 @@
+"""
+Latency added by the rate limiter to a write request.
+
+Measures the Redis token-bucket path (request admitted) and the in-process
+fast path (caller inside its retry window) against the Redis configured by
+REDIS_HOST/REDIS_PORT/REDIS_DB. The target is a p99 below 1ms.
+
+Run with: python -m benchmarks.rate_limit
+"""
+import argparse
+import statistics
+import time
+
+from app.core.rate_limit import RateLimiter
+from app.core.redis import get_redis
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[int(len(samples) * 0.99) - 1],
+        "max": samples[-1],
+    }
+
+
+def run(redis, iterations: int):
+    limiter = RateLimiter()
+    redis_path, local_path = [], []
+
+    # Admitted requests: each call is one EVALSHA round trip
+    for i in range(iterations):
+        buckets = [
+            (f"bench:ratelimit:user:{i % 1000}", 10 ** 9, 10 ** 9),
+            ("bench:ratelimit:org:1", 10 ** 9, 10 ** 9),
+        ]
+        start = time.perf_counter()
+        limiter.check(redis, buckets)
+        redis_path.append((time.perf_counter() - start) * 1000)
+
+    # Refused caller: first call hits Redis, the rest are answered locally
+    buckets = [("bench:ratelimit:user:refused", 1, 1)]
+    limiter.check(redis, buckets)
+    limiter.check(redis, buckets)
+    for _ in range(iterations):
+        start = time.perf_counter()
+        limiter.check(redis, buckets)
+        local_path.append((time.perf_counter() - start) * 1000)
+
+    redis.delete(*redis.keys("bench:ratelimit:*"))
+    return percentiles(redis_path), percentiles(local_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    redis_path, local_path = run(get_redis(), args.iterations)
+    for label, stats in (("redis bucket", redis_path), ("local refusal", local_path)):
+        print(
+            f"{label:<14} p50={stats['p50']:.3f}ms  p99={stats['p99']:.3f}ms  "
+            f"max={stats['max']:.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
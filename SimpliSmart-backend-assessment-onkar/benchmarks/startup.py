@@ -0,0 +1,102 @@
+"""
+Import time and cold start of the API.
+
+import:     fresh interpreter importing app.main (what every worker spawn,
+            test collection and CLI pays)
+cold start: launching uvicorn until the first /health answers
+
+Each is measured in new processes and reported as the median of --runs.
+Pass --output to append the numbers as a JSON line for tracking over time.
+
+Run with: python -m benchmarks.startup
+"""
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import() -> float:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_cold_start(timeout: float = 30.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("API did not answer /health")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def slowest_imports(count: int):
+    """Top modules by cumulative import time, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), module.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports")
+    parser.add_argument("--output", help="append results as a JSON line to this file")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    cold_starts = [measure_cold_start() for _ in range(args.runs)]
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "import_ms": round(statistics.median(imports) * 1000, 1),
+        "cold_start_ms": round(statistics.median(cold_starts) * 1000, 1),
+    }
+    print(f"import app.main  {result['import_ms']:.1f}ms")
+    print(f"cold start       {result['cold_start_ms']:.1f}ms")
+
+    for cumulative_us, module in slowest_imports(args.top) if args.top else []:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {module}")
+
+    if args.output:
+        with open(args.output, "a") as output:
+            output.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import fakeredis
 import pytest
 from typing import Generator
 from fastapi.testclient import TestClient
@@ -30,3 +31,8 @@ def client() -> Generator:
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as c:
         yield c
+
+@pytest.fixture
+def redis():
+    """In-memory Redis, empty for every test"""
+    return fakeredis.FakeRedis(decode_responses=True)
@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.config import settings
+from app.scheduler import aging, fairness
+from app.scheduler.queue import aging_key, pending_queue_key
+
+
+@pytest.fixture
+def aging_every_minute(monkeypatch):
+    monkeypatch.setattr(settings, "PRIORITY_AGING_SECONDS", 60)
+    monkeypatch.setattr(settings, "SCHEDULER_SWEEP_SECONDS", 30)
+
+
+def test_aged_weight_climbs_one_band_per_interval_up_to_the_ceiling(aging_every_minute):
+    ceiling = aging.aged_ceiling("priority")
+
+    assert ceiling == fairness.MAX_PRIORITY + 1
+    assert aging.aged_weight(1, 59, "priority") == 1
+    assert aging.aged_weight(1, 120, "priority") == 3
+    assert aging.aged_weight(1, 10_000, "priority") == ceiling
+
+
+def test_aging_horizon(aging_every_minute):
+    assert aging.aging_horizon(1, "priority") == 3 * 60 + 30
+    assert aging.aging_horizon(3, "priority") == 60 + 30
+    assert aging.aging_horizon(4, "priority") == 30
+
+
+def test_promote_due_raises_whole_bands_and_keeps_the_tag(redis, aging_every_minute, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULING_POLICY", "priority")
+    tag = 12.5
+    redis.zadd(pending_queue_key(1), {"a": fairness.queue_score(1, tag), "b": fairness.queue_score(3, tag)})
+    redis.zadd(aging_key(1), {"a": 1000, "b": 1000})
+
+    promoted = aging.promote_due(redis, 1, now=1000 + 61)
+
+    assert promoted == 2
+    score_a = redis.zscore(pending_queue_key(1), "a")
+    # Due at 1000 and one interval more: two bands
+    assert score_a == pytest.approx(fairness.queue_score(3, tag))
+    assert fairness.tag_from_score(1, score_a) == pytest.approx(tag)
+    # b reached the ceiling and leaves the aging set
+    assert redis.zscore(pending_queue_key(1), "b") == pytest.approx(fairness.queue_score(4, tag))
+    assert redis.zscore(aging_key(1), "b") is None
+    assert redis.zscore(aging_key(1), "a") == 1000 + 2 * 60
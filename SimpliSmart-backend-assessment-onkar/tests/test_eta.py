@@ -0,0 +1,34 @@
+from app.core.resources import build_vector
+from app.scheduler.eta import project_start_times
+
+
+def cpus(count: float):
+    return build_vector(cpu=count, ram=0, gpu=0)
+
+
+def test_entries_that_fit_start_now():
+    estimates = project_start_times([(1, cpus(2), 60), (2, cpus(2), 60)], cpus(4), [], now=100)
+
+    assert estimates == {1: 100, 2: 100}
+
+
+def test_entries_wait_for_releases_in_finish_order():
+    running = [(300, cpus(2)), (200, cpus(2))]
+
+    estimates = project_start_times([(1, cpus(2), 50), (2, cpus(4), 50)], cpus(0), running, now=100)
+
+    # 1 takes what frees at 200; 2 needs everything, free once 1 finishes at 250 and the rest at 300
+    assert estimates == {1: 200, 2: 300}
+
+
+def test_queue_order_is_kept():
+    estimates = project_start_times([(1, cpus(4), 100), (2, cpus(1), 10)], cpus(2), [(150, cpus(2))], now=0)
+
+    # 2 would fit now, but does not jump the head of the queue
+    assert estimates == {1: 150, 2: 250}
+
+
+def test_stops_at_an_entry_larger_than_the_cluster():
+    estimates = project_start_times([(1, cpus(1), 10), (2, cpus(8), 10), (3, cpus(1), 10)], cpus(2), [], now=0)
+
+    assert estimates == {1: 0}
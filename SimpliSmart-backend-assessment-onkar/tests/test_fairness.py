@@ -0,0 +1,24 @@
+import pytest
+
+from app.scheduler import fairness
+from app.scheduler.aging import aged_ceiling
+
+
+def test_higher_band_first_then_earlier_tag():
+    assert fairness.queue_score(2, 500.0) > fairness.queue_score(1, 0.0)
+    assert fairness.queue_score(1, 0.25) > fairness.queue_score(1, 0.5)
+
+
+@pytest.mark.parametrize("policy", fairness.SCHEDULING_POLICIES)
+def test_tags_stay_apart_at_the_highest_band(policy):
+    top = aged_ceiling(policy)
+    tag = 1e5
+    assert fairness.queue_score(top, tag) > fairness.queue_score(top, tag + 1e-5)
+
+
+def test_tag_from_score_after_aging():
+    weight, tag = 1.0, 1234.5678
+    aged = fairness.queue_score(weight, tag) + 2 * fairness.PRIORITY_BAND
+
+    assert fairness.tag_from_score(weight, aged) == pytest.approx(tag, abs=1e-6)
+
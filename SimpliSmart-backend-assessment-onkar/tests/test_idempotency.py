@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core import idempotency
+from app.core.idempotency import IdempotencyMiddleware
+
+PATH = "/api/v1/deployments/"
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def api(redis, calls, monkeypatch):
+    """The middleware in front of a stand-in for POST /deployments/, as user 1"""
+    monkeypatch.setattr(idempotency, "get_redis", lambda: redis)
+
+    async def create(request):
+        body = await request.json()
+        calls.append(body)
+        if body.get("fail"):
+            return JSONResponse({"detail": "boom"}, status_code=500)
+        return JSONResponse({"id": len(calls)}, headers={"RateLimit-Remaining": str(10 - len(calls))})
+
+    middleware = IdempotencyMiddleware(Starlette(routes=[Route(PATH, create, methods=["POST"])]))
+
+    async def signed_in(scope, receive, send):
+        scope["session"] = {"user_id": 1}
+        await middleware(scope, receive, send)
+
+    return TestClient(signed_in)
+
+
+def post(api, body, key="key-1"):
+    return api.post(PATH, json=body, headers={"Idempotency-Key": key} if key else {})
+
+
+def test_retry_replays_the_first_response(api, calls):
+    first = post(api, {"name": "a"})
+    retry = post(api, {"name": "a"})
+
+    assert len(calls) == 1
+    assert retry.status_code == first.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+
+
+def test_rate_limit_headers_are_not_replayed(api):
+    first = post(api, {"name": "a"})
+    retry = post(api, {"name": "a"})
+
+    assert first.headers["ratelimit-remaining"] == "9"
+    assert "ratelimit-remaining" not in retry.headers
+
+
+def test_same_key_for_a_different_request_is_rejected(api, calls):
+    post(api, {"name": "a"})
+
+    response = post(api, {"name": "b"})
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_server_errors_release_the_key(api, calls, redis):
+    assert post(api, {"fail": True}).status_code == 500
+    assert redis.keys("idempotency:*") == []
+
+    post(api, {"fail": True})
+    assert len(calls) == 2
+
+
+def test_each_key_runs_once_and_requests_without_one_always_run(api, calls):
+    post(api, {"name": "a"}, key=None)
+    post(api, {"name": "a"}, key=None)
+    post(api, {"name": "a"}, key="key-2")
+    post(api, {"name": "a"}, key="key-2")
+
+    assert len(calls) == 3
+
+
+def test_key_length_is_checked(api, calls):
+    assert post(api, {"name": "a"}, key="x" * (idempotency.MAX_KEY_LENGTH + 1)).status_code == 400
+    assert calls == []
+
+
+def test_finish_leaves_a_key_another_request_took_over(redis, monkeypatch):
+    monkeypatch.setattr(idempotency, "get_redis", lambda: redis)
+    middleware = IdempotencyMiddleware(None)
+    expired = json.dumps({"state": idempotency.IN_PROGRESS, "fingerprint": "f", "token": "old"})
+    current = json.dumps({"state": idempotency.IN_PROGRESS, "fingerprint": "f", "token": "new"})
+    redis.set("idempotency:test", current)
+
+    asyncio.run(middleware.finish("idempotency:test", expired, "f", 200, [], b"{}"))
+    asyncio.run(middleware.finish("idempotency:test", expired, "f", 500, [], b""))
+
+    assert redis.get("idempotency:test") == current
@@ -0,0 +1,35 @@
+import time
+
+from app.scheduler.lease import Lease
+
+
+def test_only_one_holder(redis):
+    first = Lease(redis, "lease:test", 10)
+    second = Lease(redis, "lease:test", 10)
+
+    assert first.acquire()
+    assert not second.acquire()
+    assert first.renew()
+
+
+def test_release_lets_another_take_it(redis):
+    first = Lease(redis, "lease:test", 10)
+    second = Lease(redis, "lease:test", 10)
+    first.acquire()
+
+    first.release()
+
+    assert second.acquire()
+
+
+def test_expired_lease_can_be_stolen_and_the_old_holder_cannot_touch_it(redis):
+    first = Lease(redis, "lease:test", 0.05)
+    second = Lease(redis, "lease:test", 10)
+    first.acquire()
+    time.sleep(0.1)
+
+    assert second.acquire()
+    assert not first.renew()
+    assert not first.held
+    first.release()
+    assert redis.get("lease:test") == second.token
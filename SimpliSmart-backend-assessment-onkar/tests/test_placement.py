@@ -0,0 +1,103 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.v1.endpoints.clusters import add_node
+from app.core.resources import build_vector
+from app.models.cluster import Cluster
+from app.models.deployment import Deployment, DeploymentStatus
+from app.models.node import Node
+from app.models.webhook import WebhookEndpoint, WebhookEvent
+from app.scheduler.placement import NodePlacer, fragmentation
+from app.schemas.node import NodeCreate
+
+
+def node(id: int, cpu: float, gpu: float, free_cpu: float = None, free_gpu: float = None):
+    return SimpleNamespace(
+        id=id,
+        limits=build_vector(cpu=cpu, ram=64, gpu=gpu),
+        available=build_vector(
+            cpu=cpu if free_cpu is None else free_cpu,
+            ram=64,
+            gpu=gpu if free_gpu is None else free_gpu
+        )
+    )
+
+
+def placer(nodes):
+    capacity = build_vector(
+        cpu=sum(n.limits[0] for n in nodes), ram=64 * len(nodes), gpu=sum(n.limits[2] for n in nodes)
+    )
+    return NodePlacer(nodes, capacity)
+
+
+def test_best_fit_on_the_dominant_resource():
+    nodes = [node(1, 32, 8, free_gpu=8), node(2, 32, 8, free_gpu=3), node(3, 32, 8, free_gpu=1)]
+
+    # GPU dominates; the node left with the least GPU that still fits is 2
+    assert placer(nodes).find(build_vector(cpu=1, ram=1, gpu=2)).id == 2
+
+
+def test_find_skips_nodes_short_of_another_resource():
+    nodes = [node(1, 32, 8, free_cpu=0, free_gpu=2), node(2, 32, 8, free_gpu=4)]
+
+    assert placer(nodes).find(build_vector(cpu=1, ram=1, gpu=2)).id == 2
+
+
+def test_nothing_fits_when_the_request_is_split_across_nodes():
+    nodes = [node(1, 32, 8, free_gpu=4), node(2, 32, 8, free_gpu=4)]
+
+    assert placer(nodes).find(build_vector(cpu=1, ram=1, gpu=8)) is None
+
+
+def test_place_takes_resources_and_updates_the_index():
+    nodes = [node(1, 32, 8), node(2, 32, 8, free_gpu=4)]
+    node_placer = placer(nodes)
+
+    assert node_placer.place(build_vector(cpu=1, ram=1, gpu=4)).id == 2
+    assert nodes[1].available[2] == 0
+    assert node_placer.place(build_vector(cpu=1, ram=1, gpu=4)).id == 1
+    assert node_placer.find(build_vector(cpu=1, ram=1, gpu=5)) is None
+
+
+def test_fragmentation():
+    idle = [node(i, 8, 8) for i in range(4)]
+    scattered = [node(i, 8, 8, free_gpu=2) for i in range(4)]
+
+    assert fragmentation(idle)["gpu"] == 0
+    assert fragmentation(scattered)["gpu"] == pytest.approx(0.75)
+    assert fragmentation([node(1, 8, 8, free_gpu=0)])["gpu"] == 0
+
+
+def test_first_node_cancels_what_it_cannot_fit_as_unschedulable(db, redis):
+    cluster = Cluster(
+        name="noded", organization_id=1,
+        limits=build_vector(cpu=16, ram=64, gpu=0), available=build_vector(cpu=16, ram=64, gpu=0)
+    )
+    db.add(cluster)
+    db.add(WebhookEndpoint(organization_id=1, url="https://hooks.example/in"))
+    db.flush()
+    too_large = Deployment(
+        name="too-large", cluster_id=cluster.id, owner_id=1, docker_image="image",
+        status=DeploymentStatus.PENDING, priority=1, required=build_vector(cpu=16, ram=1, gpu=0)
+    )
+    db.add(too_large)
+    db.commit()
+    try:
+        add_node(
+            db=db, redis=redis, cluster_id=cluster.id,
+            node_in=NodeCreate(name="n1", cpu_limit=8, ram_limit=64, gpu_limit=0),
+            current_user=SimpleNamespace(organization_id=1)
+        )
+
+        db.refresh(too_large)
+        assert too_large.status == DeploymentStatus.FAILED
+        (event,) = db.query(WebhookEvent).filter(WebhookEvent.deployment_id == too_large.id)
+        payload = json.loads(event.payload)
+        assert payload["event"] == "deployment.cancelled"
+        assert payload["reason"] == "unschedulable"
+    finally:
+        for model in (WebhookEvent, WebhookEndpoint, Deployment, Node, Cluster):
+            db.query(model).delete()
+        db.commit()
@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+from app.core.resources import ResourceVector, build_vector
+from app.models.organization import Organization
+from app.models.quota import Quota
+from app.scheduler.fairness import load_quota
+from app.scheduler.policy import Action, QueueEntry, plan
+
+
+def entry(id: int, owner_id: int, cpu: float) -> QueueEntry:
+    return QueueEntry(id=id, owner_id=owner_id, priority=1, required=build_vector(cpu=cpu, ram=1, gpu=0))
+
+
+def decide(entries, cpu: float, quotas=None, place=None):
+    usage = defaultdict(ResourceVector.zeros)
+    decisions = plan(
+        entries, build_vector(cpu=cpu, ram=100, gpu=0), usage,
+        lambda owner_id: (quotas or {}).get(owner_id), place
+    )
+    return [(queued.id, action) for queued, action in decisions], usage
+
+
+def test_entries_start_until_the_head_does_not_fit():
+    decisions, usage = decide([entry(1, 1, 2), entry(2, 2, 2), entry(3, 1, 2), entry(4, 2, 1)], cpu=5)
+
+    assert decisions == [(1, Action.START), (2, Action.START), (3, Action.BLOCKED)]
+    assert usage[1][0] == 2 and usage[2][0] == 2
+
+
+def test_owner_at_quota_is_skipped_not_blocking():
+    quotas = {1: build_vector(cpu=2, ram=100, gpu=0)}
+
+    decisions, _ = decide([entry(1, 1, 2), entry(2, 1, 1), entry(3, 2, 1)], cpu=10, quotas=quotas)
+
+    assert decisions == [(1, Action.START), (2, Action.OVER_QUOTA), (3, Action.START)]
+
+
+def test_place_replaces_the_aggregate_check():
+    decisions, _ = decide([entry(1, 1, 1), entry(2, 1, 1)], cpu=10, place=lambda queued: queued.id == 1)
+
+    assert decisions == [(1, Action.START), (2, Action.BLOCKED)]
+
+
+def test_quota_falls_back_to_the_organization_default(db):
+    organization = Organization(name="quota-fallback", invite_code="quota-fallback")
+    db.add(organization)
+    db.flush()
+    db.add_all([
+        Quota(organization_id=organization.id, user_id=None, limits=build_vector(cpu=4, ram=8, gpu=0)),
+        Quota(organization_id=organization.id, user_id=7, limits=build_vector(cpu=1, ram=2, gpu=0)),
+    ])
+    db.flush()
+    try:
+        assert load_quota(db, organization.id, 7) == build_vector(cpu=1, ram=2, gpu=0)
+        assert load_quota(db, organization.id, 8) == build_vector(cpu=4, ram=8, gpu=0)
+        assert load_quota(db, organization.id + 1, 7) is None
+    finally:
+        db.rollback()
@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app.core.resources import build_vector
+from app.models.cluster import Cluster
+from app.models.deployment import Deployment, DeploymentStatus
+from app.scheduler import fairness
+from app.scheduler.queue import DEADLINES_KEY, pending_queue_key, queue_member
+from app.scheduler.reconcile import ReconcileReport, reconcile, reconcile_cluster
+
+
+@pytest.fixture
+def cluster(db):
+    cluster = Cluster(
+        name="reconciled", organization_id=1,
+        limits=build_vector(cpu=8, ram=8, gpu=0), available=build_vector(cpu=8, ram=8, gpu=0)
+    )
+    db.add(cluster)
+    db.commit()
+    yield cluster
+    db.query(Deployment).delete()
+    db.query(Cluster).delete()
+    db.commit()
+
+
+def add(db, cluster, name: str, status: DeploymentStatus) -> Deployment:
+    deployment = Deployment(
+        name=name, cluster_id=cluster.id, owner_id=1, docker_image="image", status=status, priority=1,
+        required=build_vector(cpu=2, ram=1, gpu=0),
+        started_at=datetime.utcnow() if status == DeploymentStatus.RUNNING else None
+    )
+    db.add(deployment)
+    db.commit()
+    return deployment
+
+
+def test_repairs_each_difference_once(db, redis, cluster):
+    queued = add(db, cluster, "queued", DeploymentStatus.PENDING)
+    lost = add(db, cluster, "lost", DeploymentStatus.PENDING)
+    finished = add(db, cluster, "finished", DeploymentStatus.COMPLETED)
+    running = add(db, cluster, "running", DeploymentStatus.RUNNING)
+    key = pending_queue_key(cluster.id)
+    redis.zadd(key, {queue_member(queued): 1, queue_member(finished): 2})
+    redis.zadd(DEADLINES_KEY, {finished.id: 0})
+
+    report = reconcile(db, redis)
+
+    assert (report.queue_missing, report.queue_stale) == (1, 1)
+    assert (report.deadlines_missing, report.deadlines_stale) == (1, 1)
+    assert report.usage_repaired == 1
+    assert report.availability_repaired == 1
+    assert set(redis.zrange(key, 0, -1)) == {queue_member(queued), queue_member(lost)}
+    assert [int(member) for member in redis.zrange(DEADLINES_KEY, 0, -1)] == [running.id]
+    assert json.loads(redis.hget(fairness.usage_key(cluster.id), "1"))[0] == 2
+    db.refresh(cluster)
+    assert cluster.available == build_vector(cpu=6, ram=7, gpu=0)
+
+    assert reconcile(db, redis).drift == 0
+
+
+def test_dry_run_changes_nothing(db, redis, cluster):
+    add(db, cluster, "lost", DeploymentStatus.PENDING)
+
+    report = reconcile(db, redis, dry_run=True)
+
+    assert report.queue_missing == 1
+    assert redis.zcard(pending_queue_key(cluster.id)) == 0
+
+
+def test_stops_when_told_to(db, redis, cluster):
+    add(db, cluster, "lost", DeploymentStatus.PENDING)
+
+    report = reconcile(db, redis, keep_going=lambda: False)
+
+    assert not report.complete and report.clusters == 0
+    assert redis.zcard(pending_queue_key(cluster.id)) == 0
+
+
+def test_cluster_deleted_after_listing_is_skipped(db, redis):
+    report = ReconcileReport()
+
+    assert reconcile_cluster(db, redis, 404, set(), report) == set()
+    assert report.drift == 0
@@ -0,0 +1,55 @@
+import pytest
+
+from app.core.resources import (
+    DIMENSIONS, RESOURCES, ResourceVector, ResourceVectorType, build_vector
+)
+
+
+def test_vector_follows_resource_order():
+    vector = ResourceVector.from_mapping({"gpu": 2, "cpu": 8})
+
+    assert len(vector) == DIMENSIONS
+    assert vector.as_dict() == {name: {"cpu": 8.0, "gpu": 2.0}.get(name, 0.0) for name in RESOURCES}
+
+
+def test_unknown_resource_is_rejected():
+    with pytest.raises(ValueError):
+        ResourceVector.from_mapping({"tpu_v9": 1})
+
+
+def test_short_vector_reads_missing_resources_as_zero():
+    assert ResourceVector([1, 2]) == build_vector(cpu=1, ram=2, gpu=0)
+
+
+def test_packing_round_trip():
+    column = ResourceVectorType()
+    vector = build_vector(cpu=1.5, ram=64, gpu=0.25, extra={"disk": 100})
+
+    packed = column.process_bind_param(vector, None)
+
+    assert len(packed) == 8 * DIMENSIONS
+    assert column.process_result_value(packed, None) == vector
+    assert column.process_bind_param(None, None) is None
+    assert column.process_result_value(None, None) is None
+
+
+def test_arithmetic_is_element_wise():
+    a = build_vector(cpu=4, ram=8, gpu=1)
+    b = build_vector(cpu=1, ram=2, gpu=1)
+
+    assert a - b == build_vector(cpu=3, ram=6, gpu=0)
+    assert a + b == build_vector(cpu=5, ram=10, gpu=2)
+    assert isinstance(a - b, ResourceVector)
+
+
+@pytest.mark.parametrize("required, fits", [
+    ({"cpu": 4, "ram": 8, "gpu": 1}, True),
+    ({"cpu": 5, "ram": 1, "gpu": 0}, False),
+    ({"cpu": 1, "ram": 9, "gpu": 0}, False),
+    ({"cpu": 1, "ram": 1, "gpu": 2}, False),
+    ({"cpu": 0, "ram": 0, "gpu": 0, "disk": 1}, False),
+])
+def test_fits_checks_every_resource(required, fits):
+    available = build_vector(cpu=4, ram=8, gpu=1)
+
+    assert available.fits(ResourceVector.from_mapping(required)) is fits
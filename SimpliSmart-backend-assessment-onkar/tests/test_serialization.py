@@ -0,0 +1,68 @@
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from app.core.resources import build_vector
+from app.models.cluster import Cluster as ClusterModel
+from app.models.deployment import Deployment as DeploymentModel, DeploymentStatus
+from app.schemas.cluster import CLUSTER_PROJECTION, Cluster
+from app.schemas.deployment import DEPLOYMENT_PROJECTION, Deployment
+
+
+@pytest.fixture
+def rows(db):
+    cluster = ClusterModel(
+        name="projected", organization_id=1,
+        limits=build_vector(cpu=8, ram=32, gpu=2, extra={"disk": 500}),
+        available=build_vector(cpu=6, ram=30, gpu=2, extra={"disk": 400})
+    )
+    db.add(cluster)
+    db.flush()
+    deployment = DeploymentModel(
+        name="projected", cluster_id=cluster.id, owner_id=1, docker_image="image:1",
+        status=DeploymentStatus.RUNNING, priority=2, expected_duration_seconds=60,
+        required=build_vector(cpu=2, ram=2, gpu=0, extra={"disk": 100})
+    )
+    db.add(deployment)
+    db.flush()
+    yield cluster, deployment
+    db.rollback()
+
+
+def projected(db, projection, model, row_id: int, names):
+    rows = db.query(model).filter(model.id == row_id).with_entities(*projection.columns(model, names)).all()
+    return orjson.loads(orjson.dumps(projection.dump(rows, names)))[0]
+
+
+def test_deployment_projection_matches_the_schema(db, rows):
+    _, deployment = rows
+    names = DEPLOYMENT_PROJECTION.select(None)
+
+    assert projected(db, DEPLOYMENT_PROJECTION, DeploymentModel, deployment.id, names) == (
+        Deployment.model_validate(deployment).model_dump(mode="json")
+    )
+
+
+def test_cluster_projection_matches_the_schema(db, rows):
+    cluster, _ = rows
+    names = CLUSTER_PROJECTION.select(None)
+
+    assert projected(db, CLUSTER_PROJECTION, ClusterModel, cluster.id, names) == (
+        Cluster.model_validate(cluster).model_dump(mode="json")
+    )
+
+
+def test_sparse_fieldset_always_has_the_id(db, rows):
+    _, deployment = rows
+    names = DEPLOYMENT_PROJECTION.select("status, name")
+
+    assert names == ["name", "id", "status"]
+    assert projected(db, DEPLOYMENT_PROJECTION, DeploymentModel, deployment.id, names) == {
+        "name": "projected", "id": deployment.id, "status": "running"
+    }
+
+
+def test_unknown_fields_are_a_bad_request():
+    with pytest.raises(HTTPException) as error:
+        DEPLOYMENT_PROJECTION.select("name,secret")
+    assert error.value.status_code == 400
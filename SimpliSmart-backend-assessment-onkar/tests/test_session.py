@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import deps
+from app.core.config import settings
+from app.db import session
+
+
+@pytest.fixture
+def databases(monkeypatch, tmp_path):
+    """A primary and one replica, both SQLite files"""
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path}/primary.db")
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", f"sqlite:///{tmp_path}/replica.db")
+    monkeypatch.setattr(session, "_engine", None)
+    monkeypatch.setattr(session, "_replicas", None)
+    yield
+    session.dispose_engine()
+
+
+def bind_for(request) -> str:
+    """Database file the session handed to ``request`` is bound to"""
+    dependency = deps.get_db(request)
+    db = next(dependency)
+    try:
+        return db.get_bind().url.database.rsplit("/", 1)[-1]
+    finally:
+        dependency.close()
+
+
+def test_reads_go_to_the_replica(databases):
+    assert bind_for(SimpleNamespace(method="GET", session={})) == "replica.db"
+
+
+def test_writes_go_to_the_primary_and_so_do_the_writers_next_reads(databases):
+    client_session = {}
+
+    assert bind_for(SimpleNamespace(method="POST", session=client_session)) == "primary.db"
+    assert bind_for(SimpleNamespace(method="GET", session=client_session)) == "primary.db"
+    assert bind_for(SimpleNamespace(method="GET", session={})) == "replica.db"
+
+
+def test_lagging_replica_is_skipped(databases, monkeypatch):
+    monkeypatch.setattr(session.Replica, "measure_lag", lambda replica: settings.REPLICA_MAX_LAG_SECONDS + 1)
+
+    assert bind_for(SimpleNamespace(method="GET", session={})) == "primary.db"
+
+
+def test_without_replicas_everything_uses_the_primary(databases, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", "")
+
+    assert bind_for(SimpleNamespace(method="GET", session={})) == "primary.db"
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.resources import ResourceVector, build_vector
+from app.scheduler.utilization import (
+    ROLLUPS, SLOT, Resolution, read_rollup, record_utilization, rollup_key, segments
+)
+
+WIDTH, SLOTS = ROLLUPS[Resolution.MINUTE]
+
+
+def half_used_cluster():
+    limits = build_vector(cpu=4, ram=8, gpu=0)
+    return SimpleNamespace(id=1, limits=limits, available=ResourceVector([
+        limit / 2 for limit in limits
+    ]))
+
+
+def sample_buckets(redis, cluster, first: int, last: int):
+    """Credit every minute bucket from ``first`` to ``last``"""
+    for bucket in range(first, last + 2):
+        record_utilization(redis, cluster, now=bucket * WIDTH)
+
+
+def test_segments_split_at_bucket_boundaries():
+    assert list(segments(50, 130, 60)) == [(0, 10), (1, 60), (2, 10)]
+    assert list(segments(60, 120, 60)) == [(1, 60)]
+    assert list(segments(70, 70, 60)) == []
+
+
+def test_read_rollup_wrapping_around_the_ring(redis):
+    cluster = half_used_cluster()
+    # Buckets in the last two and first two slots of the ring
+    first = 10 * SLOTS - 2
+    sample_buckets(redis, cluster, first, first + 3)
+
+    points = read_rollup(redis, cluster.id, Resolution.MINUTE, first * WIDTH, (first + 3) * WIDTH)
+
+    assert [point["timestamp"] for point in points] == [
+        bucket * WIDTH for bucket in range(first, first + 4)
+    ]
+    assert all(point["coverage"] == 1.0 for point in points)
+    assert points[0]["average"]["cpu"] == pytest.approx(0.5)
+
+
+def test_read_rollup_on_a_short_ring(redis):
+    cluster = half_used_cluster()
+    # Only the first two slots were ever written, so the ring string is two
+    # slots long and the span before the wrap reads back empty
+    first = 10 * SLOTS - 2
+    sample_buckets(redis, cluster, first + 2, first + 3)
+    assert redis.strlen(rollup_key(cluster.id, Resolution.MINUTE)) == 2 * SLOT.size
+
+    points = read_rollup(redis, cluster.id, Resolution.MINUTE, first * WIDTH, (first + 3) * WIDTH)
+
+    assert [point["timestamp"] for point in points] == [(first + 2) * WIDTH, (first + 3) * WIDTH]
+
+
+def test_read_rollup_skips_slots_of_an_earlier_lap(redis):
+    cluster = half_used_cluster()
+    sample_buckets(redis, cluster, 5, 5)
+
+    assert read_rollup(redis, cluster.id, Resolution.MINUTE, (5 + SLOTS) * WIDTH, (5 + SLOTS) * WIDTH) == []
+    assert len(read_rollup(redis, cluster.id, Resolution.MINUTE, 5 * WIDTH, 5 * WIDTH)) == 1
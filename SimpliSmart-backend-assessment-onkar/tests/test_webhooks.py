@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.models.webhook import WebhookEndpoint, WebhookEvent, WebhookEventStatus, WebhookEventType
+from app.webhooks import delivery
+from app.webhooks.addresses import BlockedAddress, checked_address, is_public, pin
+
+
+@pytest.fixture
+def endpoint(db):
+    endpoint = WebhookEndpoint(organization_id=1, url="https://hooks.example/in")
+    db.add(endpoint)
+    db.commit()
+    yield endpoint
+    db.query(WebhookEvent).delete()
+    db.query(WebhookEndpoint).delete()
+    db.commit()
+
+
+def add_event(db, endpoint, deployment_id: int, attempts: int = 0, due_in: float = 0) -> WebhookEvent:
+    event = WebhookEvent(
+        endpoint_id=endpoint.id,
+        deployment_id=deployment_id,
+        event=WebhookEventType.STARTED,
+        payload="{}",
+        attempts=attempts,
+        next_attempt_at=datetime.utcnow() + timedelta(seconds=due_in)
+    )
+    db.add(event)
+    db.commit()
+    return event
+
+
+def claimed_ids(db):
+    claimed = delivery.claim(db, datetime.utcnow())
+    return [event.id for _, events in claimed.values() for event in events]
+
+
+def fail(db, events, attempts: int):
+    claimed = [delivery.ClaimedEvent(event.id, event.payload, attempts - 1, event.created_at) for event in events]
+    stats = delivery.DeliveryStats()
+    delivery.record_results(db, [(claimed, "HTTP 503")], stats)
+    return stats
+
+
+def test_failed_batch_backs_off(db, endpoint):
+    event = add_event(db, endpoint, 1)
+
+    stats = fail(db, [event], attempts=1)
+
+    db.refresh(event)
+    assert event.status == WebhookEventStatus.PENDING
+    assert event.attempts == 1 and event.last_error == "HTTP 503"
+    assert event.next_attempt_at > datetime.utcnow()
+    assert stats.failed == 1 and stats.dead == 0
+
+
+def test_last_attempt_dead_letters(db, endpoint):
+    event = add_event(db, endpoint, 1)
+
+    stats = fail(db, [event], attempts=settings.WEBHOOK_MAX_ATTEMPTS)
+
+    db.refresh(event)
+    assert event.status == WebhookEventStatus.DEAD
+    assert stats.dead == 1
+
+
+def test_backoff_doubles_up_to_the_cap():
+    assert delivery.backoff_seconds(1) <= settings.WEBHOOK_BACKOFF_SECONDS
+    assert delivery.backoff_seconds(3) >= settings.WEBHOOK_BACKOFF_SECONDS * 2
+    assert delivery.backoff_seconds(100) <= settings.WEBHOOK_MAX_BACKOFF_SECONDS
+
+
+def test_event_waits_for_an_earlier_one_of_its_deployment(db, endpoint):
+    backing_off = add_event(db, endpoint, 1, attempts=1, due_in=60)
+    behind = add_event(db, endpoint, 1)
+    other = add_event(db, endpoint, 2)
+
+    assert claimed_ids(db) == [other.id]
+
+    db.query(WebhookEvent).filter(WebhookEvent.id.in_([backing_off.id, behind.id])).update(
+        {WebhookEvent.next_attempt_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db.commit()
+    assert claimed_ids(db) == [backing_off.id, behind.id]
+
+
+@pytest.mark.parametrize("address, public", [
+    ("93.184.216.34", True),
+    ("2606:4700::1111", True),
+    ("10.1.2.3", False),
+    ("127.0.0.1", False),
+    ("169.254.169.254", False),
+    ("100.64.0.1", False),
+    ("::1", False),
+    ("::ffff:192.168.0.1", False),
+    ("fe80::1%eth0", False),
+    ("0.0.0.0", False),
+    ("224.0.0.1", False),
+])
+def test_only_public_addresses_are_allowed(address, public):
+    assert is_public(address) is public
+
+
+def test_any_private_answer_blocks_the_host():
+    with pytest.raises(BlockedAddress):
+        checked_address("hooks.example", ["93.184.216.34", "10.0.0.1"])
+    with pytest.raises(BlockedAddress):
+        checked_address("hooks.example", [])
+
+
+def test_pinned_request_keeps_the_original_host():
+    url, headers, extensions = pin(httpx.URL("https://hooks.example:8443/in"), "93.184.216.34")
+
+    assert str(url) == "https://93.184.216.34:8443/in"
+    assert headers == {"Host": "hooks.example:8443"}
+    assert extensions == {"sni_hostname": "hooks.example"}
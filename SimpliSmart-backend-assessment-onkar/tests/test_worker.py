@@ -0,0 +1,23 @@
+from app.scheduler import queue, worker
+from app.scheduler.worker import LEADER_KEY, SchedulerWorker
+
+
+def test_failed_tick_does_not_stop_the_worker(redis, monkeypatch):
+    scheduler = SchedulerWorker(redis)
+    ticks = []
+
+    def tick():
+        ticks.append(redis.get(LEADER_KEY))
+        if len(ticks) == 1:
+            raise ConnectionError("database went away")
+        scheduler.stop()
+
+    monkeypatch.setattr(scheduler, "tick", tick)
+    monkeypatch.setattr(worker.time, "sleep", lambda seconds: None)
+    redis.lpush(queue.WAKEUP_KEY, 1, 1)
+
+    scheduler.run()
+
+    # The second tick ran as leader, and the lease went once the loop ended
+    assert ticks == [scheduler.leader.token] * 2
+    assert redis.get(LEADER_KEY) is None